@@ -0,0 +1,4 @@
+"""
+Benchmarks of the AuthPASETO hot paths, and a regression gate comparing
+them against a stored baseline. Run `python -m benchmarks --help`
+"""
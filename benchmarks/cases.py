@@ -0,0 +1,85 @@
+"""
+The benchmarked hot paths, each case prepares its token and config once
+and returns the function to time
+"""
+
+from typing import Callable, Dict
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+from fastapi_paseto_auth import AuthPASETO
+
+
+def load_config() -> None:
+    private_key = Ed25519PrivateKey.generate()
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    public_pem = (
+        private_key.public_key()
+        .public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        .decode()
+    )
+
+    @AuthPASETO.load_config
+    def get_config():
+        return [
+            ("authpaseto_secret_key", "benchmark-secret-key"),
+            ("authpaseto_private_key", private_pem),
+            ("authpaseto_public_key", public_pem),
+            ("authpaseto_access_token_expires", 900),
+        ]
+
+
+def create_access_token(purpose: str) -> Callable[[], None]:
+    Authorize = AuthPASETO()
+
+    def run() -> None:
+        Authorize.create_access_token(
+            subject="benchmark", purpose=purpose, user_claims={"roles": ["user"]}
+        )
+
+    return run
+
+
+def paseto_required(purpose: str) -> Callable[[], None]:
+    token = (
+        AuthPASETO()
+        .create_access_token(
+            subject="benchmark", purpose=purpose, user_claims={"roles": ["user"]}
+        )
+        .encode()
+    )
+
+    def run() -> None:
+        # A new instance per call, like a new request
+        Authorize = AuthPASETO()
+        Authorize._token = token
+        Authorize.paseto_required()
+
+    return run
+
+
+def header_parsing() -> Callable[[], None]:
+    Authorize = AuthPASETO()
+    header = b"Bearer " + AuthPASETO().create_access_token(subject="benchmark").encode()
+
+    def run() -> None:
+        Authorize._get_paseto_from_header(header)
+
+    return run
+
+
+CASES: Dict[str, Callable[[], Callable[[], None]]] = {
+    "create_access_token[v4.local]": lambda: create_access_token("local"),
+    "create_access_token[v4.public]": lambda: create_access_token("public"),
+    "paseto_required[v4.local]": lambda: paseto_required("local"),
+    "paseto_required[v4.public]": lambda: paseto_required("public"),
+    "header_parsing": header_parsing,
+}
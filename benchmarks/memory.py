@@ -0,0 +1,118 @@
+"""
+Memory used per call of the hot paths, measured with tracemalloc
+"""
+
+import array
+import gc
+import statistics
+import tracemalloc
+from typing import Callable, Dict, Optional, Sequence
+
+from benchmarks import cases
+
+# Highest median peak of the memory allocated during a call, in bytes
+DEFAULT_PEAK_BUDGETS = {
+    "create_access_token[v4.local]": 4096,
+    "create_access_token[v4.public]": 4096,
+    "paseto_required[v4.local]": 4608,
+    "paseto_required[v4.public]": 4608,
+    "header_parsing": 1792,
+}
+
+# Highest number of memory blocks still allocated after a call, per call.
+# A leak or an unbounded cache keeps at least one block per call, the retained
+# bytes are only reported, they are too noisy to be checked
+DEFAULT_RETAINED_BLOCKS_BUDGET = 0.5
+
+
+def _traced_blocks() -> int:
+    snapshot = tracemalloc.take_snapshot()
+    return sum(stat.count for stat in snapshot.statistics("filename"))
+
+
+def measure_memory(func: Callable[[], None], calls: int = 1000) -> Dict[str, float]:
+    """
+    :return: median `peak` bytes allocated during a call, and the `retained`
+             bytes and `retained_blocks` still allocated after it, per call
+    """
+    # Caches, lazy imports and interned strings are filled by the first calls
+    for _ in range(10):
+        func()
+    gc.collect()
+
+    tracemalloc.start()
+    try:
+        blocks_before = _traced_blocks()
+        before, _ = tracemalloc.get_traced_memory()
+        # Preallocated, so storing the peaks doesn't count as retained memory
+        peaks = array.array("q", bytes(8 * calls))
+        for index in range(calls):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks[index] = peak - current
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+        blocks_after = _traced_blocks()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "peak": statistics.median(peaks),
+        "retained": max(after - before, 0) / calls,
+        "retained_blocks": max(blocks_after - blocks_before, 0) / calls,
+    }
+
+
+def run_memory_benchmarks(
+    calls: int, names: Optional[Sequence[str]] = None
+) -> Dict[str, Dict[str, float]]:
+    cases.load_config()
+    results = {}
+    for name, case in cases.CASES.items():
+        if names and not any(selected in name for selected in names):
+            continue
+        results[name] = measure_memory(case(), calls)
+    return results
+
+
+def check_budgets(
+    results: Dict[str, Dict[str, float]],
+    peak_budgets: Optional[Dict[str, float]] = None,
+    retained_blocks_budget: float = DEFAULT_RETAINED_BLOCKS_BUDGET,
+) -> Dict[str, str]:
+    """
+    :param peak_budgets: peak budget by benchmark, overriding the default ones
+    :return: the reason each benchmark over budget failed, by benchmark
+    """
+    peak_budgets = {**DEFAULT_PEAK_BUDGETS, **(peak_budgets or {})}
+    failures = {}
+    for name, result in results.items():
+        budget = peak_budgets.get(name)
+        if budget is not None and result["peak"] > budget:
+            failures[name] = f"peak {result['peak']:.0f}B > {budget:.0f}B"
+        elif result["retained_blocks"] > retained_blocks_budget:
+            failures[name] = (
+                f"retained {result['retained_blocks']:.2f} blocks/call"
+                f" > {retained_blocks_budget}"
+            )
+    return failures
+
+
+def format_results(
+    results: Dict[str, Dict[str, float]],
+    peak_budgets: Optional[Dict[str, float]] = None,
+) -> str:
+    peak_budgets = {**DEFAULT_PEAK_BUDGETS, **(peak_budgets or {})}
+    lines = [
+        f"{'benchmark':<34} {'peak':>9} {'budget':>9} {'retained':>12} {'blocks':>8}"
+    ]
+    for name, result in results.items():
+        budget = peak_budgets.get(name)
+        lines.append(
+            f"{name:<34} {result['peak']:>8.0f}B "
+            f"{(f'{budget:.0f}B' if budget else '-'):>9} "
+            f"{result['retained']:>8.1f}B/op {result['retained_blocks']:>8.2f}"
+        )
+    return "\n".join(lines)
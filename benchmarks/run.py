@@ -0,0 +1,257 @@
+"""
+Record the benchmark results to a baseline file, or compare them against it
+and exit with a non-zero status on a statistically significant regression.
+The memory command checks the memory allocated per call against budgets
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from benchmarks import cases, memory, stats
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def measure(func: Callable[[], None], rounds: int, min_time: float) -> List[float]:
+    """
+    :return: seconds per call of each round, a round runs enough calls
+             to last at least `min_time` seconds
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+    # One more round to warm up, the calibration rounds may have been too short
+    for _ in range(number):
+        func()
+
+    samples = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return samples
+
+
+def environment() -> Dict[str, str]:
+    """
+    Where the results were measured, results of different environments
+    can't be compared
+    """
+    from importlib.metadata import PackageNotFoundError, version
+
+    packages = {}
+    for package in ("fastapi", "pyseto", "cryptography", "pycryptodomex"):
+        try:
+            packages[package] = version(package)
+        except PackageNotFoundError:
+            packages[package] = "missing"
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpu_count": str(os.cpu_count()),
+        **packages,
+    }
+
+
+def run_benchmarks(
+    rounds: int, min_time: float, names: Optional[Sequence[str]] = None
+) -> Dict[str, Dict]:
+    cases.load_config()
+    results = {}
+    for name, case in cases.CASES.items():
+        if names and not any(selected in name for selected in names):
+            continue
+        samples = measure(case(), rounds, min_time)
+        results[name] = {
+            "mean": statistics.fmean(samples),
+            "stdev": statistics.stdev(samples),
+            "samples": samples,
+        }
+    return results
+
+
+def compare(
+    baseline: Dict[str, Dict],
+    current: Dict[str, Dict],
+    tolerance: float,
+    alpha: float,
+    tolerances: Optional[Dict[str, float]] = None,
+) -> List[Dict]:
+    """
+    A benchmark regressed when its mean is more than its tolerance slower than
+    the baseline, and Welch's t-test finds the slowdown significant at `alpha`
+    :param tolerances: tolerance by benchmark, overriding `tolerance`
+    :return: one row per current benchmark
+    """
+    tolerances = tolerances or {}
+    rows = []
+    for name, result in current.items():
+        row = {"name": name, "current": result["mean"], "baseline": None}
+        rows.append(row)
+        if name not in baseline:
+            row["verdict"] = "new"
+            continue
+
+        base = baseline[name]
+        row["baseline"] = base["mean"]
+        row["change"] = result["mean"] / base["mean"] - 1.0
+        _, _, row["p_value"] = stats.welch_t_test(base["samples"], result["samples"])
+        allowed = tolerances.get(name, tolerance)
+        if row["change"] > allowed and row["p_value"] < alpha:
+            row["verdict"] = "REGRESSION"
+        elif row["change"] < -allowed:
+            row["verdict"] = "faster"
+        else:
+            row["verdict"] = "ok"
+    return rows
+
+
+def format_rows(rows: List[Dict]) -> str:
+    lines = [
+        f"{'benchmark':<34} {'baseline':>12} {'current':>12} {'change':>8} "
+        f"{'p-value':>8}  verdict"
+    ]
+    for row in rows:
+        baseline = f"{row['baseline'] * 1e6:.2f}us" if row["baseline"] else "-"
+        change = f"{row['change']:+.1%}" if "change" in row else "-"
+        p_value = f"{row['p_value']:.4f}" if "p_value" in row else "-"
+        lines.append(
+            f"{row['name']:<34} {baseline:>12} {row['current'] * 1e6:>10.2f}us "
+            f"{change:>8} {p_value:>8}  {row['verdict']}"
+        )
+    return "\n".join(lines)
+
+
+def parse_assignment(value: str) -> tuple:
+    name, separator, number = value.rpartition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError("expected NAME=VALUE")
+    return name, float(number)
+
+
+def parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("command", choices=("record", "compare", "memory"))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.02,
+        help="minimum duration of a round in seconds",
+    )
+    parser.add_argument(
+        "-k",
+        "--filter",
+        action="append",
+        help="only run the benchmarks whose name contains this, can be repeated",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="slowdown allowed before a regression is reported, 0.1 is 10%%",
+    )
+    parser.add_argument(
+        "--tolerance-for",
+        type=parse_assignment,
+        action="append",
+        default=[],
+        metavar="NAME=TOLERANCE",
+        help="slowdown allowed for a single benchmark",
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.01,
+        help="significance level of the one-sided Welch's t-test",
+    )
+    parser.add_argument(
+        "--calls",
+        type=int,
+        default=1000,
+        help="calls measured by the memory command",
+    )
+    parser.add_argument(
+        "--budget",
+        type=parse_assignment,
+        action="append",
+        default=[],
+        metavar="NAME=BYTES",
+        help="peak memory allowed per call of a benchmark",
+    )
+    return parser.parse_args(argv)
+
+
+def check_memory(args: argparse.Namespace) -> int:
+    results = memory.run_memory_benchmarks(args.calls, args.filter)
+    budgets = dict(args.budget)
+    print(memory.format_results(results, budgets))
+    failures = memory.check_budgets(results, budgets)
+    for name, reason in failures.items():
+        print(f"Over budget: {name}, {reason}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.command == "memory":
+        return check_memory(args)
+    if args.command == "compare" and not os.path.exists(args.baseline):
+        print(
+            f"No baseline at {args.baseline}, "
+            "run `python -m benchmarks record` first",
+            file=sys.stderr,
+        )
+        return 2
+
+    results = run_benchmarks(args.rounds, args.min_time, args.filter)
+
+    if args.command == "record":
+        with open(args.baseline, "w") as f:
+            json.dump({"environment": environment(), "benchmarks": results}, f)
+        print(f"Recorded {len(results)} benchmarks to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["environment"] != environment():
+        print(
+            "Warning: the baseline was recorded in another environment, "
+            "the comparison may not be meaningful",
+            file=sys.stderr,
+        )
+    rows = compare(
+        baseline["benchmarks"],
+        results,
+        args.tolerance,
+        args.alpha,
+        dict(args.tolerance_for),
+    )
+    print(format_rows(rows))
+    regressions = [row["name"] for row in rows if row["verdict"] == "REGRESSION"]
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,79 @@
+"""
+Welch's t-test, with the Student's t distribution computed from the
+regularized incomplete beta function so no third-party package is needed
+"""
+
+import math
+import statistics
+from typing import Sequence, Tuple
+
+
+def _beta_continued_fraction(a: float, b: float, x: float) -> float:
+    # Modified Lentz's method
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 300):
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1.0) < 1e-12:
+            break
+    return result
+
+
+def regularized_incomplete_beta(a: float, b: float, x: float) -> float:
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(
+        math.lgamma(a + b)
+        - math.lgamma(a)
+        - math.lgamma(b)
+        + a * math.log(x)
+        + b * math.log1p(-x)
+    )
+    # The continued fraction converges quickly only on one side of the mean
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _beta_continued_fraction(a, b, x) / a
+    return 1.0 - front * _beta_continued_fraction(b, a, 1.0 - x) / b
+
+
+def t_survival(t: float, df: float) -> float:
+    """
+    :return: probability that a Student's t variable with `df` degrees of
+             freedom is greater than `t`
+    """
+    tail = 0.5 * regularized_incomplete_beta(df / 2.0, 0.5, df / (df + t * t))
+    return tail if t > 0 else 1.0 - tail
+
+
+def welch_t_test(
+    baseline: Sequence[float], current: Sequence[float]
+) -> Tuple[float, float, float]:
+    """
+    One-sided test of the current samples being greater than the baseline ones
+    :return: t statistic, degrees of freedom and p-value
+    """
+    baseline_variance = statistics.variance(baseline) / len(baseline)
+    current_variance = statistics.variance(current) / len(current)
+    standard_error = math.sqrt(baseline_variance + current_variance)
+    difference = statistics.fmean(current) - statistics.fmean(baseline)
+    if standard_error == 0.0:
+        t = math.copysign(math.inf, difference) if difference else 0.0
+        return t, math.inf, 0.0 if difference > 0 else 1.0
+
+    t = difference / standard_error
+    df = (baseline_variance + current_variance) ** 2 / (
+        baseline_variance**2 / (len(baseline) - 1)
+        + current_variance**2 / (len(current) - 1)
+    )
+    return t, df, t_survival(t, df)
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi_paseto_auth import AuthPASETO, AuthPolicy
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from pydantic import BaseModel
+
+app = FastAPI()
+
+
+class User(BaseModel):
+    username: str
+    password: str
+
+
+class Settings(BaseModel):
+    authpaseto_secret_key: str = "secret"
+
+
+@AuthPASETO.load_config
+def get_config():
+    return Settings()
+
+
+@app.exception_handler(AuthPASETOException)
+def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.message})
+
+
+@app.post("/login")
+def login(user: User, Authorize: AuthPASETO = Depends()):
+    if user.username != "test" or user.password != "test":
+        raise HTTPException(status_code=401, detail="Bad username or password")
+
+    access_token = Authorize.create_access_token(
+        subject=user.username, fresh=True, user_claims={"scopes": ["items:read"]}
+    )
+    return {"access_token": access_token}
+
+
+# Every route of this router requires a valid access token
+items = APIRouter(prefix="/items", dependencies=[Depends(AuthPolicy())])
+
+
+@items.get("")
+def list_items(claims: dict = Depends(AuthPolicy(scopes=["items:read"]))):
+    return {"user": claims["sub"], "items": ["foo", "bar"]}
+
+
+@items.delete("/{item_id}")
+def delete_item(
+    item_id: int, claims: dict = Depends(AuthPolicy(fresh=True, scopes=["items:write"]))
+):
+    return {"user": claims["sub"], "deleted": item_id}
+
+
+app.include_router(items)
@@ -3,3 +3,4 @@
 __version__ = "0.5.3"
 
 from .auth_paseto import AuthPASETO
+from .policy import AuthPolicy
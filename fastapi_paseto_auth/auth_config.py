@@ -1,20 +1,33 @@
-from fastapi_paseto_auth.config import LoadConfig
+from fastapi_paseto_auth import metrics
+from fastapi_paseto_auth.compaction import ClaimCompactor
 from pydantic import ValidationError
-from typing import Callable, List, Optional, Dict
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Dict, Union
 from datetime import timedelta
-from pyseto import Token
+
+if TYPE_CHECKING:
+    from fastapi_paseto_auth.breaker import CircuitBreaker
+    from fastapi_paseto_auth.limiter import VerificationLimiter
+    from fastapi_paseto_auth.negative_cache import RejectedTokenCache
+    from fastapi_paseto_auth.singleflight import SingleFlight
+    from fastapi_paseto_auth.paseto import DecodedToken
+    from fastapi_paseto_auth.tenants import TenantConfig
 
 
 class AuthConfig:
     _token = None
+    _raw_token = None
     _token_parts = []
+    _token_footer = b""
     _token_location = {"headers"}
     _current_user = None
-    _decoded_token: Optional[Token] = None
+    _decoded_token: Optional["DecodedToken"] = None
+    _token_payload: Optional[Dict] = None
+    _request = None
 
     _secret_key = None
     _public_key = None
     _private_key = None
+    _keys: Dict[tuple, Any] = {}
     _purpose = "local"
     _version = 4
     _decode_leeway = 0
@@ -26,9 +39,32 @@ class AuthConfig:
     _header_name = "Authorization"
     _header_type = "Bearer"
     _token_in_denylist_callback = None
+    _denylist_threadpool_size = 8
+    _denylist_executor = None
+    _blocking_callback_warned = False
+    _denylist_guarded = False
+    _denylist_timeout = None
+    _denylist_breaker: Optional["CircuitBreaker"] = None
+    _denylist_failure_policy: Optional[Union[str, Dict[str, str]]] = None
+    _denylist_flights: Optional["SingleFlight"] = None
+    _revocation_queue = None
+    _watermark_store = None
+    _rejected_tokens: Optional["RejectedTokenCache"] = None
+    _verification_limiter: Optional["VerificationLimiter"] = None
     _access_token_expires = timedelta(minutes=15)
     _refresh_token_expires = timedelta(days=30)
     _other_token_expires = timedelta(days=30)
+    _metrics_enabled = False
+    _metrics_dir = None
+    _tracer = None
+    _claims_store = None
+    _claims_model = None
+    _claims_converter: Optional[Callable[[Dict], Any]] = None
+    _compact_claims = False
+    _claim_compactor = ClaimCompactor()
+    _tenant: Optional["TenantConfig"] = None
+    _tenants: Dict[str, "TenantConfig"] = {}
+    _tenant_hosts: Dict[bytes, "TenantConfig"] = {}
 
     @property
     def paseto_in_headers(self) -> bool:
@@ -36,6 +72,9 @@ class AuthConfig:
 
     @classmethod
     def load_config(cls, settings: Callable[..., List[tuple]]) -> "AuthConfig":
+        # Building the pydantic model is deferred until the config gets loaded
+        from fastapi_paseto_auth.config import LoadConfig
+
         try:
             config = LoadConfig(**{key.lower(): value for key, value in settings()})
 
@@ -56,11 +95,161 @@ class AuthConfig:
             cls._access_token_expires = config.authpaseto_access_token_expires
             cls._refresh_token_expires = config.authpaseto_refresh_token_expires
             cls._other_token_expires = config.authpaseto_other_token_expires
+            cls._metrics_enabled = config.authpaseto_metrics_enabled
+            cls._metrics_dir = config.authpaseto_metrics_dir
+            cls._compact_claims = config.authpaseto_compact_claims
+            cls._claim_compactor = ClaimCompactor(config.authpaseto_claim_maps)
+            cls._rejected_tokens = None
+            if config.authpaseto_rejected_token_cache_size:
+                from fastapi_paseto_auth.negative_cache import RejectedTokenCache
+
+                cls._rejected_tokens = RejectedTokenCache(
+                    config.authpaseto_rejected_token_cache_size,
+                    config.authpaseto_rejected_token_cache_ttl,
+                )
+            if (
+                cls._denylist_threadpool_size
+                != config.authpaseto_denylist_threadpool_size
+            ):
+                cls._denylist_threadpool_size = (
+                    config.authpaseto_denylist_threadpool_size
+                )
+                if cls._denylist_executor is not None:
+                    cls._denylist_executor.shutdown(wait=False)
+                    cls._denylist_executor = None
+            cls._denylist_flights = None
+            if config.authpaseto_denylist_single_flight:
+                from fastapi_paseto_auth.singleflight import SingleFlight
+
+                cls._denylist_flights = SingleFlight()
+            cls._denylist_timeout = config.authpaseto_denylist_timeout
+            cls._denylist_failure_policy = config.authpaseto_denylist_failure_policy
+            cls._denylist_breaker = None
+            if config.authpaseto_denylist_failure_threshold:
+                from fastapi_paseto_auth.breaker import CircuitBreaker
+
+                cls._denylist_breaker = CircuitBreaker(
+                    config.authpaseto_denylist_failure_threshold,
+                    config.authpaseto_denylist_reset_timeout,
+                    on_state_change=cls._set_denylist_breaker_state,
+                )
+            # Failures of the lookups are handled only once one of the options is set,
+            # otherwise the errors of the denylist callback are raised as they are
+            cls._denylist_guarded = (
+                cls._denylist_timeout is not None
+                or cls._denylist_breaker is not None
+                or cls._denylist_failure_policy is not None
+            )
+            cls._verification_limiter = None
+            if config.authpaseto_max_concurrent_verifications:
+                from fastapi_paseto_auth.limiter import VerificationLimiter
+
+                cls._verification_limiter = VerificationLimiter(
+                    config.authpaseto_max_concurrent_verifications,
+                    config.authpaseto_verification_queue_size,
+                    config.authpaseto_verification_queue_timeout,
+                )
+
+            if cls._metrics_dir:
+                metrics.REGISTRY.set_store(metrics.FileMetricsStore(cls._metrics_dir))
         except ValidationError:
             raise
         except Exception:
             raise TypeError("Config must be pydantic 'BaseSettings' or list of tuple")
 
+        cls._load_keys()
+
+    @classmethod
+    def _set_denylist_breaker_state(cls, state: str) -> None:
+        if cls._metrics_enabled:
+            metrics.DENYLIST_BREAKER_STATE.set(
+                {"closed": 0, "half_open": 1, "open": 2}[state]
+            )
+
+    @classmethod
+    def _load_keys(cls) -> None:
+        """
+        Parse the configured keys for the configured version once, so a malformed
+        key fails when the config gets loaded instead of on the first request
+        """
+        cls._keys = {}
+        cls._parse_keys(
+            cls._version, cls._secret_key, cls._private_key, cls._public_key
+        )
+        for tenant in cls._tenants.values():
+            cls._parse_keys(
+                tenant.version, tenant.secret_key, tenant.private_key, tenant.public_key
+            )
+
+    @classmethod
+    def _parse_keys(
+        cls,
+        version: int,
+        secret_key: Optional[str],
+        private_key: Optional[str],
+        public_key: Optional[str],
+    ) -> None:
+        """
+        Parse the keys into the key cache, keys shared between configurations
+        are parsed only once
+        """
+        from fastapi_paseto_auth.paseto import new_key
+
+        configured_keys = (
+            ("authpaseto_secret_key", secret_key, "local", None),
+            ("authpaseto_private_key", private_key, "public", True),
+            ("authpaseto_public_key", public_key, "public", None),
+        )
+        for option, key, purpose, secret in configured_keys:
+            if key is None or (version, purpose, key) in cls._keys:
+                continue
+            try:
+                parsed_key = new_key(version, purpose, key)
+            except (ValueError, TypeError) as err:
+                raise ValueError(
+                    f"{option} is not a valid v{version}.{purpose} key: {err}"
+                ) from err
+            if secret and not parsed_key.is_secret:
+                raise ValueError(f"{option} must be a private key")
+            cls._keys[(version, purpose, key)] = parsed_key
+
+    @classmethod
+    def tenant_loader(cls, callback: Callable[..., Dict[str, Any]]) -> "AuthConfig":
+        """
+        This decorator sets the callback function that returns the configurations
+        of the tenants. By default, there are no tenants and the config loaded by
+        `load_config` is used for every request.
+
+        *HINT*: The callback must be a function that takes no arguments and returns
+        a dictionary of tenant names and their settings, in the same form as the
+        settings returned to `load_config`. The keys, issuers, audience, purpose,
+        version, leeway and lifetimes are set per tenant, the other options are
+        shared by all tenants.
+        """
+        from fastapi_paseto_auth.config import LoadConfig
+        from fastapi_paseto_auth.tenants import TenantConfig, settings_items
+
+        tenants = {}
+        tenant_hosts = {}
+        for name, settings in callback().items():
+            config = LoadConfig(
+                **{key.lower(): value for key, value in settings_items(settings)}
+            )
+            tenant = TenantConfig(name, config)
+            for host in tenant.hosts:
+                host = host.lower().encode("latin-1")
+                if host in tenant_hosts:
+                    raise ValueError(
+                        f"The host {host.decode()} is used by the tenants "
+                        f"{tenant_hosts[host].name} and {name}"
+                    )
+                tenant_hosts[host] = tenant
+            tenants[name] = tenant
+
+        cls._tenants = tenants
+        cls._tenant_hosts = tenant_hosts
+        cls._load_keys()
+
     @classmethod
     def token_in_denylist_loader(cls, callback: Callable[..., bool]) -> "AuthConfig":
         """
@@ -74,3 +263,69 @@ class AuthConfig:
         or *`False`* otherwise.
         """
         cls._token_in_denylist_callback = callback
+
+    @classmethod
+    def revocation_queue_loader(cls, callback: Callable[..., Any]) -> "AuthConfig":
+        """
+        This decorator sets the callback function that returns the revocation queue
+        used by `revoke_token`. Without a `token_in_denylist_loader` callback,
+        the queue is also used to check whether a token has been revoked.
+
+        *HINT*: The callback must be a function that takes no arguments and returns
+        a `fastapi_paseto_auth.denylist.RevocationQueue`.
+        """
+        cls._revocation_queue = callback()
+
+    @classmethod
+    def watermark_store_loader(cls, callback: Callable[..., Any]) -> "AuthConfig":
+        """
+        This decorator sets the callback function that returns the store of
+        "revoked before" watermarks used by `revoke_subject`. Once set, the tokens
+        of a subject issued at or before its watermark are rejected.
+        By default, no watermark store is set.
+
+        *HINT*: The callback must be a function that takes no arguments and returns
+        a `fastapi_paseto_auth.denylist.WatermarkStore`.
+        """
+        cls._watermark_store = callback()
+
+    @classmethod
+    def tracer_loader(cls, callback: Callable[..., Any]) -> "AuthConfig":
+        """
+        This decorator sets the callback function that returns the tracer used
+        to trace token creation, verification and denylist lookups.
+        By default, nothing is traced.
+
+        *HINT*: The callback must be a function that takes no arguments and returns
+        an OpenTelemetry compatible tracer, e.g. `trace.get_tracer(__name__)`,
+        or `None` to disable tracing again.
+        """
+        cls._tracer = callback()
+
+    @classmethod
+    def claims_model_loader(cls, callback: Callable[..., Any]) -> "AuthConfig":
+        """
+        This decorator sets the callback function that returns the model of the
+        claims returned by `get_claims()`. By default, no claims model is set.
+
+        *HINT*: The callback must be a function that takes no arguments and returns
+        a dataclass, a msgspec Struct or a pydantic model class.
+        """
+        from fastapi_paseto_auth.claims_model import compile_claims_model
+
+        model = callback()
+        # Not bound to the instances it's called from
+        cls._claims_converter = staticmethod(compile_claims_model(model))
+        cls._claims_model = model
+
+    @classmethod
+    def claims_store_loader(cls, callback: Callable[..., Any]) -> "AuthConfig":
+        """
+        This decorator sets the callback function that returns the claims store
+        used by reference tokens, which keep their user claims server-side.
+        By default, no claims store is set and reference tokens can't be created.
+
+        *HINT*: The callback must be a function that takes no arguments and returns
+        a `fastapi_paseto_auth.claims_store.ClaimsStore`, e.g. `InMemoryClaimsStore()`.
+        """
+        cls._claims_store = callback()
@@ -1,14 +1,34 @@
+import asyncio
 import binascii
+import contextvars
+import functools
+import re
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Sequence, Union, List
-from fastapi import Request, Response
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Optional,
+    Dict,
+    Sequence,
+    Tuple,
+    Union,
+    List,
+)
+from fastapi import Request, Response, WebSocket, status
+from starlette.websockets import WebSocketState
 from fastapi_paseto_auth.auth_config import AuthConfig
+from fastapi_paseto_auth.compaction import VERSION_CLAIM
+from fastapi_paseto_auth import metrics, paseto, tenants, tracing
 import uuid
-import json
-from pyseto import Key, Paseto, Token
-from pyseto.exceptions import VerifyError, DecryptError, SignError
 import base64
 from fastapi_paseto_auth.exceptions import (
+    AuthPASETOException,
     InvalidHeaderError,
     InvalidPASETOPurposeError,
     PASETODecodeError,
@@ -20,22 +40,78 @@ from fastapi_paseto_auth.exceptions import (
     InvalidPASETOVersionError,
     InvalidPASETOArgumentError,
     InvalidTokenTypeError,
+    InvalidTenantError,
+    DenylistUnavailableError,
 )
 
+# The ASCII whitespace bytes.split() splits on
+_WHITESPACE = re.compile(rb"[ \t\n\r\x0b\x0c]+")
+
+# Attribute of the request state with the tokens verified while serving the request
+_VERIFIED_TOKENS = "authpaseto_verified_tokens"
+# Attribute of the WebSocket state with the token the expiry timer was set for and the timer
+_EXPIRY_TIMER = "authpaseto_expiry_timer"
+
+_denylist_executor_lock = threading.Lock()
+
 
 class AuthPASETO(AuthConfig):
-    def __init__(self, request: Request = None, response: Response = None) -> None:
+    def __init__(
+        self,
+        request: Request = None,
+        response: Response = None,
+        websocket: WebSocket = None,
+    ) -> None:
         """
-        Get PASETO header from incoming request and decode it
+        Get PASETO header from incoming request or WebSocket handshake and decode it
         """
-        # self._token = self._get_paseto_from_header(request.headers.get(self._header_name))
+        request = request or websocket
         if request:
+            self._request = request
+            if self._tenant_hosts:
+                host = self._get_raw_header(request, b"host")
+                if host:
+                    tenant = self._tenant_hosts.get(tenants.normalize_host(host))
+                    if tenant is not None:
+                        tenant.apply(self)
+
             if self.paseto_in_headers:
-                auth_header = request.headers.get(self._header_name)
+                auth_header = self._get_raw_header(
+                    request, self._header_name.lower().encode("latin-1")
+                )
                 if auth_header:
-                    self._token = self._get_paseto_from_header(auth_header)
+                    try:
+                        self._token = self._get_paseto_from_header(auth_header)
+                    except InvalidHeaderError as err:
+                        if self._metrics_enabled:
+                            self._observe_verification(None, err)
+                        raise
+
+    def _set_token(self, token: Union[str, bytes]) -> None:
+        """
+        Replace the token to verify, and forget what was parsed and verified
+        of the previous one
+        """
+        self._token = token
+        self._raw_token = None
+        self._token_parts = []
+        self._token_footer = b""
+        self._decoded_token = None
+        self._token_payload = None
+        self._current_user = None
+
+    def _get_raw_header(self, request: Request, header_name: bytes) -> Optional[bytes]:
+        """
+        Get the value of a header straight from the raw ASGI headers, without
+        building the decoded headers of the request
+        :param header_name: lowercase name of the header
+        """
+        for name, value in request.scope["headers"]:
+            if name == header_name:
+                return value
+        return None
 
-    def _get_paseto_from_header(self, auth_header: str) -> Optional[str]:
+    def _get_paseto_from_header(self, auth_header: Union[str, bytes]) -> bytes:
         """
         Get token from the headers
         :param auth_header: value from HeaderName
@@ -43,29 +119,63 @@ class AuthPASETO(AuthConfig):
 
         header_name, header_type = self._header_name, self._header_type
 
-        parts: List[str] = auth_header.split()
-
-        token: Optional[str] = None
+        if isinstance(auth_header, str):
+            auth_header = auth_header.encode("latin-1")
+        auth_header = auth_header.strip()
 
         # Make sure the header is in a valid format that we are expecting
         if not header_type:
             # <HeaderName>: <PASETO>
-            if len(parts) != 1:
+            if not auth_header or _WHITESPACE.search(auth_header):
                 raise InvalidHeaderError(
                     status_code=422,
                     message=f"Bad {header_name} header. Excepted value 'Bearer <PASETO>'",
                 )
-            token = parts[0]
-        else:
-            # <HeaderName>: <HeaderType> <PASETO>
-            if not parts[0].__contains__(header_type) or len(parts) != 2:
-                raise InvalidHeaderError(
-                    status_code=422,
-                    message=f"Bad {header_name} header. Expected value '{header_type} <PASETO>'",
-                )
+            return auth_header
+
+        # <HeaderName>: <HeaderType> <PASETO>
+        separator = _WHITESPACE.search(auth_header)
+        if (
+            separator is None
+            or header_type.encode("latin-1") not in auth_header[: separator.start()]
+            or _WHITESPACE.search(auth_header, separator.end())
+        ):
+            raise InvalidHeaderError(
+                status_code=422,
+                message=f"Bad {header_name} header. Expected value '{header_type} <PASETO>'",
+            )
 
-            token = parts[1]
-        return token
+        return auth_header[separator.end() :]
+
+    def use_tenant(self, name: str) -> None:
+        """
+        Use the configuration of a tenant for this request, e.g. on a login
+        endpoint that gets the tenant from the request body
+        """
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            raise ValueError(f"Unknown tenant {name}")
+        tenant.apply(self)
+
+    def get_tenant(self) -> Optional[str]:
+        """
+        :return: name of the tenant of this request, None without a tenant
+        """
+        return self._tenant.name if self._tenant else None
+
+    def _resolve_token_tenant(self) -> None:
+        """
+        Use the tenant named in the footer of the token, which must match
+        the tenant already resolved from the host
+        """
+        name = tenants.tenant_from_footer(self._token_footer)
+        if name is None:
+            return
+        tenant = self._tenants.get(name)
+        if tenant is None or (self._tenant is not None and self._tenant is not tenant):
+            raise InvalidTenantError(status_code=422, message="Invalid PASETO tenant")
+        if self._tenant is None:
+            tenant.apply(self)
 
     def _get_paseto_identifier(self) -> str:
         return str(uuid.uuid4())
@@ -100,6 +210,73 @@ class AuthPASETO(AuthConfig):
                 )
             return self._public_key
 
+    def _get_key(self, version: int, purpose: str, process: str) -> Any:
+        """
+        Get the parsed key for the version and purpose, keys are parsed only once
+        and cached for as long as the key material stays the same
+        """
+        secret_key = self._get_secret_key(purpose, process)
+        cache_key = (version, purpose, secret_key)
+
+        key = self._keys.get(cache_key)
+        if key is None:
+            key = paseto.new_key(version, purpose, secret_key)
+            self._keys[cache_key] = key
+        return key
+
+    @classmethod
+    def warm_up(cls) -> Dict[str, float]:
+        """
+        Parse the configured keys and run a token through each configured purpose,
+        of the default config and of every tenant, so the first requests don't pay
+        for the lazy imports and first-time setup. Meant to be called once at
+        startup, after the config and the tenants have been loaded
+        :return: seconds spent per version and purpose, prefixed with the name
+                 of the tenant for the tenants, and in total
+        """
+        start = time.perf_counter()
+        cls._load_keys()
+
+        timings = {}
+        for tenant in (None, *cls._tenants.values()):
+            # The warm-up tokens are neither traced, counted nor looked up in the denylist
+            authorize = cls()
+            authorize._tracer = None
+            authorize._metrics_enabled = False
+            authorize._denylist_enabled = False
+            prefix = ""
+            if tenant is not None:
+                tenant.apply(authorize)
+                prefix = f"{tenant.name}:"
+
+            for purpose, encoding_key, decoding_key in (
+                ("local", authorize._secret_key, authorize._secret_key),
+                ("public", authorize._private_key, authorize._public_key),
+            ):
+                if not decoding_key:
+                    continue
+                purpose_start = time.perf_counter()
+                if encoding_key:
+                    # Issued for the configured checks, so the token passes them
+                    token = authorize._create_token(
+                        subject="warm-up",
+                        type_token="access",
+                        exp_seconds=60,
+                        purpose=purpose,
+                        issuer=authorize._decode_issuer,
+                        audience=authorize._decode_audience,
+                    )
+                    authorize._set_token(token)
+                    authorize._decode_token()
+                else:
+                    authorize._get_key(authorize._version, purpose, "decode")
+                timings[f"{prefix}v{authorize._version}.{purpose}"] = (
+                    time.perf_counter() - purpose_start
+                )
+
+        timings["total"] = time.perf_counter() - start
+        return timings
+
     def _get_int_from_datetime(self, value: datetime) -> int:
         """
         :param value: datetime with or without timezone, if don't contains timezone
@@ -122,10 +299,15 @@ class AuthPASETO(AuthConfig):
         user_claims: Optional[Dict[str, Union[str, bool]]] = {},
         version: Optional[int] = None,
         base64_encode: bool = False,
+        reference_claims: bool = False,
     ) -> str:
         """
         Create a token
+        :param reference_claims: keep the user claims in the claims store and
+                                 embed only a reference to them in the token
         """
+        start = time.perf_counter() if self._metrics_enabled else None
+
         if not isinstance(subject, (str, int)):
             raise TypeError("Subject must be a string or int")
         if fresh is not None and not isinstance(fresh, bool):
@@ -138,25 +320,37 @@ class AuthPASETO(AuthConfig):
             raise TypeError("version must be an integer")
         if user_claims and not isinstance(user_claims, dict):
             raise TypeError("User claims must be a dictionary")
+        # With a claims store, a token with a ref claim is a reference token
+        if user_claims and "ref" in user_claims and self._claims_store is not None:
+            raise ValueError(
+                "The 'ref' claim is reserved for reference tokens "
+                "when a claims store is loaded"
+            )
+        if user_claims and VERSION_CLAIM in user_claims:
+            raise ValueError(
+                f"The '{VERSION_CLAIM}' claim is reserved "
+                "for the version of the claim map"
+            )
 
-        reserved_claims = {
+        # A single dictionary for the reserved, custom and user claims, in that order
+        now = datetime.now(tz=timezone.utc)
+        claims = {
             "sub": subject,
-            "nbf": datetime.now(tz=timezone.utc).isoformat(timespec="seconds"),
+            "nbf": paseto._format_datetime(now),
             "jti": self._get_paseto_identifier(),
+            "type": type_token,
         }
 
-        custom_claims = {"type": type_token}
-
         if type_token == "access":
-            custom_claims["fresh"] = fresh
+            claims["fresh"] = fresh
 
         issuer = issuer or self._encode_issuer
 
         if issuer:
-            custom_claims["iss"] = issuer
+            claims["iss"] = issuer
 
         if audience:
-            custom_claims["aud"] = audience
+            claims["aud"] = audience
 
         purpose = purpose or self._purpose
         version = version or self._version
@@ -164,23 +358,60 @@ class AuthPASETO(AuthConfig):
         if purpose not in ("local", "public"):
             raise ValueError("Purpose must be local or public.")
 
-        secret_key = self._get_secret_key(purpose, "encode")
-
-        paseto = Paseto.new(exp=exp_seconds, include_iat=True)
-
-        encoding_key = Key.new(version=version, purpose=purpose, key=secret_key)
-
-        token = paseto.encode(
-            encoding_key,
-            {**reserved_claims, **custom_claims, **user_claims},
-            serializer=json,
-        )
+        if reference_claims and user_claims:
+            user_claims = self._store_user_claims(user_claims, exp_seconds)
+        if user_claims:
+            claims.update(user_claims)
+
+        encoding_key = self._get_key(version, purpose, "encode")
+
+        with tracing.start_span(
+            self._tracer,
+            "fastapi_paseto_auth.create_token",
+            {
+                "paseto.type": type_token,
+                "paseto.version": f"v{version}",
+                "paseto.purpose": purpose,
+            }
+            if self._tracer is not None
+            else None,
+        ):
+            token = paseto.encode(
+                encoding_key,
+                claims,
+                exp_seconds=exp_seconds,
+                now=now,
+                footer=self._tenant.footer if self._tenant else b"",
+                compactor=self._claim_compactor if self._compact_claims else None,
+            )
 
         if base64_encode:
             token = base64.b64encode(token)
 
+        if start is not None:
+            labels = {"type": type_token, "version": f"v{version}", "purpose": purpose}
+            metrics.TOKENS_CREATED.inc(**labels)
+            metrics.TOKEN_CREATION_SECONDS.observe(
+                time.perf_counter() - start, **labels
+            )
+
         return token.decode("utf-8")
 
+    def _store_user_claims(self, user_claims: Dict, exp_seconds: int) -> Dict:
+        """
+        Save the user claims in the claims store
+        :return: the claims to embed in the token instead, a reference to the stored ones
+        """
+        if self._claims_store is None:
+            raise RuntimeError(
+                "A claims store must be provided via the "
+                "'@AuthPASETO.claims_store_loader' to create reference tokens"
+            )
+
+        reference = uuid.uuid4().hex
+        self._claims_store.set(reference, user_claims, exp_seconds)
+        return {"ref": reference}
+
     def _has_token_in_denylist_callback(self) -> bool:
         """
         Return True if token denylist callback set
@@ -195,17 +426,330 @@ class AuthPASETO(AuthConfig):
         """
         if not self._denylist_enabled:
             return
+        self._check_denylist_lookup(asynchronous=False)
+
+        with tracing.start_span(
+            self._tracer,
+            "fastapi_paseto_auth.denylist_lookup",
+            {"paseto.type": str(payload.get("type"))},
+        ) as span:
+            if self._has_token_in_denylist_callback():
+                self._warn_if_blocking_event_loop()
+            if self._denylist_guarded:
+                revoked = self._guarded_revocation_lookup(payload)
+            else:
+                revoked = self._lookup_revocation(payload)
+            span.set_attribute("paseto.revoked", bool(revoked))
 
-        if not self._has_token_in_denylist_callback():
+        if revoked:
+            raise RevokedTokenError(status_code=401, message="Token has been revoked")
+
+    async def _check_token_is_revoked_async(self, payload: Dict) -> None:
+        """
+        Same as _check_token_is_revoked, with the lookup run in the denylist threadpool
+        """
+        if not self._denylist_enabled:
+            return
+        self._check_denylist_lookup(asynchronous=True)
+
+        with tracing.start_span(
+            self._tracer,
+            "fastapi_paseto_auth.denylist_lookup",
+            {"paseto.type": str(payload.get("type"))},
+        ) as span:
+            if self._denylist_guarded:
+                revoked = await self._guarded_revocation_lookup_async(payload)
+            else:
+                revoked = await self._run_revocation_lookup(payload)
+            span.set_attribute("paseto.revoked", bool(revoked))
+
+        if revoked:
+            raise RevokedTokenError(status_code=401, message="Token has been revoked")
+
+    def _is_token_revoked(self, payload: Dict) -> bool:
+        """
+        Look the token up with the denylist callback, or the revocation queue
+        """
+        if self._has_token_in_denylist_callback():
+            return self._token_in_denylist_callback.__func__(payload)
+        return self._revocation_queue.is_revoked(str(payload.get("jti")))
+
+    def _has_async_denylist_callback(self) -> bool:
+        """
+        Return True if the token denylist callback is a coroutine function
+        """
+        return self._has_token_in_denylist_callback() and (
+            asyncio.iscoroutinefunction(self._token_in_denylist_callback.__func__)
+        )
+
+    def _check_denylist_lookup(self, asynchronous: bool) -> None:
+        if (
+            not self._has_token_in_denylist_callback()
+            and self._revocation_queue is None
+        ):
             raise RuntimeError(
                 "A token_in_denylist_callback must be provided via "
                 "the '@AuthPASETO.token_in_denylist_loader' if "
                 "authpaseto_denylist_enabled is 'True'"
             )
+        if not asynchronous and self._has_async_denylist_callback():
+            raise RuntimeError(
+                "An async token_in_denylist_callback can only be awaited "
+                "by 'paseto_required_async()'"
+            )
+
+    def _lookup_revocation(self, payload: Dict) -> bool:
+        """
+        Look the token up, sharing the lookup in flight in another thread
+        for the same token when authpaseto_denylist_single_flight is true
+        """
+        jti = payload.get("jti")
+        if self._denylist_flights is None or jti is None:
+            return self._is_token_revoked(payload)
+        return self._denylist_flights.do(jti, self._is_token_revoked, payload)
+
+    async def _run_revocation_lookup(self, payload: Dict) -> bool:
+        """
+        Same as _lookup_revocation, for the async paths
+        """
+        jti = payload.get("jti")
+        if self._denylist_flights is None or jti is None:
+            return await self._call_revocation_lookup(payload)
+        return await self._denylist_flights.do_async(
+            jti, self._call_revocation_lookup, payload
+        )
+
+    async def _call_revocation_lookup(self, payload: Dict) -> bool:
+        """
+        Await the async denylist callback, or run the lookup in the denylist threadpool
+        """
+        if self._has_async_denylist_callback():
+            return await self._token_in_denylist_callback.__func__(payload)
+        # The context is copied for the lookup to be traced in the current span
+        lookup = functools.partial(
+            contextvars.copy_context().run, self._is_token_revoked, payload
+        )
+        return await asyncio.get_running_loop().run_in_executor(
+            self._get_denylist_executor(), lookup
+        )
+
+    def _guarded_revocation_lookup(self, payload: Dict) -> bool:
+        """
+        Look the token up through the circuit breaker, giving up after
+        authpaseto_denylist_timeout seconds
+        """
+        breaker = self._denylist_breaker
+        if breaker is not None and not breaker.allow():
+            return self._denylist_lookup_failed(payload, "circuit_open")
+
+        try:
+            if self._denylist_timeout is None:
+                revoked = self._lookup_revocation(payload)
+            else:
+                # A blocking call can only be given up on from another thread
+                revoked = (
+                    self._get_denylist_executor()
+                    .submit(
+                        contextvars.copy_context().run, self._lookup_revocation, payload
+                    )
+                    .result(timeout=self._denylist_timeout)
+                )
+        except FutureTimeoutError:
+            return self._denylist_lookup_failed(payload, "timeout")
+        except Exception:
+            return self._denylist_lookup_failed(payload, "error")
+
+        if breaker is not None:
+            breaker.record_success()
+        return revoked
+
+    async def _guarded_revocation_lookup_async(self, payload: Dict) -> bool:
+        """
+        Same as _guarded_revocation_lookup, for the async paths
+        """
+        breaker = self._denylist_breaker
+        if breaker is not None and not breaker.allow():
+            return self._denylist_lookup_failed(payload, "circuit_open")
+
+        try:
+            revoked = await asyncio.wait_for(
+                self._run_revocation_lookup(payload), self._denylist_timeout
+            )
+        except asyncio.TimeoutError:
+            return self._denylist_lookup_failed(payload, "timeout")
+        except Exception:
+            return self._denylist_lookup_failed(payload, "error")
+
+        if breaker is not None:
+            breaker.record_success()
+        return revoked
+
+    def _denylist_lookup_failed(self, payload: Dict, reason: str) -> bool:
+        """
+        Apply the failure policy of the token type to a lookup that failed
+        :param reason: timeout, error or circuit_open
+        :return: False when the policy is to fail open, the token is accepted
+        """
+        token_type = payload.get("type")
+        policy = self._denylist_failure_policy
+        if isinstance(policy, dict):
+            policy = policy.get(token_type)
+        policy = policy or "closed"
+
+        if reason != "circuit_open" and self._denylist_breaker is not None:
+            self._denylist_breaker.record_failure()
+        if self._metrics_enabled:
+            metrics.DENYLIST_LOOKUP_FAILURES.inc(
+                type=str(token_type), reason=reason, policy=policy
+            )
 
-        if self._token_in_denylist_callback.__func__(payload):
+        if policy == "open":
+            return False
+        raise DenylistUnavailableError(
+            status_code=503, message="Token denylist is unavailable"
+        )
+
+    @classmethod
+    def _get_denylist_executor(cls) -> ThreadPoolExecutor:
+        """
+        :return: the threadpool of the denylist lookups of the async paths,
+                 bounded by authpaseto_denylist_threadpool_size
+        """
+        executor = cls._denylist_executor
+        if executor is None:
+            with _denylist_executor_lock:
+                executor = cls._denylist_executor
+                if executor is None:
+                    executor = ThreadPoolExecutor(
+                        max_workers=cls._denylist_threadpool_size,
+                        thread_name_prefix="authpaseto-denylist",
+                    )
+                    cls._denylist_executor = executor
+        return executor
+
+    def _warn_if_blocking_event_loop(self) -> None:
+        """
+        Warn, once, when the denylist callback is called from the thread of
+        a running event loop, where it blocks every other request
+        """
+        if AuthPASETO._blocking_callback_warned:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        AuthPASETO._blocking_callback_warned = True
+        warnings.warn(
+            "The token_in_denylist_callback is called on the event loop and blocks "
+            "it, use 'await Authorize.paseto_required_async()' in async endpoints "
+            "to run it in a threadpool",
+            RuntimeWarning,
+            stacklevel=4,
+        )
+
+    def _check_subject_watermark(self, payload: Dict) -> None:
+        """
+        Reject the token if it was issued at or before the "revoked before"
+        watermark of its subject
+        """
+        watermark = self._watermark_store.get(str(payload.get("sub")))
+        self._compare_subject_watermark(payload, watermark)
+
+    async def _check_subject_watermark_async(self, payload: Dict) -> None:
+        """
+        Same as _check_subject_watermark, with the watermark of a store that
+        may block read in the denylist threadpool
+        """
+        store = self._watermark_store
+        subject = str(payload.get("sub"))
+        if store.blocking:
+            lookup = functools.partial(
+                contextvars.copy_context().run, store.get, subject
+            )
+            watermark = await asyncio.get_running_loop().run_in_executor(
+                self._get_denylist_executor(), lookup
+            )
+        else:
+            watermark = store.get(subject)
+        self._compare_subject_watermark(payload, watermark)
+
+    @staticmethod
+    def _compare_subject_watermark(payload: Dict, watermark: Optional[float]) -> None:
+        if watermark is None:
+            return
+        try:
+            issued_at = paseto._parse_datetime(payload["iat"]).timestamp()
+        except Exception:
+            issued_at = None
+        if issued_at is None or issued_at <= watermark:
             raise RevokedTokenError(status_code=401, message="Token has been revoked")
 
+    def revoke_subject(self, subject: Optional[Union[str, int]] = None) -> None:
+        """
+        Revoke every token of a subject issued until now, e.g. to log a user
+        out everywhere, by storing a single watermark for the subject
+        :param subject: subject of the tokens, defaults to the current subject
+        """
+        if self._watermark_store is None:
+            raise RuntimeError(
+                "A watermark store must be provided via "
+                "the '@AuthPASETO.watermark_store_loader' to revoke subjects"
+            )
+
+        if subject is None:
+            subject = self.get_subject()
+            if subject is None:
+                raise RuntimeError("There is no verified token to revoke")
+
+        # The watermark is only needed until the last token it revokes expires
+        lifetimes = [
+            self._get_expiry_seconds(type_token)
+            for type_token in ("access", "refresh", "other")
+        ]
+        ttl = 0 if 0 in lifetimes else max(lifetimes) + self._get_leeway_seconds()
+        self._watermark_store.set(str(subject), time.time(), ttl)
+
+    def _get_leeway_seconds(self) -> int:
+        if isinstance(self._decode_leeway, timedelta):
+            return int(self._decode_leeway.total_seconds())
+        return self._decode_leeway or 0
+
+    def revoke_token(
+        self, jti: Optional[str] = None, ttl: Optional[int] = None
+    ) -> None:
+        """
+        Revoke a token through the revocation queue, the current worker rejects
+        it right away and the other workers once the queue has been flushed
+        :param jti: identifier of the token, defaults to the current token
+        :param ttl: seconds to keep the revocation for, defaults to the remaining
+                    lifetime of the current token
+        """
+        if self._revocation_queue is None:
+            raise RuntimeError(
+                "A revocation queue must be provided via "
+                "the '@AuthPASETO.revocation_queue_loader' to revoke tokens"
+            )
+
+        if jti is None:
+            jti = self.get_jti()
+            if jti is None:
+                raise RuntimeError("There is no verified token to revoke")
+        if ttl is None:
+            ttl = self._get_remaining_lifetime()
+        self._revocation_queue.revoke(jti, ttl)
+
+    def _get_remaining_lifetime(self) -> int:
+        """
+        :return: seconds until the current token expires, 0 if it never does
+        """
+        exp = self._get_claim("exp")
+        if not exp:
+            return 0
+        remaining = paseto._parse_datetime(exp) - datetime.now(tz=timezone.utc)
+        # Keep the revocation for at least a second, the token may still be
+        # accepted within the decode leeway
+        return max(int(remaining.total_seconds()) + 1, 1)
+
     def _get_expiry_seconds(
         self,
         type_token: str,
@@ -252,6 +796,7 @@ class AuthPASETO(AuthConfig):
         audience: Optional[Union[str, Sequence[str]]] = None,
         user_claims: Optional[Dict] = {},
         base64_encode: Optional[bool] = False,
+        reference_claims: bool = False,
     ) -> str:
         """
         Create a access token with 15 minutes for expired time (default),
@@ -268,6 +813,7 @@ class AuthPASETO(AuthConfig):
             user_claims=user_claims,
             issuer=self._encode_issuer,
             base64_encode=base64_encode,
+            reference_claims=reference_claims,
         )
 
     def create_refresh_token(
@@ -278,6 +824,7 @@ class AuthPASETO(AuthConfig):
         audience: Optional[Union[str, Sequence[str]]] = None,
         user_claims: Optional[Dict] = {},
         base64_encode: bool = False,
+        reference_claims: bool = False,
     ) -> str:
         """
         Create a refresh token with 30 days for expired time (default),
@@ -292,6 +839,7 @@ class AuthPASETO(AuthConfig):
             audience=audience,
             user_claims=user_claims,
             base64_encode=base64_encode,
+            reference_claims=reference_claims,
         )
 
     def create_token(
@@ -303,6 +851,7 @@ class AuthPASETO(AuthConfig):
         audience: Optional[Union[str, Sequence[str]]] = None,
         user_claims: Optional[Dict] = {},
         base64_encode: bool = False,
+        reference_claims: bool = False,
     ) -> str:
         """
         Create a token with a custom type,
@@ -316,6 +865,7 @@ class AuthPASETO(AuthConfig):
             audience=audience,
             user_claims=user_claims,
             base64_encode=base64_encode,
+            reference_claims=reference_claims,
         )
 
     def _get_token_version(
@@ -353,46 +903,171 @@ class AuthPASETO(AuthConfig):
     def _get_raw_token_parts(
         self,
     ) -> List[str]:
+        """
+        :return: version and purpose of the token
+        """
         if self._token_parts:
             return self._token_parts
 
-        parts = self._token.split(".")
-        if len(parts) != 3:
+        # Only the header and the footer are sliced off, the body is never copied
+        version_end = self._token.find(b".")
+        purpose_end = self._token.find(b".", version_end + 1)
+        body_end = self._token.find(b".", purpose_end + 1)
+        if (
+            version_end == -1
+            or purpose_end == -1
+            or (body_end != -1 and self._token.find(b".", body_end + 1) != -1)
+        ):
             raise PASETODecodeError(status_code=422, message=f"Invalid PASETO format")
+        parts = [
+            self._token[:version_end].decode("latin-1"),
+            self._token[version_end + 1 : purpose_end].decode("latin-1"),
+        ]
+        self._token_footer = self._token[body_end + 1 :] if body_end != -1 else b""
         self._token_parts = parts
         return parts
 
-    def _decode_token(self, base64_encoded: bool = False) -> Token:
+    def _decode_token(self, base64_encoded: bool = False) -> paseto.DecodedToken:
         """
         Verified token and catch all error from paseto package and return decode token
         :param encoded_token: token hash
         :param issuer: expected issuer in the PASETO
         :return: raw data from the hash token in the form of a dictionary
         """
+        verified_key, token = self._get_verified_token(base64_encoded)
+        if token is not None:
+            return token
+
+        with tracing.start_span(
+            self._tracer, "fastapi_paseto_auth.decode_token"
+        ) as span:
+            token = self._decrypt_token(base64_encoded, span)
+            self._check_token_is_revoked(token.payload)
+            if self._watermark_store is not None:
+                self._check_subject_watermark(token.payload)
+            self._accept_token(token)
+
+        self._remember_verified_token(verified_key, token)
+        return token
+
+    async def _decode_token_async(
+        self, base64_encoded: bool = False
+    ) -> paseto.DecodedToken:
+        """
+        Same as _decode_token, but the denylist lookup, which may block,
+        runs in the denylist threadpool instead of the event loop
+        """
+        verified_key, token = self._get_verified_token(base64_encoded)
+        if token is not None:
+            return token
+
+        with tracing.start_span(
+            self._tracer, "fastapi_paseto_auth.decode_token"
+        ) as span:
+            decoding_key = self._prepare_token(base64_encoded, span)
+            limiter = self._verification_limiter
+            if limiter is not None:
+                await limiter.acquire_async()
+            try:
+                token = self._verify_prepared_token(decoding_key, span)
+            finally:
+                if limiter is not None:
+                    limiter.release()
+            await self._check_token_is_revoked_async(token.payload)
+            if self._watermark_store is not None:
+                await self._check_subject_watermark_async(token.payload)
+            self._accept_token(token)
+
+        self._remember_verified_token(verified_key, token)
+        return token
+
+    def _get_verified_token(
+        self, base64_encoded: bool
+    ) -> Tuple[Optional[tuple], Optional[paseto.DecodedToken]]:
+        """
+        Every AuthPASETO of a request shares the tokens it verified, a token
+        is decrypted and checked against the denylist once per request
+        :return: key of the token among the verified tokens of the request,
+                 and the token if it was already verified
+        """
+        if isinstance(self._token, str):
+            self._token = self._token.encode("utf-8")
+
+        verified_key = None
+        if self._request is not None:
+            raw_token = self._token if self._raw_token is None else self._raw_token
+            verified_key = (raw_token, base64_encoded, self._tenant)
+            verified = getattr(self._request.state, _VERIFIED_TOKENS, None)
+            if verified is not None and verified_key in verified:
+                return verified_key, self._use_verified_token(verified[verified_key])
+        return verified_key, None
+
+    def _decrypt_token(self, base64_encoded: bool, span: Any) -> paseto.DecodedToken:
+        """
+        Decrypt or verify the token and check its claims
+        """
+        decoding_key = self._prepare_token(base64_encoded, span)
+        limiter = self._verification_limiter
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return self._verify_prepared_token(decoding_key, span)
+        finally:
+            if limiter is not None:
+                limiter.release()
 
+    def _prepare_token(self, base64_encoded: bool, span: Any) -> Any:
+        """
+        Everything before the crypto operations: decode the base64 token, find
+        its version, purpose, tenant and key, and look it up among the rejected tokens
+        :return: key to decrypt or verify the token with
+        """
         if base64_encoded:
+            # The token as sent is kept, to decode it again on the next check
+            if self._raw_token is None:
+                self._raw_token = self._token
             try:
-                self._token = base64.b64decode(self._token.encode("utf-8")).decode(
-                    "utf-8"
-                )
-            except (UnicodeDecodeError, binascii.Error):
+                token = base64.b64decode(self._raw_token)
+            except binascii.Error:
+                token = None
+            # A PASETO is always ASCII, anything else can't be a valid token
+            if not token or not token.isascii():
                 raise PASETODecodeError(
                     status_code=422, message="Invalid base64 encoding"
                 )
+            self._token = token
 
         purpose = self._get_token_purpose()
         version = self._get_token_version()
-
-        secret_key = self._get_secret_key(purpose=purpose, process="decode")
-        decoding_key = Key.new(version=version, purpose=purpose, key=secret_key)
-
+        span.set_attribute("paseto.version", f"v{version}")
+        span.set_attribute("paseto.purpose", purpose)
+
+        if self._tenants:
+            self._resolve_token_tenant()
+
+        decoding_key = self._get_key(version, purpose, "decode")
+        if self._rejected_tokens is not None:
+            rejection = self._rejected_tokens.get(self._token, decoding_key)
+            if rejection is not None:
+                span.set_attribute("paseto.cached_rejection", True)
+                status_code, message = rejection
+                raise PASETODecodeError(status_code=status_code, message=message)
+        return decoding_key
+
+    def _verify_prepared_token(
+        self, decoding_key: Any, span: Any
+    ) -> paseto.DecodedToken:
+        """
+        Decrypt or verify the token prepared by _prepare_token, the part of
+        the verification that holds a slot of the verification limiter
+        """
         try:
-            paseto = Paseto.new(leeway=self._decode_leeway)
             token = paseto.decode(
-                keys=decoding_key,
-                token=self._token,
-                deserializer=json,
-                aud=self._decode_audience,
+                decoding_key,
+                self._token,
+                leeway=self._decode_leeway,
+                audience=self._decode_audience,
+                compactor=self._claim_compactor if self._compact_claims else None,
             )
 
             if self._decode_issuer:
@@ -404,24 +1079,126 @@ class AuthPASETO(AuthConfig):
                     raise PASETODecodeError(
                         status_code=422, message="Token issuer is not valid"
                     )
+        except PASETODecodeError as err:
+            # A token that isn't active yet will be, every other rejection is final
+            if (
+                self._rejected_tokens is not None
+                and err.message != "Token has not been activated yet."
+            ):
+                self._rejected_tokens.add(
+                    self._token, decoding_key, err.status_code, err.message
+                )
+            raise
 
-            self._check_token_is_revoked(token.payload)
-            self._decoded_token = token
-            if "sub" in token.payload.keys():
-                self._current_user = token.payload["sub"]
-            return token
-        except (DecryptError, SignError, VerifyError) as err:
-            raise PASETODecodeError(status_code=422, message=str(err))
+        span.set_attribute("paseto.type", str(token.payload.get("type")))
+        return token
+
+    def _accept_token(self, token: paseto.DecodedToken) -> None:
+        """
+        Make the token the current one
+        """
+        self._decoded_token = token
+        self._token_payload = None
+        if "sub" in token.payload.keys():
+            self._current_user = token.payload["sub"]
+
+    def _remember_verified_token(
+        self, verified_key: Optional[tuple], token: paseto.DecodedToken
+    ) -> None:
+        if verified_key is None:
+            return
+        state = self._request.state
+        verified = getattr(state, _VERIFIED_TOKENS, None)
+        if verified is None:
+            verified = {}
+            setattr(state, _VERIFIED_TOKENS, verified)
+        verified[verified_key] = (
+            token,
+            self._tenant,
+            self._token,
+            self._raw_token,
+            self._token_parts,
+            self._token_footer,
+        )
+
+    def _use_verified_token(self, verified: tuple) -> paseto.DecodedToken:
+        """
+        Take over a token another AuthPASETO of the request already verified
+        """
+        (
+            token,
+            tenant,
+            self._token,
+            self._raw_token,
+            self._token_parts,
+            self._token_footer,
+        ) = verified
+        if tenant is not None and tenant is not self._tenant:
+            tenant.apply(self)
+        self._decoded_token = token
+        self._token_payload = None
+        if "sub" in token.payload.keys():
+            self._current_user = token.payload["sub"]
+        return token
 
     def get_token_payload(self) -> Optional[Dict[str, Union[str, int, bool]]]:
         """
-        Get payload from token
+        Get payload from token, the user claims of a reference token are fetched
+        from the claims store on the first call
         :return: payload from token
         """
 
-        if self._decoded_token:
-            return self._decoded_token.payload
+        if not self._decoded_token:
+            return None
+
+        if self._token_payload is None:
+            payload = self._decoded_token.payload
+            if "ref" in payload and self._claims_store is not None:
+                payload = self._resolve_reference_claims(payload)
+            self._token_payload = payload
+        return self._token_payload
+
+    def get_claims(self) -> Any:
+        """
+        Get the claims of the token as an instance of the claims model,
+        built once per token
+        :return: claims of the token, None if no token was verified
+        """
+        if self._claims_converter is None:
+            raise RuntimeError(
+                "A claims model must be loaded with claims_model_loader to get claims"
+            )
+        token = self._decoded_token
+        if not token:
+            return None
+
+        if token.claims is None:
+            try:
+                token.claims = self._claims_converter(self.get_token_payload())
+            except (TypeError, ValueError):
+                raise PASETODecodeError(
+                    status_code=422, message="Token claims don't match the claims model"
+                )
+        return token.claims
+
+    def _resolve_reference_claims(self, payload: Dict) -> Dict:
+        """
+        Replace the reference of a reference token with the stored user claims
+        """
+        claims = self._claims_store.get(payload["ref"])
+        if claims is None:
+            raise PASETODecodeError(
+                status_code=401, message="Token claims are no longer available"
+            )
+        payload = {key: value for key, value in payload.items() if key != "ref"}
+        return {**payload, **claims}
 
+    def _get_claim(self, claim: str) -> Any:
+        """
+        Get a claim embedded in the token, without resolving reference claims
+        """
+        if self._decoded_token:
+            return self._decoded_token.payload.get(claim)
         return None
 
     def get_jti(self) -> str:
@@ -430,10 +1207,7 @@ class AuthPASETO(AuthConfig):
         :param encoded_token: The encoded PASETO from parameter
         :return: string of JTI
         """
-        payload = self.get_token_payload()
-        if payload and "jti" in payload.keys():
-            return payload["jti"]
-        return None
+        return self._get_claim("jti")
 
     def get_paseto_subject(self) -> Optional[Union[str, int]]:
         """
@@ -441,11 +1215,7 @@ class AuthPASETO(AuthConfig):
         If no PASETO is present, `None` is returned instead.
         :return: sub of PASETO
         """
-        payload = self.get_token_payload()
-        if payload and "sub" in payload.keys():
-            return payload["sub"]
-
-        return None
+        return self._get_claim("sub")
 
     def get_subject(self) -> Optional[Union[str, int]]:
         """
@@ -456,6 +1226,33 @@ class AuthPASETO(AuthConfig):
 
         return self._current_user
 
+    def _observe_verification(
+        self, start: Optional[float], error: Optional[AuthPASETOException] = None
+    ) -> None:
+        """
+        Record the outcome and, when started, the duration of a verification
+        :param start: value of time.perf_counter() when the verification started
+        :param error: exception that ended the verification, None on success
+        """
+        version, purpose = "unknown", "unknown"
+        if self._token_parts:
+            if self._token_parts[0] in ("v1", "v2", "v3", "v4"):
+                version = self._token_parts[0]
+            if self._token_parts[1] in ("local", "public"):
+                purpose = self._token_parts[1]
+
+        labels = {
+            "type": self._get_claim("type") or "unknown",
+            "version": version,
+            "purpose": purpose,
+            "outcome": metrics.outcome_label(type(error)) if error else "success",
+        }
+        metrics.TOKEN_VERIFICATIONS.inc(**labels)
+        if start is not None:
+            metrics.TOKEN_VERIFICATION_SECONDS.observe(
+                time.perf_counter() - start, **labels
+            )
+
     def paseto_required(
         self,
         optional: bool = False,
@@ -478,23 +1275,195 @@ class AuthPASETO(AuthConfig):
                 message="fresh and refresh_token cannot be True at the same time",
             )
 
-        if not self._token:
-            if not optional:
-                raise MissingTokenError(
-                    status_code=401, message="PASETO Authorization Token required"
-                )
-            else:
+        start = time.perf_counter() if self._metrics_enabled else None
+
+        try:
+            self._verify_token(
+                fresh=fresh,
+                refresh_token=refresh_token,
+                type=type,
+                base64_encoded=base64_encoded,
+            )
+        except (MissingTokenError, PASETODecodeError) as err:
+            if start is not None:
+                self._observe_verification(start, err)
+            if optional:
                 return None
+            raise err
+        except AuthPASETOException as err:
+            if start is not None:
+                self._observe_verification(start, err)
+            raise err
+
+        if start is not None:
+            self._observe_verification(start)
+
+    async def paseto_required_async(
+        self,
+        optional: bool = False,
+        fresh: bool = False,
+        refresh_token: bool = False,
+        type: Optional[str] = None,
+        base64_encoded: bool = False,
+    ) -> None:
+        """
+        Same as paseto_required, for async endpoints. The denylist callback, which
+        usually blocks on a network call, runs in a threadpool instead of the event loop
+        :param optional: if True, the function will not raise an exception if no token is present
+        :param fresh: if True, the function will raise an exception if the token is not fresh
+        :param refresh_token: if True, the function will raise an exception if the token is not a refresh token
+        :return: None
+        """
+
+        if refresh_token and fresh:
+            raise InvalidPASETOArgumentError(
+                status_code=422,
+                message="fresh and refresh_token cannot be True at the same time",
+            )
+
+        start = time.perf_counter() if self._metrics_enabled else None
 
         try:
-            self._decode_token(base64_encoded=base64_encoded)
-        except PASETODecodeError as err:
+            await self._verify_token_async(
+                fresh=fresh,
+                refresh_token=refresh_token,
+                type=type,
+                base64_encoded=base64_encoded,
+            )
+        except (MissingTokenError, PASETODecodeError) as err:
+            if start is not None:
+                self._observe_verification(start, err)
             if optional:
                 return None
-            else:
-                raise err
+            raise err
+        except AuthPASETOException as err:
+            if start is not None:
+                self._observe_verification(start, err)
+            raise err
+
+        if start is not None:
+            self._observe_verification(start)
 
-        payload = self.get_token_payload()
+    async def paseto_websocket_required(
+        self,
+        token: Optional[str] = None,
+        fresh: bool = False,
+        type: Optional[str] = None,
+        base64_encoded: bool = False,
+        on_expire: Optional[Callable[[WebSocket], Awaitable[Any]]] = None,
+    ) -> None:
+        """
+        Check the token of a WebSocket connection once, at the handshake, and close
+        the connection when the token expires. Later calls on the same connection
+        reuse the verified token
+        :param token: token sent another way than in the headers, e.g. in the query
+                      string or the first message
+        :param on_expire: coroutine function called with the WebSocket instead of
+                          closing it when the token expires, e.g. to ask for a new token
+        :return: None
+        """
+        websocket = self._request
+        if not isinstance(websocket, WebSocket):
+            raise RuntimeError(
+                "paseto_websocket_required can only be used on a WebSocket connection"
+            )
+        if token is not None:
+            self._set_token(token)
+
+        await self.paseto_required_async(
+            fresh=fresh, type=type, base64_encoded=base64_encoded
+        )
+
+        timer = getattr(websocket.state, _EXPIRY_TIMER, None)
+        if timer is not None:
+            if timer[0] == self._token:
+                return
+            # A new token was sent, e.g. after on_expire asked for one
+            timer[1].cancel()
+        exp = self._get_claim("exp")
+        if exp:
+            remaining = paseto._parse_datetime(exp) - datetime.now(tz=timezone.utc)
+            # exp is checked at one-second resolution, the token is rejected
+            # from the second that follows it
+            handle = asyncio.get_running_loop().call_later(
+                remaining.total_seconds() + self._get_leeway_seconds() + 1,
+                self._on_websocket_token_expired,
+                websocket,
+                on_expire,
+            )
+            setattr(websocket.state, _EXPIRY_TIMER, (self._token, handle))
+
+    @staticmethod
+    def _on_websocket_token_expired(
+        websocket: WebSocket,
+        on_expire: Optional[Callable[[WebSocket], Awaitable[Any]]],
+    ) -> None:
+        # The expired token is verified again, and rejected, on the next check
+        setattr(websocket.state, _VERIFIED_TOKENS, None)
+        setattr(websocket.state, _EXPIRY_TIMER, None)
+        if (
+            websocket.client_state != WebSocketState.CONNECTED
+            or websocket.application_state != WebSocketState.CONNECTED
+        ):
+            return
+        if on_expire is not None:
+            expire = on_expire(websocket)
+        else:
+            expire = websocket.close(
+                code=status.WS_1008_POLICY_VIOLATION, reason="Token expired"
+            )
+        # Keep a reference to the task, the event loop only keeps a weak one
+        websocket.state.authpaseto_expiry_task = asyncio.ensure_future(expire)
+
+    def _verify_token(
+        self,
+        fresh: bool,
+        refresh_token: bool,
+        type: Optional[str],
+        base64_encoded: bool,
+    ) -> None:
+        """
+        Decode the token of the request and check its type and freshness,
+        raising an exception on the first failed check
+        """
+
+        if not self._token:
+            raise MissingTokenError(
+                status_code=401, message="PASETO Authorization Token required"
+            )
+
+        payload = self._decode_token(base64_encoded=base64_encoded).payload
+        self._check_token_type(payload, fresh, refresh_token, type)
+
+    async def _verify_token_async(
+        self,
+        fresh: bool,
+        refresh_token: bool,
+        type: Optional[str],
+        base64_encoded: bool,
+    ) -> None:
+        """
+        Same as _verify_token, with the denylist lookup run in a threadpool
+        """
+
+        if not self._token:
+            raise MissingTokenError(
+                status_code=401, message="PASETO Authorization Token required"
+            )
+
+        token = await self._decode_token_async(base64_encoded=base64_encoded)
+        self._check_token_type(token.payload, fresh, refresh_token, type)
+
+    def _check_token_type(
+        self,
+        payload: Dict,
+        fresh: bool,
+        refresh_token: bool,
+        type: Optional[str],
+    ) -> None:
+        """
+        Check the type and freshness of a verified token
+        """
 
         if not refresh_token and not type and payload["type"] != "access":
             raise AccessTokenRequired(
@@ -0,0 +1,84 @@
+"""
+A circuit breaker, which stops calling a failing backend for a while instead
+of making every request wait for it to fail again
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. Once open, calls are
+    refused for `reset_timeout` seconds, then a single trial call is let through
+    (half-open): its success closes the breaker, its failure opens it again.
+    A trial call that never reports back is replaced after `reset_timeout` seconds
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        on_state_change: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be a positive integer")
+        if reset_timeout <= 0:
+            raise ValueError("reset_timeout must be positive")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_state_change = on_state_change
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        :return: whether the call may go through, a True while half-open
+                 makes it the trial call
+        """
+        if self._state == self.CLOSED:
+            return True
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at >= self.reset_timeout:
+                self._opened_at = now
+                if self._state != self.HALF_OPEN:
+                    self._set_state(self.HALF_OPEN)
+                return True
+            # Open, or half-open with the trial call in flight
+            return False
+
+    def record_success(self) -> None:
+        if self._state == self.CLOSED and not self._failures:
+            return
+        with self._lock:
+            self._failures = 0
+            if self._state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        if self.on_state_change is not None:
+            self.on_state_change(state)
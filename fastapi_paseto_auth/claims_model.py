@@ -0,0 +1,41 @@
+"""
+Typed claims, the claims of a verified token as an instance of a registered
+dataclass, msgspec Struct or pydantic model
+"""
+
+import dataclasses
+from typing import Any, Callable, Dict
+
+
+def compile_claims_model(model: Any) -> Callable[[Dict], Any]:
+    """
+    Build the function turning claims into an instance of the model, once per model.
+    Claims without a field in the model are ignored
+    :raises TypeError: if the model isn't a dataclass, a msgspec Struct or a pydantic model
+    """
+    if hasattr(model, "__struct_fields__"):
+        import msgspec
+
+        def convert_struct(claims: Dict) -> Any:
+            return msgspec.convert(claims, model)
+
+        return convert_struct
+
+    if hasattr(model, "model_validate"):
+        return model.model_validate
+    if hasattr(model, "parse_obj"):
+        return model.parse_obj
+
+    if isinstance(model, type) and dataclasses.is_dataclass(model):
+        names = frozenset(
+            field.name for field in dataclasses.fields(model) if field.init
+        )
+
+        def convert_dataclass(claims: Dict) -> Any:
+            return model(**{name: v for name, v in claims.items() if name in names})
+
+        return convert_dataclass
+
+    raise TypeError(
+        "The claims model must be a dataclass, a msgspec Struct or a pydantic model"
+    )
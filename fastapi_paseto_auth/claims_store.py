@@ -0,0 +1,112 @@
+"""
+Server-side storage of user claims for reference tokens, which carry
+a short reference instead of the claims themselves
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class ClaimsStore:
+    """
+    Base class of the claims stores
+    """
+
+    def get(self, reference: str) -> Optional[Dict]:
+        """
+        :return: the claims stored under the reference, None if they are unknown
+                 or expired
+        """
+        raise NotImplementedError
+
+    def set(self, reference: str, claims: Dict, ttl: int = 0) -> None:
+        """
+        Store the claims under the reference
+        :param ttl: seconds to keep the claims for, 0 to keep them until evicted
+        """
+        raise NotImplementedError
+
+
+class InMemoryClaimsStore(ClaimsStore):
+    """
+    A least recently used cache of claims, local to the process.
+    Suited for a single process, and as a stand-in for a shared store in tests
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[Dict, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, reference: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(reference)
+            if entry is None:
+                return None
+            claims, deadline = entry
+            if deadline is not None and deadline <= time.monotonic():
+                del self._entries[reference]
+                return None
+            self._entries.move_to_end(reference)
+            return claims
+
+    def set(self, reference: str, claims: Dict, ttl: int = 0) -> None:
+        deadline = time.monotonic() + ttl if ttl > 0 else None
+        with self._lock:
+            self._entries[reference] = (claims, deadline)
+            self._entries.move_to_end(reference)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisClaimsStore(ClaimsStore):
+    """
+    Claims shared between processes through Redis, or any client with the
+    `get(name)` and `set(name, value, ex=None)` methods of redis-py.
+    Fetched claims never change, so they are also kept in a local cache
+    for `cache_ttl` seconds to skip the round trip on the next requests,
+    0 disables the local cache
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        prefix: str = "authpaseto:claims:",
+        cache_size: int = 1024,
+        cache_ttl: int = 60,
+    ) -> None:
+        self.client = client
+        self.prefix = prefix
+        self.cache_ttl = cache_ttl
+        self._cache = InMemoryClaimsStore(cache_size)
+
+    def get(self, reference: str) -> Optional[Dict]:
+        claims = self._cache.get(reference)
+        if claims is not None:
+            return claims
+
+        value = self.client.get(self.prefix + reference)
+        if value is None:
+            return None
+        claims = json.loads(value)
+        if self.cache_ttl > 0:
+            self._cache.set(reference, claims, self.cache_ttl)
+        return claims
+
+    def set(self, reference: str, claims: Dict, ttl: int = 0) -> None:
+        self.client.set(
+            self.prefix + reference,
+            json.dumps(claims, separators=(",", ":")),
+            ex=ttl if ttl > 0 else None,
+        )
+        if self.cache_ttl > 0:
+            cache_ttl = min(ttl, self.cache_ttl) if ttl > 0 else self.cache_ttl
+            self._cache.set(reference, claims, cache_ttl)
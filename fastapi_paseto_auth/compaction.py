@@ -0,0 +1,92 @@
+"""
+Compaction of claim names, to make the tokens shorter
+"""
+
+from typing import Dict, Optional
+
+# Marker of a compacted payload, its value is the version of the claim map used
+VERSION_CLAIM = "_c"
+
+# Short names of the claims set by the extension itself, these never change,
+# new claims must be given new short names
+REGISTERED_CLAIM_MAP = {
+    "type": "t",
+    "fresh": "f",
+    "sub": "s",
+    "jti": "j",
+    "nbf": "n",
+    "iat": "i",
+    "exp": "e",
+    "iss": "is",
+    "aud": "a",
+    "ref": "r",
+}
+
+
+class ClaimCompactor:
+    """
+    Replaces claim names with short ones when encoding and restores them when
+    decoding. Every version of the user claim map stays decodable, the latest
+    one is used for new tokens
+    """
+
+    __slots__ = ("version", "_maps", "_inverse_maps")
+
+    def __init__(self, user_claim_maps: Optional[Dict[int, Dict[str, str]]] = None):
+        user_claim_maps = user_claim_maps or {}
+        self._maps: Dict[int, Dict[str, str]] = {}
+        self._inverse_maps: Dict[int, Dict[str, str]] = {}
+
+        for version, user_claim_map in {0: {}, **user_claim_maps}.items():
+            claim_map = {**REGISTERED_CLAIM_MAP}
+            for name, short_name in user_claim_map.items():
+                if name in REGISTERED_CLAIM_MAP:
+                    raise ValueError(f"The claim {name} can't be renamed")
+                claim_map[name] = short_name
+            inverse_map = {short: name for name, short in claim_map.items()}
+            if len(inverse_map) != len(claim_map) or VERSION_CLAIM in inverse_map:
+                raise ValueError(
+                    f"The short claim names of the claim map {version} must be unique"
+                )
+            self._maps[version] = claim_map
+            self._inverse_maps[version] = inverse_map
+
+        self.version = max(self._maps)
+
+    def compact(self, claims: Dict) -> Dict:
+        """
+        :return: the claims with short names, or the claims unchanged when an
+                 unmapped claim would be mistaken for a short name
+        :raises ValueError: if the claims contain the reserved version claim
+        """
+        if VERSION_CLAIM in claims:
+            raise ValueError(f"The claim {VERSION_CLAIM} is reserved")
+        claim_map = self._maps[self.version]
+        inverse_map = self._inverse_maps[self.version]
+        compacted = {VERSION_CLAIM: self.version}
+        for name, value in claims.items():
+            short_name = claim_map.get(name)
+            if short_name is None:
+                if name in inverse_map:
+                    return claims
+                short_name = name
+            compacted[short_name] = value
+        return compacted
+
+    def expand(self, claims: Dict) -> Dict:
+        """
+        :return: the claims with their full names, claims that weren't compacted
+                 are returned unchanged
+        :raises ValueError: if the claims were compacted with an unknown claim map
+        """
+        if VERSION_CLAIM not in claims:
+            return claims
+        version = claims[VERSION_CLAIM]
+        inverse_map = self._inverse_maps.get(version) if type(version) is int else None
+        if inverse_map is None:
+            raise ValueError("Unknown claim map version")
+        return {
+            inverse_map.get(short_name, short_name): value
+            for short_name, value in claims.items()
+            if short_name != VERSION_CLAIM
+        }
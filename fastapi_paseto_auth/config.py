@@ -1,15 +1,29 @@
 from datetime import timedelta
-from typing import Optional, Union, Sequence
+from typing import Any, Dict, Optional, Union, Sequence
 from pydantic import BaseModel, validator, StrictBool, StrictInt, StrictStr
 
 
+def _read_key_file(key: Optional[str], key_file: Optional[str]) -> Optional[str]:
+    """
+    Return the key, read from the key file if the key itself is not set
+    """
+    if key is not None or key_file is None:
+        return key
+    try:
+        with open(key_file, "r") as f:
+            return f.read().strip()
+    except OSError as err:
+        raise ValueError(f"Unable to read the key file {key_file}: {err}")
+
+
 class LoadConfig(BaseModel):
     authpaseto_token_location: Optional[Sequence[StrictStr]] = {"headers"}
     authpaseto_secret_key: Optional[StrictStr] = None
-    authpaseto_public_key: Optional[StrictStr] = None
+    # The key files are declared before the keys so the key validators can use them
     authpaseto_public_key_file: Optional[StrictStr] = None
-    authpaseto_private_key: Optional[StrictStr] = None
+    authpaseto_public_key: Optional[StrictStr] = None
     authpaseto_private_key_file: Optional[StrictStr] = None
+    authpaseto_private_key: Optional[StrictStr] = None
     authpaseto_purpose: Optional[StrictStr] = "local"
     authpaseto_version: StrictInt = 4
     authpaseto_decode_leeway: Optional[Union[StrictInt, timedelta]] = 0
@@ -32,31 +46,103 @@ class LoadConfig(BaseModel):
     authpaseto_other_token_expires: Optional[
         Union[StrictBool, StrictInt, timedelta]
     ] = timedelta(days=30)
+    authpaseto_metrics_enabled: Optional[StrictBool] = False
+    authpaseto_metrics_dir: Optional[StrictStr] = None
+    authpaseto_compact_claims: Optional[StrictBool] = False
+    authpaseto_claim_maps: Dict[StrictInt, Dict[StrictStr, StrictStr]] = {}
+    authpaseto_rejected_token_cache_size: StrictInt = 0
+    authpaseto_rejected_token_cache_ttl: Union[StrictInt, float] = 10
+    authpaseto_max_concurrent_verifications: Optional[StrictInt] = None
+    authpaseto_verification_queue_size: StrictInt = 100
+    authpaseto_verification_queue_timeout: Union[StrictInt, float] = 1
+    authpaseto_denylist_threadpool_size: StrictInt = 8
+    authpaseto_denylist_single_flight: Optional[StrictBool] = False
+    authpaseto_denylist_timeout: Optional[Union[StrictInt, float]] = None
+    authpaseto_denylist_failure_threshold: Optional[StrictInt] = None
+    authpaseto_denylist_reset_timeout: Union[StrictInt, float] = 30
+    authpaseto_denylist_failure_policy: Optional[
+        Union[StrictStr, Dict[StrictStr, StrictStr]]
+    ] = None
+    # Only used in the configurations of tenants
+    authpaseto_tenant_hosts: Optional[Sequence[StrictStr]] = []
 
-    @validator("authpaseto_private_key")
+    @validator("authpaseto_private_key", always=True)
     def validate_authpaseto_private_key(
-        cls, v: Optional[StrictStr]
+        cls, v: Optional[StrictStr], values: Dict[str, Any]
     ) -> Optional[StrictStr]:
-        if v is None and cls.authpaseto_private_key_file is None:
-            return None
-        if v is None and cls.authpaseto_private_key_file is not None:
-            with open(cls.authpaseto_private_key_file, "r") as f:
-                v = f.read()
-        if not isinstance(v, str):
-            raise TypeError("authpaseto_private_key must be a string")
-        return v
+        return _read_key_file(v, values.get("authpaseto_private_key_file"))
 
-    @validator("authpaseto_public_key")
+    @validator("authpaseto_public_key", always=True)
     def validate_authpaseto_public_key(
-        cls, v: Optional[StrictStr]
+        cls, v: Optional[StrictStr], values: Dict[str, Any]
     ) -> Optional[StrictStr]:
-        if v is None and cls.authpaseto_public_key_file is None:
-            return None
-        if v is None and cls.authpaseto_public_key_file is not None:
-            with open(cls.authpaseto_public_key_file, "r") as f:
-                v = f.read()
-        if not isinstance(v, str):
-            raise TypeError("authpaseto_public_key must be a string")
+        return _read_key_file(v, values.get("authpaseto_public_key_file"))
+
+    @validator("authpaseto_claim_maps")
+    def validate_claim_maps(cls, v):
+        from fastapi_paseto_auth.compaction import ClaimCompactor
+
+        ClaimCompactor(v)
+        return v
+
+    @validator("authpaseto_rejected_token_cache_size")
+    def validate_rejected_token_cache_size(cls, v):
+        if v < 0:
+            raise ValueError(
+                "The 'authpaseto_rejected_token_cache_size' must not be negative"
+            )
+        return v
+
+    @validator("authpaseto_rejected_token_cache_ttl")
+    def validate_rejected_token_cache_ttl(cls, v):
+        if v <= 0:
+            raise ValueError(
+                "The 'authpaseto_rejected_token_cache_ttl' must be positive"
+            )
+        return v
+
+    @validator("authpaseto_denylist_threadpool_size")
+    def validate_denylist_threadpool_size(cls, v):
+        if v < 1:
+            raise ValueError(
+                "The 'authpaseto_denylist_threadpool_size' must be positive"
+            )
+        return v
+
+    @validator(
+        "authpaseto_denylist_timeout",
+        "authpaseto_denylist_failure_threshold",
+        "authpaseto_denylist_reset_timeout",
+    )
+    def validate_denylist_failure_handling(cls, v, field):
+        if v is not None and v <= 0:
+            raise ValueError(f"The '{field.name}' must be positive")
+        return v
+
+    @validator("authpaseto_denylist_failure_policy")
+    def validate_denylist_failure_policy(cls, v):
+        policies = v.values() if isinstance(v, dict) else [v]
+        if any(policy not in ("open", "closed") for policy in policies):
+            raise ValueError(
+                "The 'authpaseto_denylist_failure_policy' must be 'open' or 'closed', "
+                "or a dictionary of them by token type"
+            )
+        return v
+
+    @validator("authpaseto_max_concurrent_verifications")
+    def validate_max_concurrent_verifications(cls, v):
+        if v is not None and v < 1:
+            raise ValueError(
+                "The 'authpaseto_max_concurrent_verifications' must be positive"
+            )
+        return v
+
+    @validator(
+        "authpaseto_verification_queue_size", "authpaseto_verification_queue_timeout"
+    )
+    def validate_verification_queue(cls, v, field):
+        if v < 0:
+            raise ValueError(f"The '{field.name}' must not be negative")
         return v
 
     @validator("authpaseto_access_token_expires")
@@ -0,0 +1,816 @@
+"""
+Denylist backends and a write-behind queue that batches revocations
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi_paseto_auth import metrics
+from fastapi_paseto_auth.auth_paseto import AuthPASETO
+
+
+class DenylistBackend:
+    """
+    Base class of the stores of revoked token identifiers
+    """
+
+    def is_revoked(self, jti: str) -> bool:
+        raise NotImplementedError
+
+    def add_many(
+        self,
+        revocations: Dict[str, int],
+        revoked_at: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """
+        Revoke several tokens at once
+        :param revocations: seconds to keep each jti for, 0 to keep it forever
+        :param revoked_at: time each jti was revoked at, when it was revoked
+                           earlier than it is written, e.g. by a RevocationQueue
+        """
+        raise NotImplementedError
+
+
+class InMemoryDenylist(DenylistBackend):
+    """
+    Revoked tokens kept in the memory of the process
+    """
+
+    def __init__(self) -> None:
+        self._deadlines: Dict[str, Optional[float]] = {}
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti: str) -> bool:
+        with self._lock:
+            if jti not in self._deadlines:
+                return False
+            deadline = self._deadlines[jti]
+            if deadline is not None and deadline <= time.monotonic():
+                del self._deadlines[jti]
+                return False
+            return True
+
+    def add_many(
+        self,
+        revocations: Dict[str, int],
+        revoked_at: Optional[Dict[str, float]] = None,
+    ) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for jti, ttl in revocations.items():
+                self._deadlines[jti] = now + ttl if ttl > 0 else None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+
+class RedisDenylist(DenylistBackend):
+    """
+    Revoked tokens shared between processes through Redis, or any client with
+    the `exists(name)`, `set(name, value, ex=None)` and optionally `pipeline()`
+    methods of redis-py
+    """
+
+    def __init__(self, client: Any, prefix: str = "authpaseto:denylist:") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    def is_revoked(self, jti: str) -> bool:
+        return bool(self.client.exists(self.prefix + jti))
+
+    def add_many(
+        self,
+        revocations: Dict[str, int],
+        revoked_at: Optional[Dict[str, float]] = None,
+    ) -> None:
+        # A pipeline sends the whole batch in a single round trip
+        pipeline = self.client.pipeline() if hasattr(self.client, "pipeline") else None
+        target = pipeline or self.client
+        for jti, ttl in revocations.items():
+            target.set(self.prefix + jti, "true", ex=ttl if ttl > 0 else None)
+        if pipeline is not None:
+            pipeline.execute()
+
+
+class HashRing:
+    """
+    Consistent hashing of keys onto named nodes. Every node is placed on the ring
+    `virtual_nodes` times, so the keys are spread evenly and adding or removing
+    a node only moves the keys of that node
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), virtual_nodes: int = 100) -> None:
+        if virtual_nodes < 1:
+            raise ValueError("virtual_nodes must be a positive integer")
+        self.virtual_nodes = virtual_nodes
+        self._nodes: Tuple[str, ...] = ()
+        self._points: Tuple[List[int], List[str]] = ([], [])
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        # Stable across processes, unlike hash()
+        return int.from_bytes(
+            hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+
+    def add(self, node: str) -> None:
+        if node in self._nodes:
+            raise ValueError(f"The node {node} is already in the ring")
+        self._build(self._nodes + (node,))
+
+    def remove(self, node: str) -> None:
+        if node not in self._nodes:
+            raise ValueError(f"The node {node} isn't in the ring")
+        self._build(tuple(n for n in self._nodes if n != node))
+
+    def get(self, key: str) -> str:
+        """
+        :return: the node of the key, the first node clockwise from its hash
+        """
+        positions, owners = self._points
+        if not owners:
+            raise LookupError("The ring has no nodes")
+        index = bisect(positions, self._hash(key))
+        return owners[index if index < len(owners) else 0]
+
+    @property
+    def nodes(self) -> Tuple[str, ...]:
+        return self._nodes
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def _build(self, nodes: Tuple[str, ...]) -> None:
+        points = sorted(
+            (self._hash(f"{node}#{replica}"), node)
+            for node in nodes
+            for replica in range(self.virtual_nodes)
+        )
+        # The points are replaced, not mutated, a concurrent get() sees either ring
+        self._points = ([p for p, _ in points], [n for _, n in points])
+        self._nodes = nodes
+
+
+class ShardedDenylist(DenylistBackend):
+    """
+    Revoked tokens spread over several backends by consistent hashing of their jti.
+    After adding or removing a node, the tokens that moved are looked up on their
+    previous node too, for `handover_period` seconds, the longest lifetime of a token.
+    None keeps looking them up there until `end_handover()` is called
+    """
+
+    def __init__(
+        self,
+        nodes: Dict[str, DenylistBackend],
+        virtual_nodes: int = 100,
+        handover_period: Optional[float] = None,
+    ) -> None:
+        if not nodes:
+            raise ValueError("At least one node is required")
+        self.handover_period = handover_period
+        # The ring and the backends of its nodes are replaced together
+        self._shards: Tuple[HashRing, Dict[str, DenylistBackend]] = (
+            HashRing(nodes, virtual_nodes),
+            dict(nodes),
+        )
+        # Previous rings and their backends, with the deadline of their handover
+        self._handovers: List[Tuple[HashRing, Dict[str, DenylistBackend], float]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def ring(self) -> HashRing:
+        return self._shards[0]
+
+    def node_for(self, jti: str) -> DenylistBackend:
+        ring, backends = self._shards
+        return backends[ring.get(jti)]
+
+    def is_revoked(self, jti: str) -> bool:
+        ring, backends = self._shards
+        node = ring.get(jti)
+        if backends[node].is_revoked(jti):
+            return True
+        for previous_ring, previous_backends, _ in self._current_handovers():
+            previous_node = previous_ring.get(jti)
+            if previous_node != node and previous_backends[previous_node].is_revoked(
+                jti
+            ):
+                return True
+        return False
+
+    def add_many(
+        self,
+        revocations: Dict[str, int],
+        revoked_at: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """
+        Revoke the tokens with a single call per node. Every node is written even
+        if one fails, the first error is raised afterwards
+        """
+        ring, backends = self._shards
+        batches: Dict[str, Dict[str, int]] = {}
+        for jti, ttl in revocations.items():
+            batches.setdefault(ring.get(jti), {})[jti] = ttl
+
+        error: Optional[Exception] = None
+        for node, batch in batches.items():
+            try:
+                backends[node].add_many(batch, revoked_at)
+            except Exception as err:
+                error = error or err
+        if error is not None:
+            raise error
+
+    def add_node(self, name: str, backend: DenylistBackend) -> None:
+        with self._lock:
+            ring = HashRing(self.ring.nodes, self.ring.virtual_nodes)
+            ring.add(name)
+            self._replace_ring(ring, {**self._shards[1], name: backend})
+
+    def remove_node(self, name: str) -> None:
+        with self._lock:
+            ring = HashRing(self.ring.nodes, self.ring.virtual_nodes)
+            ring.remove(name)
+            if not len(ring):
+                raise ValueError("The last node can't be removed")
+            backends = dict(self._shards[1])
+            del backends[name]
+            self._replace_ring(ring, backends)
+
+    def end_handover(self) -> None:
+        """
+        Stop looking tokens up on their nodes before the last changes
+        """
+        with self._lock:
+            self._handovers = []
+
+    def _replace_ring(
+        self, ring: HashRing, backends: Dict[str, DenylistBackend]
+    ) -> None:
+        deadline = (
+            time.monotonic() + self.handover_period
+            if self.handover_period is not None
+            else float("inf")
+        )
+        self._handovers = [*self._current_handovers(), (*self._shards, deadline)]
+        self._shards = (ring, backends)
+
+    def _current_handovers(self) -> List[tuple]:
+        handovers = self._handovers
+        if handovers and handovers[0][2] <= time.monotonic():
+            handovers = self._handovers = [
+                handover for handover in handovers if handover[2] > time.monotonic()
+            ]
+        return handovers
+
+
+class InvalidationChannel:
+    """
+    Base class of the channels that broadcast revocations to every process
+    """
+
+    def publish(self, message: str) -> None:
+        raise NotImplementedError
+
+    def subscribe(
+        self,
+        callback: Callable[[str], None],
+        on_reset: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        :param callback: called with every message published on the channel
+        :param on_reset: called when messages may have been missed, e.g. after
+                         the connection to the broker was lost
+        """
+        raise NotImplementedError
+
+    def ensure_listening(self) -> None:
+        """
+        Make sure the messages are received in the current process
+        """
+
+
+class LocalInvalidationChannel(InvalidationChannel):
+    """
+    Messages delivered right away to the subscribers of the process.
+    Suited for a single process, and as a stand-in for a shared channel in tests
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: List[Callable[[str], None]] = []
+
+    def publish(self, message: str) -> None:
+        for callback in list(self._subscribers):
+            callback(message)
+
+    def subscribe(
+        self,
+        callback: Callable[[str], None],
+        on_reset: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self._subscribers.append(callback)
+
+
+class RedisInvalidationChannel(InvalidationChannel):
+    """
+    Messages broadcast through Redis pub/sub, or any client with the
+    `publish(channel, message)` and `pubsub()` methods of redis-py.
+    A thread listens to the channel, and subscribes again every
+    `reconnect_interval` seconds after losing the connection
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        channel: str = "authpaseto:revocations",
+        reconnect_interval: float = 1.0,
+    ) -> None:
+        self.client = client
+        self.channel = channel
+        self.reconnect_interval = reconnect_interval
+        self._subscribers: List[Tuple[Callable[[str], None], Optional[Callable]]] = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._pubsub: Any = None
+        self._thread: Optional[threading.Thread] = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def publish(self, message: str) -> None:
+        self.client.publish(self.channel, message)
+
+    def subscribe(
+        self,
+        callback: Callable[[str], None],
+        on_reset: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self._subscribers.append((callback, on_reset))
+        self.ensure_listening()
+
+    def ensure_listening(self) -> None:
+        if self._thread is not None or not self._subscribers:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="authpaseto-invalidation-channel", daemon=True
+            )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        """
+        Stop listening to the channel
+        """
+        self._stopped.set()
+        pubsub = self._pubsub
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+    def _after_fork(self) -> None:
+        # The listening thread doesn't survive a fork, the next lookup starts it again
+        self._lock = threading.Lock()
+        self._pubsub = None
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                self._pubsub.subscribe(self.channel)
+                # Messages published while not subscribed were missed
+                self._reset()
+                for message in self._pubsub.listen():
+                    if self._stopped.is_set():
+                        break
+                    if message.get("type") != "message":
+                        continue
+                    data = message["data"]
+                    self._deliver(data.decode() if isinstance(data, bytes) else data)
+            except Exception:
+                self._stopped.wait(self.reconnect_interval)
+
+    def _deliver(self, message: str) -> None:
+        for callback, _ in list(self._subscribers):
+            callback(message)
+
+    def _reset(self) -> None:
+        for _, on_reset in list(self._subscribers):
+            if on_reset is not None:
+                on_reset()
+
+
+class CachedDenylist(DenylistBackend):
+    """
+    Keeps the results of the lookups of a denylist backend in the process for
+    `ttl` seconds. Revocations are published on an invalidation channel, every
+    process marks the token as revoked in its cache as soon as it receives one.
+    A lost message delays a revocation by at most `ttl` seconds
+    """
+
+    def __init__(
+        self,
+        backend: DenylistBackend,
+        channel: InvalidationChannel,
+        ttl: float = 5.0,
+        maxsize: int = 100000,
+    ) -> None:
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        self.backend = backend
+        self.channel = channel
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+        # Incremented by every invalidation, a lookup made meanwhile isn't cached
+        self._generation = 0
+        self._origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        channel.subscribe(self._on_message, self.clear)
+
+    def is_revoked(self, jti: str) -> bool:
+        self.channel.ensure_listening()
+        with self._lock:
+            entry = self._entries.get(jti)
+            if entry is not None:
+                revoked, deadline = entry
+                if deadline > time.monotonic():
+                    self._entries.move_to_end(jti)
+                    self._observe_lookup("hit")
+                    return revoked
+                del self._entries[jti]
+            generation = self._generation
+        self._observe_lookup("miss")
+
+        revoked = self.backend.is_revoked(jti)
+        with self._lock:
+            if self._generation != generation:
+                # The result may predate a revocation received during the lookup
+                entry = self._entries.get(jti)
+                return revoked or (entry is not None and entry[0])
+            self._set(jti, revoked)
+        return revoked
+
+    def add_many(
+        self,
+        revocations: Dict[str, int],
+        revoked_at: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.backend.add_many(revocations, revoked_at)
+        now = time.time()
+        revoked_at = revoked_at or {}
+        for jti in revocations:
+            self._invalidate(jti)
+            self.channel.publish(
+                json.dumps(
+                    {
+                        "jti": jti,
+                        "revoked_at": revoked_at.get(jti, now),
+                        "origin": self._sender(),
+                    },
+                    separators=(",", ":"),
+                )
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _sender(self) -> str:
+        # A forked worker has the origin of its parent, the pid tells them apart
+        return f"{self._origin}:{os.getpid()}"
+
+    def _on_message(self, message: str) -> None:
+        try:
+            revocation = json.loads(message)
+            jti = revocation["jti"]
+        except (TypeError, ValueError, KeyError):
+            return
+        if revocation.get("origin") == self._sender():
+            return
+        self._invalidate(jti)
+        if AuthPASETO._metrics_enabled and "revoked_at" in revocation:
+            # Measured between the clocks of two hosts, a negative delay is skew
+            metrics.REVOCATION_PROPAGATION_SECONDS.observe(
+                max(time.time() - revocation["revoked_at"], 0.0)
+            )
+
+    def _invalidate(self, jti: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._set(jti, True)
+
+    def _set(self, jti: str, revoked: bool) -> None:
+        self._entries[jti] = (revoked, time.monotonic() + self.ttl)
+        self._entries.move_to_end(jti)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _observe_lookup(self, result: str) -> None:
+        if AuthPASETO._metrics_enabled:
+            metrics.DENYLIST_CACHE_LOOKUPS.inc(result=result)
+
+
+class RevocationQueue:
+    """
+    Revokes tokens in the process right away, and writes the revocations to
+    a shared backend in batches, every `flush_interval` seconds or as soon as
+    `max_batch` revocations are pending
+    """
+
+    def __init__(
+        self,
+        backend: DenylistBackend,
+        flush_interval: float = 1.0,
+        max_batch: int = 500,
+    ) -> None:
+        if flush_interval <= 0:
+            raise ValueError("flush_interval must be positive")
+        if max_batch < 1:
+            raise ValueError("max_batch must be a positive integer")
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        # Revocations not written to the backend yet, with their ttl and the time
+        # they were made at, they are also the fast path checked before the backend
+        self._pending: Dict[str, Tuple[int, float]] = {}
+        # The batch being written, still checked until the backend has it
+        self._flushing: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def revoke(self, jti: str, ttl: int = 0) -> None:
+        """
+        Revoke a token
+        :param ttl: seconds to keep the jti for, usually the remaining lifetime
+                    of the token, 0 to keep it forever
+        """
+        with self._lock:
+            self._pending[jti] = (ttl, time.time())
+            depth = len(self._pending)
+        self._set_depth(depth)
+
+        if self._thread is None:
+            self._start()
+        if depth >= self.max_batch:
+            self._wakeup.set()
+
+    def revoke_many(self, revocations: Iterable[tuple]) -> None:
+        """
+        Revoke several tokens
+        :param revocations: pairs of jti and ttl
+        """
+        for jti, ttl in revocations:
+            self.revoke(jti, ttl)
+
+    def is_revoked(self, jti: str) -> bool:
+        with self._lock:
+            if jti in self._pending or jti in self._flushing:
+                return True
+        return self.backend.is_revoked(jti)
+
+    def flush(self) -> None:
+        """
+        Write the pending revocations to the backend. On failure they stay
+        pending and are retried on the next flush
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch = self._flushing = self._pending
+                self._pending = {}
+
+            start = time.perf_counter()
+            try:
+                self.backend.add_many(
+                    {jti: ttl for jti, (ttl, _) in batch.items()},
+                    {jti: revoked_at for jti, (_, revoked_at) in batch.items()},
+                )
+            except Exception:
+                with self._lock:
+                    # Revocations made during the flush are more recent
+                    self._pending = {**batch, **self._pending}
+                    self._flushing = {}
+                    depth = len(self._pending)
+                self._observe_flush(start, "error", depth)
+                raise
+            with self._lock:
+                self._flushing = {}
+                depth = len(self._pending)
+            self._observe_flush(start, "success", depth)
+
+    def close(self) -> None:
+        """
+        Stop the flushing thread and flush the pending revocations
+        """
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="authpaseto-revocation-queue", daemon=True
+            )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _after_fork(self) -> None:
+        # The flushing thread doesn't survive a fork, and the pending
+        # revocations are flushed by the parent process
+        self._pending = {}
+        self._flushing = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # The batch stays pending, the next flush retries it
+                pass
+
+    def _set_depth(self, depth: int) -> None:
+        if AuthPASETO._metrics_enabled:
+            metrics.REVOCATION_QUEUE_DEPTH.set(depth)
+
+    def _observe_flush(self, start: float, outcome: str, depth: int) -> None:
+        if AuthPASETO._metrics_enabled:
+            metrics.REVOCATION_FLUSH_SECONDS.observe(
+                time.perf_counter() - start, outcome=outcome
+            )
+            metrics.REVOCATION_QUEUE_DEPTH.set(depth)
+
+
+class WatermarkStore:
+    """
+    Base class of the stores of "revoked before" watermarks, one timestamp
+    per subject, the tokens of the subject issued at or before it are revoked
+    """
+
+    # A store that may block on I/O is read in the denylist threadpool
+    # on the async paths
+    blocking = True
+
+    def get(self, subject: str) -> Optional[float]:
+        """
+        :return: the watermark of the subject in seconds since the Epoch,
+                 None if none of its tokens have been revoked
+        """
+        raise NotImplementedError
+
+    def set(self, subject: str, watermark: float, ttl: int = 0) -> None:
+        """
+        :param ttl: seconds to keep the watermark for, the longest lifetime of
+                    a token, 0 to keep it forever
+        """
+        raise NotImplementedError
+
+
+class InMemoryWatermarkStore(WatermarkStore):
+    """
+    Watermarks kept in the memory of the process
+    """
+
+    blocking = False
+
+    def __init__(self) -> None:
+        self._watermarks: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Optional[float]:
+        entry = self._watermarks.get(subject)
+        if entry is None:
+            return None
+        watermark, deadline = entry
+        if deadline is not None and deadline <= time.time():
+            with self._lock:
+                self._watermarks.pop(subject, None)
+            return None
+        return watermark
+
+    def set(self, subject: str, watermark: float, ttl: int = 0) -> None:
+        with self._lock:
+            self._watermarks[subject] = (watermark, time.time() + ttl if ttl else None)
+
+    def __len__(self) -> int:
+        return len(self._watermarks)
+
+
+class RedisWatermarkStore(WatermarkStore):
+    """
+    Watermarks shared between processes through a single Redis hash, or any
+    client with the `hset`, `hget` and `hdel` methods of redis-py.
+    The watermark of a subject is read with a single `hget` and kept in the
+    process for `refresh_interval` seconds, so Redis is read at most once per
+    interval and subject
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        key: str = "authpaseto:watermarks",
+        refresh_interval: float = 5.0,
+        maxsize: int = 100000,
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        self.client = client
+        self.key = key
+        self.refresh_interval = refresh_interval
+        self.maxsize = maxsize
+        # Watermark, or None, and its deadline, and when it must be read again
+        self._entries: "OrderedDict[str, Tuple[Optional[float], float, float]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Optional[float]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is not None and entry[2] > time.monotonic():
+                self._entries.move_to_end(subject)
+                watermark, deadline, _ = entry
+                if deadline and deadline <= time.time():
+                    return None
+                return watermark
+
+        watermark, deadline = None, 0.0
+        value = self.client.hget(self.key, subject)
+        if value is not None:
+            value = value.decode() if isinstance(value, bytes) else value
+            stored_watermark, _, stored_deadline = value.partition(":")
+            deadline = float(stored_deadline or 0)
+            if deadline and deadline <= time.time():
+                self.client.hdel(self.key, subject)
+            else:
+                watermark = float(stored_watermark)
+        self._remember(subject, watermark, deadline)
+        return watermark
+
+    def set(self, subject: str, watermark: float, ttl: int = 0) -> None:
+        deadline = int(time.time()) + ttl if ttl else 0
+        self.client.hset(self.key, subject, f"{watermark}:{deadline}")
+        self._remember(subject, watermark, deadline)
+
+    def refresh(self) -> None:
+        """
+        Forget the watermarks read from Redis, they are read again on the next lookup
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(
+        self, subject: str, watermark: Optional[float], deadline: float
+    ) -> None:
+        with self._lock:
+            self._entries[subject] = (
+                watermark,
+                deadline,
+                time.monotonic() + self.refresh_interval,
+            )
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            self._refreshed_at = time.monotonic()
@@ -36,6 +36,46 @@ class PASETODecodeError(AuthPASETOException):
         super().__init__(status_code=status_code, message=message, **kwargs)
 
 
+class InsufficientScopeError(AuthPASETOException):
+    """
+    Error raised when a valid PASETO doesn't have the scopes required
+    by the auth policy of an endpoint
+    """
+
+    def __init__(self, status_code: int, message: str, **kwargs):
+        super().__init__(status_code=status_code, message=message, **kwargs)
+
+
+class VerificationOverloadedError(AuthPASETOException):
+    """
+    Error raised when too many tokens are being verified at the same time
+    and the verification of one more was shed
+    """
+
+    def __init__(self, status_code: int, message: str, **kwargs):
+        super().__init__(status_code=status_code, message=message, **kwargs)
+
+
+class DenylistUnavailableError(AuthPASETOException):
+    """
+    Error raised when the denylist couldn't be checked and the failure
+    policy of the token type is to fail closed
+    """
+
+    def __init__(self, status_code: int, message: str, **kwargs):
+        super().__init__(status_code=status_code, message=message, **kwargs)
+
+
+class InvalidTenantError(PASETODecodeError):
+    """
+    Error raised when the tenant named by a PASETO is unknown or doesn't
+    match the tenant of the request
+    """
+
+    def __init__(self, status_code: int, message: str, **kwargs):
+        super().__init__(status_code=status_code, message=message, **kwargs)
+
+
 class InvalidPASETOVersionError(AuthPASETOException):
     """
     Error raised if the version of the PASETO is not supported
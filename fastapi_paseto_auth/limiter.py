@@ -0,0 +1,111 @@
+"""
+A cap on the number of tokens verified at the same time, so a burst of
+requests is shed instead of queueing behind the crypto operations
+"""
+
+import asyncio
+import threading
+import time
+
+from fastapi_paseto_auth.exceptions import VerificationOverloadedError
+
+# Longest sleep between two tries of acquire_async
+_MAX_POLL_INTERVAL = 0.01
+
+
+class VerificationLimiter:
+    """
+    Lets `max_concurrent` verifications run at once. Up to `queue_size` more
+    wait for a slot for at most `queue_timeout` seconds, any other verification
+    is rejected right away
+    """
+
+    def __init__(
+        self, max_concurrent: int, queue_size: int = 100, queue_timeout: float = 1.0
+    ) -> None:
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be a positive integer")
+        if queue_size < 0:
+            raise ValueError("queue_size must not be negative")
+        if queue_timeout < 0:
+            raise ValueError("queue_timeout must not be negative")
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Take a verification slot
+        :raises VerificationOverloadedError: if the queue is full or no slot
+                                             was freed in time
+        """
+        if self._slots.acquire(blocking=False):
+            return
+
+        self._enter_queue()
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            self._leave_queue()
+        if not acquired:
+            raise VerificationOverloadedError(
+                status_code=503, message="Timed out waiting to verify the token"
+            )
+
+    async def acquire_async(self) -> None:
+        """
+        Same as acquire, for the event loop. The slots are shared with the
+        threads of sync endpoints, so a queued verification polls for a slot
+        with asyncio.sleep instead of blocking the event loop on the semaphore
+        :raises VerificationOverloadedError: if the queue is full or no slot
+                                             was freed in time
+        """
+        if self._slots.acquire(blocking=False):
+            return
+
+        self._enter_queue()
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            delay = 0.001
+            while not self._slots.acquire(blocking=False):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise VerificationOverloadedError(
+                        status_code=503, message="Timed out waiting to verify the token"
+                    )
+                await asyncio.sleep(min(delay, remaining))
+                delay = min(delay * 2, _MAX_POLL_INTERVAL)
+        finally:
+            self._leave_queue()
+
+    def _enter_queue(self) -> None:
+        with self._lock:
+            if self._waiting >= self.queue_size:
+                raise VerificationOverloadedError(
+                    status_code=503, message="Too many token verifications in progress"
+                )
+            self._waiting += 1
+
+    def _leave_queue(self) -> None:
+        with self._lock:
+            self._waiting -= 1
+
+    def release(self) -> None:
+        self._slots.release()
+
+    @property
+    def waiting(self) -> int:
+        """
+        Number of verifications waiting for a slot
+        """
+        return self._waiting
+
+    def __enter__(self) -> "VerificationLimiter":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
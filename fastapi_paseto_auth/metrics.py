@@ -0,0 +1,468 @@
+"""
+Prometheus-compatible metrics for token creation and verification
+"""
+
+import atexit
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+SampleKey = Tuple[str, Tuple[str, ...], str]
+
+
+class ProcessSamples(dict):
+    """
+    The samples of one process, `alive` is False once the process exited.
+    Counters and histograms keep the samples of exited processes, gauges don't
+    """
+
+    def __init__(self, samples: Dict[SampleKey, float], alive: bool = True) -> None:
+        super().__init__(samples)
+        self.alive = alive
+
+
+class MetricsStore:
+    """
+    Keeps the sample values of the current process in memory
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: Dict[SampleKey, float] = {}
+
+    def inc(self, key: SampleKey, amount: float) -> None:
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, key: SampleKey, value: float) -> None:
+        with self._lock:
+            self._values[key] = value
+
+    def collect(self) -> List[ProcessSamples]:
+        """
+        Return the samples of every process this store knows about,
+        one dictionary per process
+        """
+        with self._lock:
+            return [ProcessSamples(self._values)]
+
+
+class FileMetricsStore(MetricsStore):
+    """
+    Keeps the samples in memory and periodically writes them to a file named
+    after the current process inside a directory shared by all workers, so that
+    any worker can render the aggregated metrics of every process
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 1.0) -> None:
+        super().__init__()
+        self._directory = directory
+        self._flush_interval = flush_interval
+        self._pid = os.getpid()
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self._flush_at_exit)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self._directory, f"authpaseto_{self._pid}.json")
+
+    def _check_pid(self) -> None:
+        # A forked worker must not report the samples inherited from its parent
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._values = {}
+            self._last_flush = 0.0
+
+    def inc(self, key: SampleKey, amount: float) -> None:
+        with self._lock:
+            self._check_pid()
+            self._values[key] = self._values.get(key, 0.0) + amount
+        self._maybe_flush()
+
+    def set(self, key: SampleKey, value: float) -> None:
+        with self._lock:
+            self._check_pid()
+            self._values[key] = value
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if time.monotonic() - self._last_flush < self._flush_interval:
+            return
+        # Another thread is already writing the samples
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self._last_flush >= self._flush_interval:
+                self._write()
+        except OSError:
+            # Recording a sample must never fail the request, the samples
+            # are written again on the next flush
+            pass
+        finally:
+            self._flush_lock.release()
+
+    def _flush_at_exit(self) -> None:
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+    def flush(self) -> None:
+        """
+        Atomically write the samples of this process to the shared directory
+        """
+        with self._flush_lock:
+            self._write()
+
+    def _write(self) -> None:
+        with self._lock:
+            self._check_pid()
+            self._last_flush = time.monotonic()
+            samples = [
+                [name, list(labels), field, value]
+                for (name, labels, field), value in self._values.items()
+            ]
+            path = self.path
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(samples, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def collect(self) -> List[ProcessSamples]:
+        self.flush()
+        processes = []
+        for filename in sorted(os.listdir(self._directory)):
+            match = _SAMPLES_FILENAME.fullmatch(filename)
+            if match is None:
+                continue
+            try:
+                with open(os.path.join(self._directory, filename)) as f:
+                    samples = json.load(f)
+            except (OSError, ValueError):
+                # The file of a worker that is being written or was removed
+                continue
+            processes.append(
+                ProcessSamples(
+                    {
+                        (name, tuple(labels), field): value
+                        for name, labels, field, value in samples
+                    },
+                    alive=_pid_is_alive(int(match.group(1))),
+                )
+            )
+        return processes
+
+
+_SAMPLES_FILENAME = re.compile(r"authpaseto_(\d+)\.json")
+
+
+def _pid_is_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        # os.kill terminates the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # The process exists but belongs to another user
+        return True
+    return True
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def _label_values(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def aggregate(self, processes: List[ProcessSamples]) -> Dict[SampleKey, float]:
+        merged: Dict[SampleKey, float] = {}
+        for samples in processes:
+            for key, value in samples.items():
+                if key[0] == self.name:
+                    merged[key] = merged.get(key, 0.0) + value
+        return merged
+
+    def render(self, samples: Dict[SampleKey, float]) -> List[str]:
+        lines = []
+        for (_, label_values, _), value in sorted(samples.items()):
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, label_values)} "
+                f"{_format_value(value)}"
+            )
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        self._registry.store.inc((self.name, self._label_values(labels), ""), amount)
+
+
+class Gauge(Metric):
+    """
+    A gauge, when collected from several processes the values are either
+    summed (`sum`) or the highest one is reported (`max`)
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        multiprocess_mode: str = "sum",
+    ) -> None:
+        if multiprocess_mode not in ("sum", "max"):
+            raise ValueError("multiprocess_mode must be sum or max")
+        super().__init__(registry, name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode
+
+    def set(self, value: float, **labels: str) -> None:
+        self._registry.store.set((self.name, self._label_values(labels), ""), value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        self._registry.store.inc((self.name, self._label_values(labels), ""), amount)
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def aggregate(self, processes: List[ProcessSamples]) -> Dict[SampleKey, float]:
+        # The value of an exited process is stale, e.g. the queue depth it
+        # had or the state of its circuit breaker when it exited
+        processes = [samples for samples in processes if samples.alive]
+        if self.multiprocess_mode == "sum":
+            return super().aggregate(processes)
+        merged: Dict[SampleKey, float] = {}
+        for samples in processes:
+            for key, value in samples.items():
+                if key[0] == self.name:
+                    merged[key] = max(merged.get(key, value), value)
+        return merged
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        label_values = self._label_values(labels)
+        store = self._registry.store
+        # Only the bucket the value falls into is stored, the cumulative
+        # counts are computed when rendering
+        store.inc((self.name, label_values, str(bisect_left(self.buckets, value))), 1)
+        store.inc((self.name, label_values, "sum"), value)
+        store.inc((self.name, label_values, "count"), 1)
+
+    def render(self, samples: Dict[SampleKey, float]) -> List[str]:
+        series: Dict[Tuple[str, ...], Dict[str, float]] = {}
+        for (_, label_values, field), value in samples.items():
+            series.setdefault(label_values, {})[field] = value
+
+        lines = []
+        for label_values, fields in sorted(series.items()):
+            cumulative = 0.0
+            for index, bound in enumerate(self.buckets + (float("inf"),)):
+                cumulative += fields.get(str(index), 0.0)
+                labels = _format_labels(
+                    self.labelnames + ("le",), label_values + (_format_value(bound),)
+                )
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, label_values)
+            lines.append(
+                f"{self.name}_sum{labels} {_format_value(fields.get('sum', 0.0))}"
+            )
+            lines.append(
+                f"{self.name}_count{labels} {_format_value(fields.get('count', 0.0))}"
+            )
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, store: Optional[MetricsStore] = None) -> None:
+        self.store = store or MetricsStore()
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> None:
+        if any(m.name == metric.name for m in self._metrics):
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics.append(metric)
+
+    def set_store(self, store: MetricsStore) -> None:
+        self.store = store
+
+    def generate_latest(self) -> str:
+        """
+        Render every registered metric in the Prometheus text exposition format
+        """
+        processes = self.store.collect()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render(metric.aggregate(processes)))
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'),
+        )
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+@lru_cache(maxsize=None)
+def outcome_label(exception: type) -> str:
+    """
+    Turn an exception class into an outcome label,
+    e.g. `RevokedTokenError` into `revoked_token`
+    """
+    name = re.sub(r"Error$", "", exception.__name__)
+    name = re.sub(r"([A-Z]+)([A-Z][a-z])", r"\1_\2", name)
+    return re.sub(r"([a-z0-9])([A-Z])", r"\1_\2", name).lower()
+
+
+REGISTRY = MetricsRegistry()
+
+TOKENS_CREATED = Counter(
+    REGISTRY,
+    "authpaseto_tokens_created_total",
+    "Number of tokens created",
+    ("type", "version", "purpose"),
+)
+TOKEN_CREATION_SECONDS = Histogram(
+    REGISTRY,
+    "authpaseto_token_creation_seconds",
+    "Time spent creating a token",
+    ("type", "version", "purpose"),
+)
+TOKEN_VERIFICATIONS = Counter(
+    REGISTRY,
+    "authpaseto_token_verifications_total",
+    "Number of token verifications by outcome",
+    ("type", "version", "purpose", "outcome"),
+)
+TOKEN_VERIFICATION_SECONDS = Histogram(
+    REGISTRY,
+    "authpaseto_token_verification_seconds",
+    "Time spent verifying a token",
+    ("type", "version", "purpose", "outcome"),
+)
+REVOCATION_QUEUE_DEPTH = Gauge(
+    REGISTRY,
+    "authpaseto_revocation_queue_depth",
+    "Number of revocations waiting to be written to the denylist backend",
+)
+REVOCATION_FLUSH_SECONDS = Histogram(
+    REGISTRY,
+    "authpaseto_revocation_flush_seconds",
+    "Time spent writing a batch of revocations to the denylist backend",
+    ("outcome",),
+)
+
+DENYLIST_CACHE_LOOKUPS = Counter(
+    REGISTRY,
+    "authpaseto_denylist_cache_lookups_total",
+    "Number of lookups of the local denylist cache, by result, hit or miss",
+    ("result",),
+)
+REVOCATION_PROPAGATION_SECONDS = Histogram(
+    REGISTRY,
+    "authpaseto_revocation_propagation_seconds",
+    "Time between a revocation and its invalidation in the cache of another process",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+DENYLIST_BREAKER_STATE = Gauge(
+    REGISTRY,
+    "authpaseto_denylist_breaker_state",
+    "State of the circuit breaker of the denylist, 0 closed, 1 half-open, 2 open",
+    multiprocess_mode="max",
+)
+DENYLIST_LOOKUP_FAILURES = Counter(
+    REGISTRY,
+    "authpaseto_denylist_lookup_failures_total",
+    "Number of denylist lookups that failed, timed out or were refused by the "
+    "open circuit breaker, by the failure policy applied",
+    ("type", "reason", "policy"),
+)
+
+
+def generate_latest() -> str:
+    """
+    Render the fastapi_paseto_auth metrics in the Prometheus text format,
+    aggregated across worker processes when a metrics directory is configured
+    """
+    return REGISTRY.generate_latest()
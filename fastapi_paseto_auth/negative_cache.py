@@ -0,0 +1,68 @@
+"""
+A short-lived cache of recently rejected tokens, so a token that keeps being
+sent after failing verification costs a hash lookup instead of a decryption
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class RejectedTokenCache:
+    """
+    Bounded least recently used cache of token digests and the error
+    their verification failed with
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 10.0) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[bytes, Any], Tuple[int, str, float]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(token: bytes, key: Any) -> Tuple[bytes, Any]:
+        # The key the token was checked with is part of the cache key, a token
+        # rejected by one tenant's key may be valid with another one
+        return hashlib.blake2b(token, digest_size=16).digest(), key
+
+    def get(self, token: bytes, key: Any) -> Optional[Tuple[int, str]]:
+        """
+        :return: status code and message of the error the token was rejected with,
+                 None if it wasn't rejected recently
+        """
+        cache_key = self._cache_key(token, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            status_code, message, deadline = entry
+            if deadline <= time.monotonic():
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return status_code, message
+
+    def add(self, token: bytes, key: Any, status_code: int, message: str) -> None:
+        cache_key = self._cache_key(token, key)
+        deadline = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[cache_key] = (status_code, message, deadline)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
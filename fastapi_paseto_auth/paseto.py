@@ -0,0 +1,184 @@
+"""
+Encoding and decoding of PASETOs, v4 tokens are handled by the dedicated
+implementation in fastapi_paseto_auth.v4, the other versions by pyseto
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Union
+
+from fastapi_paseto_auth.exceptions import PASETODecodeError
+
+if TYPE_CHECKING:
+    from fastapi_paseto_auth.compaction import ClaimCompactor
+
+
+class DecodedToken:
+    """
+    A verified token, with the same attributes as pyseto's Token
+    """
+
+    __slots__ = ("version", "purpose", "payload", "footer", "claims")
+
+    def __init__(
+        self, version: str, purpose: str, payload: Dict, footer: bytes
+    ) -> None:
+        self.version = version
+        self.purpose = purpose
+        self.payload = payload
+        self.footer = footer
+        # The payload as an instance of the claims model, built on first use
+        self.claims: Any = None
+
+
+def new_key(version: int, purpose: str, key: Union[str, bytes]) -> Any:
+    """
+    Build a key object for the version and purpose
+    """
+    if version == 4:
+        from fastapi_paseto_auth import v4
+
+        return v4.new_key(purpose, key)
+
+    # pyseto loads the cryptography backends, import it on first use only
+    from pyseto import Key
+
+    return Key.new(version=version, purpose=purpose, key=key)
+
+
+def _format_datetime(value: datetime) -> str:
+    return value.isoformat(timespec="seconds")
+
+
+def _parse_datetime(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        # fromisoformat doesn't cover every ISO 8601 form, e.g. the "Z" suffix
+        import iso8601
+
+        return iso8601.parse_date(value)
+
+
+def set_registered_claims(
+    claims: Dict, exp_seconds: int, now: Optional[datetime] = None
+) -> Dict:
+    """
+    Set the `exp` and `iat` claims, `exp` only if exp_seconds is positive
+    """
+    now = now or datetime.now(tz=timezone.utc)
+    if exp_seconds > 0:
+        claims["exp"] = _format_datetime(now + timedelta(seconds=exp_seconds))
+    # Sub-second precision, so a token issued right after revoke_subject()
+    # can be told apart from the ones it revoked
+    claims["iat"] = now.isoformat(timespec="microseconds")
+    return claims
+
+
+def verify_registered_claims(
+    claims: Dict,
+    leeway: Union[int, timedelta] = 0,
+    audience: Optional[Union[str, Sequence[str]]] = None,
+) -> None:
+    """
+    Check the `exp`, `nbf` and `aud` claims the same way pyseto does
+    """
+    if not isinstance(leeway, timedelta):
+        leeway = timedelta(seconds=leeway or 0)
+    now = datetime.now(tz=timezone.utc).replace(microsecond=0)
+
+    if "exp" in claims:
+        try:
+            exp = _parse_datetime(claims["exp"])
+        except Exception:
+            raise PASETODecodeError(status_code=422, message="Invalid exp.")
+        if now > exp + leeway:
+            raise PASETODecodeError(status_code=422, message="Token expired.")
+    if "nbf" in claims:
+        try:
+            nbf = _parse_datetime(claims["nbf"])
+        except Exception:
+            raise PASETODecodeError(status_code=422, message="Invalid nbf.")
+        if now < nbf - leeway:
+            raise PASETODecodeError(
+                status_code=422, message="Token has not been activated yet."
+            )
+    if audience:
+        if "aud" not in claims or audience != claims["aud"]:
+            raise PASETODecodeError(status_code=422, message="aud verification failed.")
+
+
+def encode(
+    key: Any,
+    claims: Dict,
+    exp_seconds: int = 0,
+    footer: bytes = b"",
+    compactor: Optional["ClaimCompactor"] = None,
+    now: Optional[datetime] = None,
+) -> bytes:
+    """
+    Set the registered claims and encrypt or sign the claims with the key
+    :param compactor: shortens the claim names when set
+    :param now: time the token is issued at, defaults to the current time
+    """
+    claims = set_registered_claims(claims, exp_seconds, now)
+    if compactor is not None:
+        claims = compactor.compact(claims)
+    try:
+        payload = json.dumps(claims, separators=(",", ":")).encode("utf-8")
+    except (TypeError, ValueError) as err:
+        raise ValueError("Failed to serialize the payload.") from err
+
+    if key.version == 4:
+        return key.encode(payload, footer)
+
+    import pyseto
+
+    return pyseto.encode(key, payload, footer)
+
+
+def decode(
+    key: Any,
+    token: Union[str, bytes],
+    leeway: Union[int, timedelta] = 0,
+    audience: Optional[Union[str, Sequence[str]]] = None,
+    compactor: Optional["ClaimCompactor"] = None,
+) -> DecodedToken:
+    """
+    Decrypt or verify the token with the key and check its registered claims
+    :param compactor: restores the claim names of compacted tokens when set
+    :raises PASETODecodeError: if the token is invalid
+    """
+    btoken = token if isinstance(token, bytes) else token.encode("utf-8")
+
+    if key.version == 4:
+        from fastapi_paseto_auth.v4 import TokenError
+
+        try:
+            payload, footer = key.decode(btoken)
+        except TokenError as err:
+            raise PASETODecodeError(status_code=422, message=str(err))
+    else:
+        import binascii
+        import pyseto
+
+        try:
+            decoded = pyseto.decode(key, btoken)
+        except (pyseto.PysetoError, ValueError, binascii.Error) as err:
+            raise PASETODecodeError(status_code=422, message=str(err))
+        payload, footer = decoded.payload, decoded.footer
+
+    try:
+        claims = json.loads(payload)
+    except ValueError:
+        raise PASETODecodeError(status_code=422, message="Invalid PASETO payload")
+    if not isinstance(claims, dict):
+        raise PASETODecodeError(status_code=422, message="Invalid PASETO payload")
+    if compactor is not None:
+        try:
+            claims = compactor.expand(claims)
+        except ValueError as err:
+            raise PASETODecodeError(status_code=422, message=str(err))
+
+    verify_registered_claims(claims, leeway, audience)
+    return DecodedToken(f"v{key.version}", key.purpose, claims, footer)
@@ -0,0 +1,159 @@
+"""
+Auth policies declared on a router or a route, compiled once into the checks
+they need
+"""
+
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from fastapi import Depends
+from starlette.concurrency import run_in_threadpool
+
+from fastapi_paseto_auth.auth_paseto import AuthPASETO
+from fastapi_paseto_auth.exceptions import (
+    AccessTokenRequired,
+    AuthPASETOException,
+    FreshTokenRequired,
+    InsufficientScopeError,
+    InvalidPASETOArgumentError,
+    InvalidTokenTypeError,
+    MissingTokenError,
+    PASETODecodeError,
+    RefreshTokenRequired,
+)
+
+
+class AuthPolicy:
+    """
+    A dependency that requires a token, e.g.
+    `APIRouter(dependencies=[Depends(AuthPolicy(fresh=True))])`, or
+    `claims: dict = Depends(AuthPolicy(scopes=["items:read"]))` to receive the
+    claims of the verified token. The options are checked when the policy is
+    declared, every request only runs the checks the policy needs
+    """
+
+    def __init__(
+        self,
+        optional: bool = False,
+        fresh: bool = False,
+        refresh_token: bool = False,
+        type: Optional[str] = None,
+        scopes: Iterable[str] = (),
+        scopes_claim: str = "scopes",
+        base64_encoded: bool = False,
+    ) -> None:
+        """
+        :param optional: if True, requests without a valid token get None claims
+        :param fresh: if True, the token must be a fresh access token
+        :param refresh_token: if True, the token must be a refresh token
+        :param type: type the token must have, for custom token types
+        :param scopes: scopes the token must all have
+        :param scopes_claim: claim with the scopes of the token, a list of scopes
+                             or a string of space-separated scopes
+        :param base64_encoded: whether the token is base64 encoded
+        """
+        if refresh_token and fresh:
+            raise InvalidPASETOArgumentError(
+                status_code=422,
+                message="fresh and refresh_token cannot be True at the same time",
+            )
+        if refresh_token and type:
+            raise InvalidPASETOArgumentError(
+                status_code=422,
+                message="type and refresh_token cannot be set at the same time",
+            )
+        self.optional = optional
+        self.base64_encoded = base64_encoded
+        self._checks = self._compile(
+            fresh, refresh_token, type, frozenset(scopes), scopes_claim
+        )
+
+    @staticmethod
+    def _compile(
+        fresh: bool,
+        refresh_token: bool,
+        type: Optional[str],
+        scopes: frozenset,
+        scopes_claim: str,
+    ) -> List[Callable[[Dict], None]]:
+        """
+        :return: the checks of the claims of a verified token
+        """
+        checks = []
+
+        if refresh_token:
+            expected_type, error = "refresh", RefreshTokenRequired
+            template = "Refresh token required but {} provided"
+        elif type:
+            expected_type, error = type, InvalidTokenTypeError
+            template = type + " token required but {} provided"
+        else:
+            expected_type, error = "access", AccessTokenRequired
+            template = "Access token required but {} provided"
+
+        def check_type(payload: Dict) -> None:
+            token_type = payload.get("type")
+            if token_type != expected_type:
+                raise error(status_code=422, message=template.format(token_type))
+
+        checks.append(check_type)
+
+        if fresh:
+
+            def check_fresh(payload: Dict) -> None:
+                if not payload.get("fresh"):
+                    raise FreshTokenRequired(
+                        status_code=401, message="PASETO access token is not fresh"
+                    )
+
+            checks.append(check_fresh)
+
+        if scopes:
+
+            def check_scopes(payload: Dict) -> None:
+                granted = payload.get(scopes_claim) or ()
+                if isinstance(granted, str):
+                    granted = granted.split()
+                if not scopes.issubset(granted):
+                    raise InsufficientScopeError(
+                        status_code=403, message="Token is missing required scopes"
+                    )
+
+            checks.append(check_scopes)
+
+        return checks
+
+    async def __call__(self, Authorize: AuthPASETO = Depends()) -> Optional[Any]:
+        """
+        :return: claims of the verified token, an instance of the claims model
+                 when one is loaded, None when the policy is optional and the
+                 request has no valid token
+        """
+        start = time.perf_counter() if Authorize._metrics_enabled else None
+        try:
+            if not Authorize._token:
+                raise MissingTokenError(
+                    status_code=401, message="PASETO Authorization Token required"
+                )
+            await Authorize._decode_token_async(base64_encoded=self.base64_encoded)
+            if Authorize._claims_store is not None:
+                # The claims of a reference token are fetched from the claims store
+                payload = await run_in_threadpool(Authorize.get_token_payload)
+            else:
+                payload = Authorize.get_token_payload()
+            for check in self._checks:
+                check(payload)
+            if Authorize._claims_converter is not None:
+                payload = Authorize.get_claims()
+        except AuthPASETOException as err:
+            if start is not None:
+                Authorize._observe_verification(start, err)
+            if self.optional and isinstance(
+                err, (MissingTokenError, PASETODecodeError)
+            ):
+                return None
+            raise
+
+        if start is not None:
+            Authorize._observe_verification(start)
+        return payload
@@ -0,0 +1,74 @@
+"""
+Coalescing of concurrent calls for the same key, so a burst of requests
+with the same token shares a single denylist lookup
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Runs a single call per key at a time, the callers that ask for the same key
+    while it is in flight wait for that call and get its result or its error.
+    Threads and coroutines are coalesced separately, coroutines per event loop
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, Future] = {}
+        self._tasks: Dict[Tuple[Any, Hashable], "asyncio.Future"] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Call `func(*args)` in the current thread, or wait for the call
+        another thread is making for the same key
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args)
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(
+        self, key: Hashable, func: Callable[..., Awaitable[Any]], *args: Any
+    ) -> Any:
+        """
+        Await `func(*args)`, or the call another coroutine is making for the same key.
+        The call runs in its own task, cancelling one of the callers doesn't
+        cancel it for the others
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        task = self._tasks.get(task_key)
+        if task is None:
+            task = self._tasks[task_key] = loop.create_task(func(*args))
+            task.add_done_callback(lambda done: self._forget(task_key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, task_key: Tuple[Any, Hashable], task: "asyncio.Future") -> None:
+        if self._tasks.get(task_key) is task:
+            del self._tasks[task_key]
+        # Every caller may have been cancelled, the error is retrieved so it
+        # isn't reported as never retrieved
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._calls) + len(self._tasks)
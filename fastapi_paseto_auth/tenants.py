@@ -0,0 +1,97 @@
+"""
+Per-tenant configurations, so one process can serve several issuers and key sets
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, Iterable, Optional, Tuple
+
+# AuthConfig attributes a tenant sets, everything else is shared by all tenants
+TENANT_ATTRIBUTES = (
+    "secret_key",
+    "public_key",
+    "private_key",
+    "purpose",
+    "version",
+    "decode_leeway",
+    "encode_issuer",
+    "decode_issuer",
+    "decode_audience",
+    "access_token_expires",
+    "refresh_token_expires",
+    "other_token_expires",
+)
+
+# Claim of the footer that names the tenant of a token
+TENANT_CLAIM = "tid"
+
+
+class TenantConfig:
+    """
+    The compiled configuration of a tenant, only the values that differ
+    between tenants are kept
+    """
+
+    __slots__ = ("name", "hosts", "footer") + TENANT_ATTRIBUTES
+
+    def __init__(self, name: str, config: Any) -> None:
+        """
+        :param config: validated LoadConfig of the tenant
+        """
+        self.name = name
+        self.hosts: Tuple[str, ...] = tuple(config.authpaseto_tenant_hosts or ())
+        self.footer = json.dumps({TENANT_CLAIM: name}, separators=(",", ":")).encode(
+            "utf-8"
+        )
+        for attribute in TENANT_ATTRIBUTES:
+            setattr(self, attribute, getattr(config, f"authpaseto_{attribute}"))
+
+    def apply(self, authorize: Any) -> None:
+        """
+        Shadow the class-level configuration with the one of the tenant
+        on a single AuthPASETO instance
+        """
+        authorize._tenant = self
+        for attribute in TENANT_ATTRIBUTES:
+            setattr(authorize, f"_{attribute}", getattr(self, attribute))
+
+
+def settings_items(settings: Any) -> Iterable[Tuple[str, Any]]:
+    """
+    :return: the options of a pydantic settings object, a dictionary
+             or a list of tuples
+    """
+    if isinstance(settings, dict):
+        return settings.items()
+    return settings
+
+
+def normalize_host(host: bytes) -> bytes:
+    """
+    :return: the lowercase host without the port
+    """
+    name, separator, port = host.rpartition(b":")
+    if separator and port.isdigit():
+        host = name
+    return host.lower()
+
+
+def tenant_from_footer(footer: bytes) -> Optional[str]:
+    """
+    Read the tenant from the base64url encoded footer of a token. The footer is
+    authenticated together with the token, by the keys of the tenant it names
+    :return: name of the tenant, None if the footer doesn't name one
+    """
+    if not footer:
+        return None
+    try:
+        claims = json.loads(
+            base64.urlsafe_b64decode(footer + b"=" * (-len(footer) % 4))
+        )
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(claims, dict):
+        return None
+    tenant = claims.get(TENANT_CLAIM)
+    return tenant if isinstance(tenant, str) else None
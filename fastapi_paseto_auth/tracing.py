@@ -0,0 +1,36 @@
+"""
+Optional tracing of token creation, verification and denylist lookups
+"""
+
+from typing import Any, Dict, Optional
+
+
+class NoopSpan:
+    """
+    Stand-in span used when no tracer is configured
+    """
+
+    def __enter__(self) -> "NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+def start_span(tracer: Any, name: str, attributes: Optional[Dict[str, Any]] = None):
+    """
+    Start a span with an OpenTelemetry compatible tracer, that is an object
+    with a `start_as_current_span(name, attributes=...)` method.
+    Only non-sensitive token metadata must be passed as attributes,
+    never keys, tokens or claims.
+    :return: context manager returning the span, a no-op one without a tracer
+    """
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.start_as_current_span(name, attributes=attributes)
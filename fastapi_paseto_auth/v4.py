@@ -0,0 +1,269 @@
+"""
+Dedicated implementation of PASETO v4.local (XChaCha20 with a BLAKE2b MAC)
+and v4.public (Ed25519), calling the native primitives directly instead of
+going through the generic version dispatch of pyseto
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import struct
+from secrets import token_bytes
+from typing import Any, Optional, Tuple, Union
+
+from Cryptodome.Cipher import ChaCha20
+
+# cryptography is only imported by the public keys, an app that uses
+# local tokens only never loads it
+
+LOCAL_HEADER = b"v4.local."
+PUBLIC_HEADER = b"v4.public."
+
+NONCE_SIZE = 32
+MAC_SIZE = 32
+SIGNATURE_SIZE = 64
+
+_le64 = struct.Struct("<Q").pack
+
+
+def _pae_length(piece: bytes) -> bytes:
+    return _le64(len(piece) & 0x7FFFFFFFFFFFFFFF)
+
+
+# Pre-authentication encoding of the pieces that never change: the number of
+# pieces, the header and, for local tokens, the length of the nonce
+_LOCAL_PAE_PREFIX = (
+    _le64(5) + _pae_length(LOCAL_HEADER) + LOCAL_HEADER + _le64(NONCE_SIZE)
+)
+_PUBLIC_PAE_PREFIX = _le64(4) + _pae_length(PUBLIC_HEADER) + PUBLIC_HEADER
+
+
+class TokenError(Exception):
+    """
+    Raised when a token can't be decrypted or verified
+    """
+
+
+def base64url_encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def base64url_decode(data: bytes) -> bytes:
+    try:
+        return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+    except (binascii.Error, ValueError) as err:
+        raise TokenError("Invalid PASETO format") from err
+
+
+def split_token(token: bytes, header: bytes) -> Tuple[bytes, bytes]:
+    """
+    :return: decoded body and footer of the token
+    """
+    if not token.startswith(header):
+        raise TokenError(f"Token is not a {header.decode()[:-1]} token")
+    body, _, footer = token[len(header) :].partition(b".")
+    if not body or b"." in footer:
+        raise TokenError("Invalid PASETO format")
+    return base64url_decode(body), base64url_decode(footer) if footer else b""
+
+
+def join_token(header: bytes, body: bytes, footer: bytes) -> bytes:
+    if footer:
+        return b"".join(
+            (header, base64url_encode(body), b".", base64url_encode(footer))
+        )
+    return header + base64url_encode(body)
+
+
+class V4Local:
+    """
+    A symmetric key for v4.local tokens
+    """
+
+    __slots__ = ("_key",)
+
+    version = 4
+    purpose = "local"
+    header = LOCAL_HEADER
+    is_secret = True
+
+    def __init__(self, key: Union[str, bytes]) -> None:
+        key = key if isinstance(key, bytes) else key.encode("utf-8")
+        # BLAKE2b accepts keys of up to 64 bytes, same as pyseto
+        if not key or len(key) > 64:
+            raise ValueError("key length must be between 1 and 64 bytes.")
+        self._key = key
+
+    def _derive_keys(self, nonce: bytes) -> Tuple[bytes, bytes, bytes]:
+        tmp = hashlib.blake2b(
+            b"paseto-encryption-key" + nonce, key=self._key, digest_size=56
+        ).digest()
+        auth_key = hashlib.blake2b(
+            b"paseto-auth-key-for-aead" + nonce, key=self._key, digest_size=32
+        ).digest()
+        return tmp[:32], tmp[32:], auth_key
+
+    @staticmethod
+    def _mac(
+        auth_key: bytes, nonce: bytes, ciphertext: bytes, footer: bytes, implicit: bytes
+    ) -> bytes:
+        # The pre-authentication encoding is streamed into the MAC piece by piece,
+        # so the message is never assembled in memory
+        mac = hashlib.blake2b(key=auth_key, digest_size=MAC_SIZE)
+        mac.update(_LOCAL_PAE_PREFIX)
+        mac.update(nonce)
+        mac.update(_pae_length(ciphertext))
+        mac.update(ciphertext)
+        mac.update(_pae_length(footer))
+        mac.update(footer)
+        mac.update(_pae_length(implicit))
+        mac.update(implicit)
+        return mac.digest()
+
+    def encode(
+        self,
+        payload: bytes,
+        footer: bytes = b"",
+        implicit_assertion: bytes = b"",
+        nonce: Optional[bytes] = None,
+    ) -> bytes:
+        """
+        Encrypt the payload into a v4.local token
+        :param nonce: only meant for the test vectors, a random one is used by default
+        """
+        nonce = nonce or token_bytes(NONCE_SIZE)
+        if len(nonce) != NONCE_SIZE:
+            raise ValueError("nonce must be 32 bytes long.")
+        encryption_key, counter_nonce, auth_key = self._derive_keys(nonce)
+        ciphertext = ChaCha20.new(key=encryption_key, nonce=counter_nonce).encrypt(
+            payload
+        )
+        mac = self._mac(auth_key, nonce, ciphertext, footer, implicit_assertion)
+        return join_token(LOCAL_HEADER, b"".join((nonce, ciphertext, mac)), footer)
+
+    def decode(
+        self, token: bytes, implicit_assertion: bytes = b""
+    ) -> Tuple[bytes, bytes]:
+        """
+        Decrypt a v4.local token
+        :return: payload and footer of the token
+        """
+        body, footer = split_token(token, LOCAL_HEADER)
+        if len(body) < NONCE_SIZE + MAC_SIZE:
+            raise TokenError("Failed to decrypt.")
+        nonce = body[:NONCE_SIZE]
+        ciphertext = body[NONCE_SIZE:-MAC_SIZE]
+        encryption_key, counter_nonce, auth_key = self._derive_keys(nonce)
+        mac = self._mac(auth_key, nonce, ciphertext, footer, implicit_assertion)
+        if not hmac.compare_digest(body[-MAC_SIZE:], mac):
+            raise TokenError("Failed to decrypt.")
+        payload = ChaCha20.new(key=encryption_key, nonce=counter_nonce).decrypt(
+            ciphertext
+        )
+        return payload, footer
+
+
+class V4Public:
+    """
+    An Ed25519 key for v4.public tokens, a private key can sign and verify,
+    a public key can only verify
+    """
+
+    __slots__ = ("_private_key", "_public_key")
+
+    version = 4
+    purpose = "public"
+    header = PUBLIC_HEADER
+
+    def __init__(self, key: Union[str, bytes, Any]) -> None:
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import (
+            Ed25519PrivateKey,
+            Ed25519PublicKey,
+        )
+
+        if isinstance(key, (str, bytes)):
+            key = load_pem_key(key)
+        if isinstance(key, Ed25519PrivateKey):
+            self._private_key: Optional[Any] = key
+            self._public_key = key.public_key()
+        elif isinstance(key, Ed25519PublicKey):
+            self._private_key = None
+            self._public_key = key
+        else:
+            raise ValueError("The key is not Ed25519 key.")
+
+    @property
+    def is_secret(self) -> bool:
+        return self._private_key is not None
+
+    @staticmethod
+    def _pae(payload: bytes, footer: bytes, implicit: bytes) -> bytes:
+        # One allocation of the exact size, the constant prefix is computed once
+        return b"".join(
+            (
+                _PUBLIC_PAE_PREFIX,
+                _pae_length(payload),
+                payload,
+                _pae_length(footer),
+                footer,
+                _pae_length(implicit),
+                implicit,
+            )
+        )
+
+    def encode(
+        self, payload: bytes, footer: bytes = b"", implicit_assertion: bytes = b""
+    ) -> bytes:
+        """
+        Sign the payload into a v4.public token
+        """
+        if self._private_key is None:
+            raise ValueError("A public key cannot be used for signing.")
+        signature = self._private_key.sign(
+            self._pae(payload, footer, implicit_assertion)
+        )
+        return join_token(PUBLIC_HEADER, payload + signature, footer)
+
+    def decode(
+        self, token: bytes, implicit_assertion: bytes = b""
+    ) -> Tuple[bytes, bytes]:
+        """
+        Verify a v4.public token
+        :return: payload and footer of the token
+        """
+        from cryptography.exceptions import InvalidSignature
+
+        body, footer = split_token(token, PUBLIC_HEADER)
+        if len(body) <= SIGNATURE_SIZE:
+            raise TokenError("Failed to verify.")
+        payload = body[:-SIGNATURE_SIZE]
+        try:
+            self._public_key.verify(
+                body[-SIGNATURE_SIZE:], self._pae(payload, footer, implicit_assertion)
+            )
+        except InvalidSignature as err:
+            raise TokenError("Failed to verify.") from err
+        return payload, footer
+
+
+def load_pem_key(key: Union[str, bytes]) -> Any:
+    from cryptography.hazmat.primitives.serialization import (
+        load_pem_private_key,
+        load_pem_public_key,
+    )
+
+    bkey = key if isinstance(key, bytes) else key.encode("utf-8")
+    if bkey.startswith(b"-----BEGIN PRIVATE"):
+        return load_pem_private_key(bkey, password=None)
+    if bkey.startswith(b"-----BEGIN PUBLIC"):
+        return load_pem_public_key(bkey)
+    raise ValueError("Invalid or unsupported PEM format.")
+
+
+def new_key(purpose: str, key: Union[str, bytes]) -> Union[V4Local, V4Public]:
+    if purpose == "local":
+        return V4Local(key)
+    if purpose == "public":
+        return V4Public(key)
+    raise ValueError(f"Invalid purpose: {purpose}.")
@@ -0,0 +1,2 @@
+#!/usr/bin/env bash
+python -m benchmarks "${@:-compare}"
\ No newline at end of file
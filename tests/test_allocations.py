@@ -0,0 +1,51 @@
+import os
+import pytest
+from fastapi_paseto_auth import AuthPASETO
+from benchmarks import cases, memory
+
+# Scales the peak memory budgets, e.g. for another Python version
+MEMORY_BUDGET_SCALE = float(os.environ.get("AUTHPASETO_MEMORY_BUDGET_SCALE", 1))
+
+
+@pytest.fixture(scope="module")
+def load_config():
+    cases.load_config()
+    yield
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+@pytest.mark.parametrize("name", list(memory.DEFAULT_PEAK_BUDGETS))
+def test_memory_budget(load_config, name):
+    result = memory.measure_memory(cases.CASES[name](), calls=300)
+
+    budget = memory.DEFAULT_PEAK_BUDGETS[name] * MEMORY_BUDGET_SCALE
+    assert (
+        result["peak"] <= budget
+    ), f"{name} allocated {result['peak']:.0f}B at its peak, the budget is {budget:.0f}B"
+    assert (
+        result["retained_blocks"] <= memory.DEFAULT_RETAINED_BLOCKS_BUDGET
+    ), f"{name} retained {result['retained_blocks']:.2f} blocks per call"
+
+
+def test_leak_is_over_budget():
+    leaked = []
+
+    def leak():
+        leaked.append(object())
+
+    result = memory.measure_memory(leak, calls=100)
+    assert result["retained_blocks"] >= 1
+    assert "leak" in memory.check_budgets({"leak": result})
+
+
+def test_peak_over_budget():
+    def allocate():
+        bytearray(10000)
+
+    result = memory.measure_memory(allocate, calls=10)
+    assert result["peak"] >= 10000
+    failures = memory.check_budgets({"allocate": result}, {"allocate": 5000})
+    assert failures == {"allocate": f"peak {result['peak']:.0f}B > 5000B"}
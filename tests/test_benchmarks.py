@@ -0,0 +1,90 @@
+import json
+import pytest
+from fastapi_paseto_auth import AuthPASETO
+from benchmarks import run, stats
+
+
+@pytest.fixture(scope="function")
+def reset_config():
+    yield
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+@pytest.mark.parametrize(
+    "t,df,expected",
+    [(2.0, 10, 0.036694), (-1.0, 5, 0.818391), (0.5, 3, 0.325724), (0.0, 7, 0.5)],
+)
+def test_t_survival(t, df, expected):
+    assert stats.t_survival(t, df) == pytest.approx(expected, abs=1e-6)
+
+
+def test_welch_t_test():
+    baseline = [1.0, 1.1, 0.9, 1.0, 1.05, 0.95]
+    slower = [1.5, 1.6, 1.4, 1.5, 1.55, 1.45]
+
+    t, df, p_value = stats.welch_t_test(baseline, slower)
+    assert t > 0
+    assert df == pytest.approx(10)
+    assert p_value < 0.001
+
+    _, _, p_value = stats.welch_t_test(slower, baseline)
+    assert p_value > 0.999
+
+
+def test_compare_verdicts():
+    baseline = {
+        "same": {"mean": 1.0, "samples": [1.0, 1.1, 0.9, 1.0]},
+        "slower": {"mean": 1.0, "samples": [1.0, 1.1, 0.9, 1.0]},
+        "tolerated": {"mean": 1.0, "samples": [1.0, 1.1, 0.9, 1.0]},
+        "faster": {"mean": 1.0, "samples": [1.0, 1.1, 0.9, 1.0]},
+    }
+    current = {
+        "same": {"mean": 1.0, "samples": [1.05, 0.95, 1.0, 1.0]},
+        "slower": {"mean": 1.5, "samples": [1.5, 1.6, 1.4, 1.5]},
+        "tolerated": {"mean": 1.5, "samples": [1.5, 1.6, 1.4, 1.5]},
+        "faster": {"mean": 0.5, "samples": [0.5, 0.6, 0.4, 0.5]},
+        "new": {"mean": 1.0, "samples": [1.0, 1.0, 1.0, 1.0]},
+    }
+
+    rows = run.compare(baseline, current, 0.1, 0.01, {"tolerated": 0.6})
+    assert {row["name"]: row["verdict"] for row in rows} == {
+        "same": "ok",
+        "slower": "REGRESSION",
+        "tolerated": "ok",
+        "faster": "faster",
+        "new": "new",
+    }
+
+
+def test_record_and_compare(tmp_path, reset_config, capsys):
+    baseline_path = str(tmp_path / "baseline.json")
+    options = ["--baseline", baseline_path, "--rounds", "10", "--min-time", "0.001"]
+    options += ["-k", "header_parsing"]
+
+    assert run.main(["record", *options]) == 0
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    assert list(baseline["benchmarks"]) == ["header_parsing"]
+    assert len(baseline["benchmarks"]["header_parsing"]["samples"]) == 10
+
+    assert run.main(["compare", *options, "--tolerance", "10"]) == 0
+
+    # A baseline ten times faster than the current code
+    result = baseline["benchmarks"]["header_parsing"]
+    result["samples"] = [sample / 10 for sample in result["samples"]]
+    result["mean"] /= 10
+    with open(baseline_path, "w") as f:
+        json.dump(baseline, f)
+
+    assert run.main(["compare", *options]) == 1
+    assert "Regressions: header_parsing" in capsys.readouterr().err
+
+
+def test_compare_without_baseline(tmp_path, capsys):
+    baseline_path = str(tmp_path / "baseline.json")
+
+    assert run.main(["compare", "--baseline", baseline_path]) == 2
+    assert "run `python -m benchmarks record` first" in capsys.readouterr().err
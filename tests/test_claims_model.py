@@ -0,0 +1,143 @@
+import pytest
+from dataclasses import dataclass
+from typing import List
+from pydantic import BaseModel
+from fastapi_paseto_auth import AuthPASETO, AuthPolicy
+from fastapi_paseto_auth.claims_model import compile_claims_model
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+
+@dataclass(frozen=True, slots=True)
+class DataclassClaims:
+    sub: str
+    type: str
+    roles: List[str]
+    fresh: bool = False
+
+
+class PydanticClaims(BaseModel):
+    sub: str
+    type: str
+    roles: List[str]
+    fresh: bool = False
+
+
+@pytest.fixture(scope="function")
+def load_claims_model():
+    def load(model):
+        @AuthPASETO.claims_model_loader
+        def get_claims_model():
+            return model
+
+    yield load
+
+    AuthPASETO._claims_model = None
+    AuthPASETO._claims_converter = None
+
+
+@pytest.fixture(scope="function")
+def client():
+    @AuthPASETO.load_config
+    def get_settings():
+        return [("authpaseto_secret_key", "secret-key")]
+
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.get("/protected")
+    def protected(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        claims = Authorize.get_claims()
+        assert Authorize.get_claims() is claims
+        return {
+            "model": type(claims).__name__,
+            "sub": claims.sub,
+            "roles": claims.roles,
+        }
+
+    @app.get("/policy")
+    def policy(claims=Depends(AuthPolicy())):
+        sub = claims["sub"] if isinstance(claims, dict) else claims.sub
+        return {"model": type(claims).__name__, "sub": sub}
+
+    yield TestClient(app)
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+def get(client: TestClient, url: str, token: str):
+    return client.get(url, headers={"Authorization": f"Bearer {token}"})
+
+
+@pytest.mark.parametrize("model", [DataclassClaims, PydanticClaims])
+def test_claims_model(client, load_claims_model, model):
+    load_claims_model(model)
+    token = AuthPASETO().create_access_token(
+        subject="test", user_claims={"roles": ["admin"]}
+    )
+
+    response = get(client, "/protected", token)
+    assert response.json() == {
+        "model": model.__name__,
+        "sub": "test",
+        "roles": ["admin"],
+    }
+
+    response = get(client, "/policy", token)
+    assert response.json() == {"model": model.__name__, "sub": "test"}
+
+
+def test_msgspec_claims_model(client, load_claims_model):
+    msgspec = pytest.importorskip("msgspec")
+
+    class StructClaims(msgspec.Struct):
+        sub: str
+        roles: List[str]
+
+    load_claims_model(StructClaims)
+    token = AuthPASETO().create_access_token(
+        subject="test", user_claims={"roles": ["admin"]}
+    )
+
+    response = get(client, "/protected", token)
+    assert response.json() == {
+        "model": "StructClaims",
+        "sub": "test",
+        "roles": ["admin"],
+    }
+
+
+@pytest.mark.parametrize("model", [DataclassClaims, PydanticClaims])
+def test_claims_not_matching_model(client, load_claims_model, model):
+    load_claims_model(model)
+    token = AuthPASETO().create_access_token(subject="test")
+
+    response = get(client, "/protected", token)
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Token claims don't match the claims model"}
+
+
+def test_claims_without_model(client):
+    token = AuthPASETO().create_access_token(subject="test")
+    response = get(client, "/policy", token)
+    assert response.status_code == 200
+
+    with pytest.raises(RuntimeError, match=r"claims_model_loader"):
+        AuthPASETO().get_claims()
+
+
+def test_unsupported_claims_model():
+    with pytest.raises(TypeError):
+        compile_claims_model(dict)
+    with pytest.raises(TypeError):
+        compile_claims_model(DataclassClaims(sub="test", type="access", roles=[]))
@@ -0,0 +1,163 @@
+import json
+import pytest
+from fastapi_paseto_auth import AuthPASETO, paseto
+from fastapi_paseto_auth.compaction import ClaimCompactor
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi_paseto_auth.v4 import V4Local
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseSettings, ValidationError
+from typing import Dict
+
+
+@pytest.fixture(scope="function")
+def client():
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.get("/payload")
+    def payload(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        return {"payload": Authorize.get_token_payload(), "jti": Authorize.get_jti()}
+
+    yield TestClient(app)
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+def load_config(**options):
+    class Settings(BaseSettings):
+        authpaseto_secret_key: str = "secret-key"
+        authpaseto_compact_claims: bool = True
+        authpaseto_claim_maps: Dict[int, Dict[str, str]] = {}
+
+    @AuthPASETO.load_config
+    def get_settings():
+        return Settings(**options)
+
+
+def raw_payload(token: str) -> Dict:
+    payload, _ = V4Local(b"secret-key").decode(token.encode("utf-8"))
+    return json.loads(payload)
+
+
+def test_compact_claims(client: TestClient, Authorize: AuthPASETO):
+    load_config(authpaseto_compact_claims=False)
+    user_claims = {"permissions": ["read", "write"]}
+    token = Authorize.create_access_token(subject="test", user_claims=user_claims)
+    response = client.get("/payload", headers={"Authorization": f"Bearer {token}"})
+    expected = response.json()
+
+    load_config(authpaseto_claim_maps={1: {"permissions": "p"}})
+    compact_token = Authorize.create_access_token(
+        subject="test", user_claims=user_claims, audience="api"
+    )
+    assert len(compact_token) < len(token)
+    assert set(raw_payload(compact_token)) == {
+        "_c",
+        "t",
+        "f",
+        "s",
+        "j",
+        "n",
+        "i",
+        "e",
+        "a",
+        "p",
+    }
+
+    response = client.get(
+        "/payload", headers={"Authorization": f"Bearer {compact_token}"}
+    )
+    assert response.status_code == 200
+    payload = response.json()["payload"]
+    assert response.json()["jti"] == payload["jti"]
+    assert set(payload) == set(expected["payload"]) | {"aud"}
+    assert payload["permissions"] == ["read", "write"]
+
+    # Tokens created before compaction was enabled are still accepted
+    response = client.get("/payload", headers={"Authorization": f"Bearer {token}"})
+    assert response.json() == expected
+
+
+def test_claim_map_versions(client: TestClient, Authorize: AuthPASETO):
+    load_config(authpaseto_claim_maps={1: {"permissions": "p"}})
+    old_token = Authorize.create_access_token(
+        subject="test", user_claims={"permissions": ["read"]}
+    )
+    assert raw_payload(old_token)["_c"] == 1
+
+    load_config(authpaseto_claim_maps={1: {"permissions": "p"}, 2: {"roles": "p"}})
+    token = Authorize.create_access_token(subject="test", user_claims={"roles": [1]})
+    assert raw_payload(token)["_c"] == 2
+
+    response = client.get("/payload", headers={"Authorization": f"Bearer {old_token}"})
+    assert response.json()["payload"]["permissions"] == ["read"]
+    response = client.get("/payload", headers={"Authorization": f"Bearer {token}"})
+    assert response.json()["payload"]["roles"] == [1]
+
+    load_config(authpaseto_claim_maps={})
+    response = client.get("/payload", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Unknown claim map version"}
+
+
+def test_claim_name_collisions():
+    compactor = ClaimCompactor()
+    # "s" is the short name of "sub", such claims are left uncompacted
+    claims = {"sub": "test", "s": "value"}
+    assert compactor.compact(claims) == claims
+    assert compactor.expand(claims) == claims
+
+    assert compactor.expand(compactor.compact({"sub": "test", "foo": 1})) == {
+        "sub": "test",
+        "foo": 1,
+    }
+    with pytest.raises(ValueError, match="Unknown claim map version"):
+        compactor.expand({"_c": [1]})
+    with pytest.raises(ValueError, match="_c is reserved"):
+        compactor.compact({"sub": "test", "_c": 0})
+
+
+@pytest.mark.parametrize("compact_claims", [True, False])
+def test_version_claim_is_reserved(compact_claims, Authorize: AuthPASETO):
+    load_config(authpaseto_compact_claims=compact_claims)
+
+    for value in (0, "x"):
+        with pytest.raises(ValueError, match="'_c' claim is reserved"):
+            Authorize.create_access_token(subject="test", user_claims={"_c": value})
+
+
+def test_uncompacted_tokens_are_not_expanded(client: TestClient, Authorize: AuthPASETO):
+    # Without compaction, claims that look compacted are returned as they are
+    load_config(authpaseto_compact_claims=False)
+    key = V4Local(b"secret-key")
+    token = paseto.encode(
+        key, {"sub": "test", "type": "access", "fresh": False, "_c": "x"}, 60
+    ).decode("utf-8")
+
+    response = client.get("/payload", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["payload"]["_c"] == "x"
+
+
+@pytest.mark.parametrize(
+    "claim_maps",
+    [
+        {1: {"sub": "subject"}},
+        {1: {"permissions": "s"}},
+        {1: {"permissions": "p", "roles": "p"}},
+        {1: {"permissions": "_c"}},
+    ],
+)
+def test_invalid_claim_maps(claim_maps):
+    with pytest.raises(ValidationError):
+        load_config(authpaseto_claim_maps=claim_maps)
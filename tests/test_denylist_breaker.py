@@ -0,0 +1,220 @@
+import time
+import pytest
+from pydantic import ValidationError
+from fastapi_paseto_auth import AuthPASETO, metrics
+from fastapi_paseto_auth.breaker import CircuitBreaker
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi_paseto_auth.metrics import MetricsStore
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+# what the denylist callback does: "ok", "fail" or "hang"
+backend = {"mode": "ok", "calls": 0}
+
+
+def load_settings(**options):
+    @AuthPASETO.load_config
+    def get_settings():
+        return [
+            ("authpaseto_secret_key", "secret-key"),
+            ("authpaseto_denylist_enabled", True),
+            ("authpaseto_metrics_enabled", True),
+        ] + [(f"authpaseto_{name}", value) for name, value in options.items()]
+
+
+@pytest.fixture(scope="function")
+def client():
+    previous_secret_key = AuthPASETO._secret_key
+
+    @AuthPASETO.token_in_denylist_loader
+    def check_if_token_in_denylist(decrypted_token):
+        backend["calls"] += 1
+        if backend["mode"] == "fail":
+            raise ConnectionError("Connection refused")
+        if backend["mode"] == "hang":
+            time.sleep(0.5)
+        return False
+
+    metrics.REGISTRY.set_store(MetricsStore())
+
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.get("/protected")
+    def protected(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        return {"hello": "world"}
+
+    @app.get("/refresh")
+    def refresh(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required(refresh_token=True)
+        return {"hello": "world"}
+
+    @app.get("/async-protected")
+    async def async_protected(Authorize: AuthPASETO = Depends()):
+        await Authorize.paseto_required_async()
+        return {"hello": "world"}
+
+    yield TestClient(app)
+
+    backend.update(mode="ok", calls=0)
+    AuthPASETO._token_in_denylist_callback = None
+    metrics.REGISTRY.set_store(MetricsStore())
+
+    # Turn the denylist and its failure handling off, the secret key of the
+    # previous tests is kept for the tests that run next
+    @AuthPASETO.load_config
+    def reset_settings():
+        return [("authpaseto_secret_key", previous_secret_key)]
+
+
+def get(client: TestClient, url: str, token: str):
+    return client.get(url, headers={"Authorization": f"Bearer {token}"})
+
+
+def test_circuit_breaker():
+    states = []
+    breaker = CircuitBreaker(
+        failure_threshold=2, reset_timeout=0.05, on_state_change=states.append
+    )
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    # A single trial call goes through once the reset timeout has elapsed
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+    assert states == ["open", "half_open", "open", "half_open", "closed"]
+
+    with pytest.raises(ValueError, match="failure_threshold"):
+        CircuitBreaker(failure_threshold=0)
+    with pytest.raises(ValueError, match="reset_timeout"):
+        CircuitBreaker(reset_timeout=0)
+
+
+def test_errors_are_raised_without_failure_handling(client):
+    load_settings()
+    backend["mode"] = "fail"
+    token = AuthPASETO().create_access_token(subject="test")
+
+    with pytest.raises(ConnectionError):
+        get(client, "/protected", token)
+
+
+@pytest.mark.parametrize("url", ["/protected", "/async-protected"])
+def test_fail_closed(client, url):
+    load_settings(denylist_failure_policy="closed")
+    backend["mode"] = "fail"
+    token = AuthPASETO().create_access_token(subject="test")
+
+    response = get(client, url, token)
+    assert response.status_code == 503
+    assert response.json() == {"detail": "Token denylist is unavailable"}
+
+
+def test_failure_policy_per_token_type(client):
+    load_settings(denylist_failure_policy={"access": "open"})
+    backend["mode"] = "fail"
+    Authorize = AuthPASETO()
+    access_token = Authorize.create_access_token(subject="test")
+    refresh_token = Authorize.create_refresh_token(subject="test")
+
+    assert get(client, "/protected", access_token).status_code == 200
+    # Token types without a policy fail closed
+    assert get(client, "/refresh", refresh_token).status_code == 503
+
+    assert (
+        'authpaseto_denylist_lookup_failures_total{type="access",reason="error",'
+        'policy="open"} 1.0'
+    ) in metrics.generate_latest()
+
+
+@pytest.mark.parametrize("url", ["/protected", "/async-protected"])
+def test_timeout(client, url):
+    load_settings(denylist_timeout=0.05)
+    backend["mode"] = "hang"
+    token = AuthPASETO().create_access_token(subject="test")
+
+    start = time.perf_counter()
+    response = get(client, url, token)
+    assert time.perf_counter() - start < 0.4
+    assert response.status_code == 503
+
+    assert (
+        'authpaseto_denylist_lookup_failures_total{type="access",reason="timeout",'
+        'policy="closed"} 1.0'
+    ) in metrics.generate_latest()
+
+
+def test_breaker_stops_calling_the_backend(client):
+    load_settings(
+        denylist_failure_threshold=2,
+        denylist_reset_timeout=60,
+        denylist_failure_policy="open",
+    )
+    backend["mode"] = "fail"
+    token = AuthPASETO().create_access_token(subject="test")
+
+    for _ in range(4):
+        assert get(client, "/protected", token).status_code == 200
+    assert backend["calls"] == 2
+
+    latest = metrics.generate_latest()
+    assert "authpaseto_denylist_breaker_state 2.0" in latest
+    assert (
+        'authpaseto_denylist_lookup_failures_total{type="access",'
+        'reason="circuit_open",policy="open"} 2.0'
+    ) in latest
+
+
+def test_breaker_closes_when_the_backend_recovers(client):
+    load_settings(denylist_failure_threshold=1, denylist_reset_timeout=0.05)
+    backend["mode"] = "fail"
+    token = AuthPASETO().create_access_token(subject="test")
+
+    assert get(client, "/protected", token).status_code == 503
+    assert get(client, "/protected", token).status_code == 503
+    assert backend["calls"] == 1
+
+    time.sleep(0.06)
+    backend["mode"] = "ok"
+    assert get(client, "/protected", token).status_code == 200
+    assert AuthPASETO._denylist_breaker.state == "closed"
+    assert "authpaseto_denylist_breaker_state 0.0" in metrics.generate_latest()
+
+
+@pytest.mark.parametrize(
+    "name,value",
+    [
+        ("authpaseto_denylist_timeout", 0),
+        ("authpaseto_denylist_failure_threshold", 0),
+        ("authpaseto_denylist_reset_timeout", -1),
+        ("authpaseto_denylist_failure_policy", "ignore"),
+        ("authpaseto_denylist_failure_policy", {"access": "ignore"}),
+    ],
+)
+def test_invalid_failure_handling_config(name, value):
+    with pytest.raises(ValidationError, match=name):
+
+        @AuthPASETO.load_config
+        def invalid_settings():
+            return [(name, value)]
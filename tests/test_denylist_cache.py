@@ -0,0 +1,215 @@
+import queue
+import threading
+import time
+import pytest
+from fastapi_paseto_auth import AuthPASETO, metrics
+from fastapi_paseto_auth.denylist import (
+    CachedDenylist,
+    InMemoryDenylist,
+    InvalidationChannel,
+    LocalInvalidationChannel,
+    RedisInvalidationChannel,
+    RevocationQueue,
+)
+from fastapi_paseto_auth.metrics import MetricsStore
+
+
+class CountingDenylist(InMemoryDenylist):
+    def __init__(self):
+        super().__init__()
+        self.lookups = 0
+
+    def is_revoked(self, jti):
+        self.lookups += 1
+        return super().is_revoked(jti)
+
+
+class LossyChannel(LocalInvalidationChannel):
+    def publish(self, message):
+        pass
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.messages = queue.Queue()
+
+    def subscribe(self, channel):
+        self.redis.subscribers.append(self)
+
+    def listen(self):
+        while True:
+            message = self.messages.get()
+            if message is None:
+                return
+            if isinstance(message, Exception):
+                self.redis.subscribers.remove(self)
+                raise message
+            yield message
+
+    def close(self):
+        self.messages.put(None)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.subscribers = []
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+    def publish(self, channel, message):
+        for subscriber in list(self.subscribers):
+            subscriber.messages.put({"type": "message", "data": message.encode()})
+
+
+def wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+@pytest.fixture(scope="function")
+def workers():
+    # Two processes sharing a backend and an invalidation channel
+    backend = CountingDenylist()
+    channel = LocalInvalidationChannel()
+    return (
+        CachedDenylist(backend, channel, ttl=60),
+        CachedDenylist(backend, channel, ttl=60),
+    )
+
+
+def test_results_are_cached(workers):
+    worker, _ = workers
+    assert worker.is_revoked("jti") is False
+    assert worker.is_revoked("jti") is False
+    assert worker.backend.lookups == 1
+    assert len(worker) == 1
+
+
+def test_revocations_invalidate_every_worker(workers):
+    worker, other_worker = workers
+    assert other_worker.is_revoked("jti") is False
+
+    worker.add_many({"jti": 0})
+    assert worker.is_revoked("jti") is True
+    assert other_worker.is_revoked("jti") is True
+    # Both answered from their cache
+    assert worker.backend.lookups == 1
+
+
+def test_lost_invalidation_is_bounded_by_ttl():
+    backend = InMemoryDenylist()
+    worker = CachedDenylist(backend, LossyChannel(), ttl=0.05)
+    other_worker = CachedDenylist(backend, LossyChannel(), ttl=0.05)
+    assert other_worker.is_revoked("jti") is False
+
+    worker.add_many({"jti": 0})
+    assert other_worker.is_revoked("jti") is False
+    time.sleep(0.06)
+    assert other_worker.is_revoked("jti") is True
+
+
+def test_revocation_during_lookup():
+    channel = LocalInvalidationChannel()
+    worker = CachedDenylist(InMemoryDenylist(), channel, ttl=60)
+
+    class SlowDenylist(InMemoryDenylist):
+        def is_revoked(self, jti):
+            # Read before the revocation, which arrives during the lookup
+            revoked = super().is_revoked(jti)
+            worker.add_many({jti: 0})
+            return revoked
+
+    other_worker = CachedDenylist(SlowDenylist(), channel, ttl=60)
+    # The stale result isn't returned nor cached
+    assert other_worker.is_revoked("jti") is True
+    assert other_worker._entries["jti"][0] is True
+
+
+def test_with_revocation_queue(workers):
+    worker, other_worker = workers
+    revocation_queue = RevocationQueue(worker, flush_interval=60)
+    assert other_worker.is_revoked("jti") is False
+
+    revocation_queue.revoke("jti", 10)
+    assert revocation_queue.is_revoked("jti") is True
+    revocation_queue.flush()
+    assert other_worker.is_revoked("jti") is True
+    revocation_queue.close()
+
+
+def test_metrics(workers):
+    worker, other_worker = workers
+    AuthPASETO._metrics_enabled = True
+    metrics.REGISTRY.set_store(MetricsStore())
+    try:
+        other_worker.is_revoked("jti")
+        other_worker.is_revoked("jti")
+        worker.add_many({"jti": 0})
+        latest = metrics.generate_latest()
+    finally:
+        AuthPASETO._metrics_enabled = False
+        metrics.REGISTRY.set_store(MetricsStore())
+
+    assert 'authpaseto_denylist_cache_lookups_total{result="hit"} 1.0' in latest
+    assert 'authpaseto_denylist_cache_lookups_total{result="miss"} 1.0' in latest
+    # Only the other worker receives the revocation
+    assert "authpaseto_revocation_propagation_seconds_count 1.0" in latest
+
+
+def test_propagation_includes_queue_latency(workers):
+    worker, other_worker = workers
+    revocation_queue = RevocationQueue(worker, flush_interval=60)
+    AuthPASETO._metrics_enabled = True
+    metrics.REGISTRY.set_store(MetricsStore())
+    try:
+        revocation_queue.revoke("jti", 10)
+        time.sleep(0.2)
+        revocation_queue.flush()
+        samples = metrics.REGISTRY.store.collect()[0]
+    finally:
+        revocation_queue.close()
+        AuthPASETO._metrics_enabled = False
+        metrics.REGISTRY.set_store(MetricsStore())
+
+    assert other_worker.is_revoked("jti") is True
+    # From the revocation in the queue, not from its flush
+    key = ("authpaseto_revocation_propagation_seconds", (), "sum")
+    assert samples[key] >= 0.2
+
+
+def test_redis_channel():
+    redis = FakeRedis()
+    backend = InMemoryDenylist()
+    channels = [
+        RedisInvalidationChannel(redis, reconnect_interval=0.01) for _ in range(2)
+    ]
+    worker, other_worker = [CachedDenylist(backend, channel) for channel in channels]
+    wait_for(lambda: len(redis.subscribers) == 2)
+
+    assert other_worker.is_revoked("jti") is False
+    backend.add_many({"jti": 0})
+    assert other_worker.is_revoked("jti") is False
+
+    worker.add_many({"other-jti": 0})
+    wait_for(lambda: other_worker._entries.get("other-jti", (False,))[0])
+
+    # Messages may be missed while reconnecting, the cache is cleared
+    redis.subscribers[-1].messages.put(ConnectionError("Connection lost"))
+    wait_for(lambda: len(redis.subscribers) == 2 and len(other_worker) == 0)
+    assert other_worker.is_revoked("jti") is True
+
+    for channel in channels:
+        channel.close()
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError, match="ttl"):
+        CachedDenylist(InMemoryDenylist(), LocalInvalidationChannel(), ttl=0)
+    with pytest.raises(ValueError, match="maxsize"):
+        CachedDenylist(InMemoryDenylist(), LocalInvalidationChannel(), maxsize=0)
+    with pytest.raises(NotImplementedError):
+        InvalidationChannel().publish("message")
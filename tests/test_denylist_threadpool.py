@@ -0,0 +1,148 @@
+import threading
+import warnings
+import pytest
+from pydantic import ValidationError
+from fastapi_paseto_auth import AuthPASETO
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+# subjects of the revoked tokens
+denylist = set()
+lookup_threads = []
+
+
+@pytest.fixture(scope="function")
+def client():
+    previous_secret_key = AuthPASETO._secret_key
+
+    @AuthPASETO.load_config
+    def get_settings():
+        return [
+            ("authpaseto_secret_key", "secret-key"),
+            ("authpaseto_denylist_enabled", True),
+            ("authpaseto_denylist_threadpool_size", 2),
+        ]
+
+    @AuthPASETO.token_in_denylist_loader
+    def check_if_token_in_denylist(decrypted_token):
+        lookup_threads.append(threading.get_ident())
+        return decrypted_token["sub"] in denylist
+
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.get("/async-required")
+    async def async_required(Authorize: AuthPASETO = Depends()):
+        await Authorize.paseto_required_async()
+        await Authorize.paseto_required_async()
+        return {"thread": threading.get_ident()}
+
+    @app.get("/async-optional")
+    async def async_optional(Authorize: AuthPASETO = Depends()):
+        await Authorize.paseto_required_async(optional=True)
+        return {"subject": Authorize.get_subject()}
+
+    @app.get("/async-fresh")
+    async def async_fresh(Authorize: AuthPASETO = Depends()):
+        await Authorize.paseto_required_async(fresh=True)
+        return {"hello": "world"}
+
+    @app.get("/blocking-required")
+    async def blocking_required(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        return {"hello": "world"}
+
+    @app.get("/sync-required")
+    def sync_required(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        return {"hello": "world"}
+
+    yield TestClient(app)
+
+    denylist.clear()
+    lookup_threads.clear()
+    AuthPASETO._token_in_denylist_callback = None
+    AuthPASETO._blocking_callback_warned = False
+
+    # Turn the denylist and its threadpool off, the secret key of the
+    # previous tests is kept for the tests that run next
+    @AuthPASETO.load_config
+    def reset_settings():
+        return [("authpaseto_secret_key", previous_secret_key)]
+
+
+def auth_header(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_async_lookup_runs_in_threadpool(client):
+    token = AuthPASETO().create_access_token(subject="test")
+
+    response = client.get("/async-required", headers=auth_header(token))
+    assert response.status_code == 200
+    # The token is checked once per request, off the thread of the event loop
+    assert len(lookup_threads) == 1
+    assert lookup_threads[0] != response.json()["thread"]
+    assert AuthPASETO._denylist_executor._max_workers == 2
+
+
+def test_async_revoked_token(client):
+    token = AuthPASETO().create_access_token(subject="test")
+    denylist.add("test")
+
+    response = client.get("/async-required", headers=auth_header(token))
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Token has been revoked"}
+
+
+def test_async_optional_and_fresh(client):
+    response = client.get("/async-optional")
+    assert response.status_code == 200
+    assert response.json() == {"subject": None}
+
+    token = AuthPASETO().create_access_token(subject="test")
+    response = client.get("/async-optional", headers=auth_header(token))
+    assert response.json() == {"subject": "test"}
+
+    response = client.get("/async-fresh", headers=auth_header(token))
+    assert response.status_code == 401
+    assert response.json() == {"detail": "PASETO access token is not fresh"}
+
+
+def test_warns_when_blocking_the_event_loop(client):
+    token = AuthPASETO().create_access_token(subject="test")
+
+    with pytest.warns(RuntimeWarning, match="paseto_required_async"):
+        response = client.get("/blocking-required", headers=auth_header(token))
+    assert response.status_code == 200
+
+    # The warning is emitted once per process
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        response = client.get("/blocking-required", headers=auth_header(token))
+    assert response.status_code == 200
+
+
+def test_no_warning_in_sync_endpoints(client):
+    token = AuthPASETO().create_access_token(subject="test")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        response = client.get("/sync-required", headers=auth_header(token))
+    assert response.status_code == 200
+    assert AuthPASETO._blocking_callback_warned is False
+
+
+def test_threadpool_size_config(client):
+    with pytest.raises(ValidationError, match="authpaseto_denylist_threadpool_size"):
+
+        @AuthPASETO.load_config
+        def invalid_threadpool_size():
+            return [("authpaseto_denylist_threadpool_size", 0)]
@@ -1,6 +1,6 @@
 import pytest
 from fastapi_paseto_auth import AuthPASETO
-from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi_paseto_auth.exceptions import AuthPASETOException, InvalidHeaderError
 from fastapi import FastAPI, Depends, Request
 from fastapi.responses import JSONResponse
 from fastapi.testclient import TestClient
@@ -66,3 +66,30 @@ def test_valid_header(client, Authorize):
     response = client.get("/protected", headers={"Authorization": f"Bearer {token}"})
     assert response.status_code == 200
     assert response.json() == {"hello": "world"}
+
+
+def test_header_whitespace(client, Authorize):
+    token = Authorize.create_access_token(subject="test")
+    for header in (f"Bearer\t{token}", f"Bearer   {token}"):
+        response = client.get("/protected", headers={"Authorization": header})
+        assert response.status_code == 200
+
+    for header in (f"Bearer {token} extra", f"{token}"):
+        response = client.get("/protected", headers={"Authorization": header})
+        assert response.status_code == 422
+        assert response.json() == {
+            "detail": "Bad Authorization header. Expected value 'Bearer <PASETO>'"
+        }
+
+
+@pytest.mark.parametrize(
+    "auth_header",
+    [b"Bearer v4.local.abc", "Bearer v4.local.abc", b"  Bearer v4.local.abc "],
+)
+def test_get_paseto_from_header(auth_header):
+    token = AuthPASETO()._get_paseto_from_header(auth_header)
+    assert token == b"v4.local.abc"
+    assert isinstance(token, bytes)
+
+    with pytest.raises(InvalidHeaderError):
+        AuthPASETO()._get_paseto_from_header(b"  ")
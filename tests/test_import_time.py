@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+
+# Upper bound for the time spent importing fastapi_paseto_auth itself,
+# FastAPI and pydantic are imported beforehand since every app needs them anyway
+IMPORT_TIME_BUDGET_MS = float(os.environ.get("AUTHPASETO_IMPORT_TIME_BUDGET_MS", 50))
+
+
+def run_python(code: str, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def measure_import_time() -> float:
+    """
+    :return: cumulative import time of fastapi_paseto_auth in milliseconds
+    """
+    result = run_python(
+        "import fastapi, pydantic; import fastapi_paseto_auth", "-X", "importtime"
+    )
+    for line in result.stderr.splitlines():
+        _, cumulative, name = (part.strip() for part in line.split("|"))
+        if name == "fastapi_paseto_auth":
+            return int(cumulative) / 1000
+    raise AssertionError("fastapi_paseto_auth was not imported")
+
+
+def test_crypto_backends_are_not_imported():
+    result = run_python(
+        "import sys, fastapi_paseto_auth;"
+        "print(','.join(m for m in ('pyseto', 'cryptography', 'Cryptodome',"
+        " 'fastapi_paseto_auth.config') if m in sys.modules))"
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_local_tokens_do_not_import_cryptography():
+    result = run_python(
+        "import sys\n"
+        "from fastapi_paseto_auth import AuthPASETO\n"
+        "AuthPASETO.load_config(lambda: [('authpaseto_secret_key', 'secret-key')])\n"
+        "token = AuthPASETO().create_access_token(subject='test')\n"
+        "Authorize = AuthPASETO()\n"
+        "Authorize._set_token(token)\n"
+        "Authorize.paseto_required()\n"
+        "assert Authorize.get_subject() == 'test'\n"
+        "print('cryptography' in sys.modules)"
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_import_time_budget():
+    # The best of a few runs filters out noise from other processes
+    import_time = min(measure_import_time() for _ in range(3))
+    assert import_time < IMPORT_TIME_BUDGET_MS, (
+        f"Importing fastapi_paseto_auth took {import_time:.1f}ms, "
+        f"the budget is {IMPORT_TIME_BUDGET_MS}ms"
+    )
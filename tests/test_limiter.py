@@ -0,0 +1,218 @@
+import asyncio
+import threading
+import pytest
+from pydantic import ValidationError
+from fastapi_paseto_auth import AuthPASETO
+from fastapi_paseto_auth.limiter import VerificationLimiter
+from fastapi_paseto_auth.exceptions import (
+    AuthPASETOException,
+    VerificationOverloadedError,
+)
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+
+def load_settings(queue_size: int = 0, queue_timeout: float = 0):
+    @AuthPASETO.load_config
+    def get_settings():
+        return [
+            ("authpaseto_secret_key", "secret-key"),
+            ("authpaseto_max_concurrent_verifications", 1),
+            ("authpaseto_verification_queue_size", queue_size),
+            ("authpaseto_verification_queue_timeout", queue_timeout),
+        ]
+
+
+@pytest.fixture(scope="function")
+def client():
+    load_settings()
+
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.get("/protected")
+    def protected(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        return {"hello": "world"}
+
+    yield TestClient(app)
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+def get_protected(client: TestClient, token: str):
+    return client.get("/protected", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_verification_is_shed_when_queue_is_full(client):
+    token = AuthPASETO().create_access_token(subject="test")
+    assert get_protected(client, token).status_code == 200
+
+    AuthPASETO._verification_limiter.acquire()
+    try:
+        response = get_protected(client, token)
+        assert response.status_code == 503
+        assert response.json() == {"detail": "Too many token verifications in progress"}
+    finally:
+        AuthPASETO._verification_limiter.release()
+
+    assert get_protected(client, token).status_code == 200
+
+
+def test_verification_is_shed_after_queue_timeout(client):
+    load_settings(queue_size=1, queue_timeout=0.01)
+    token = AuthPASETO().create_access_token(subject="test")
+
+    AuthPASETO._verification_limiter.acquire()
+    try:
+        response = get_protected(client, token)
+        assert response.status_code == 503
+        assert response.json() == {"detail": "Timed out waiting to verify the token"}
+    finally:
+        AuthPASETO._verification_limiter.release()
+    assert AuthPASETO._verification_limiter.waiting == 0
+
+
+def test_rejected_token_releases_its_slot(client):
+    response = get_protected(client, "v4.local.invalid")
+    assert response.status_code == 422
+
+    token = AuthPASETO().create_access_token(subject="test")
+    assert get_protected(client, token).status_code == 200
+
+
+def test_queued_verification_gets_released_slot():
+    limiter = VerificationLimiter(1, queue_size=1, queue_timeout=5)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def wait_for_slot():
+        with limiter:
+            acquired.set()
+
+    thread = threading.Thread(target=wait_for_slot)
+    thread.start()
+    while limiter.waiting == 0:
+        pass
+    with pytest.raises(VerificationOverloadedError):
+        limiter.acquire()
+
+    limiter.release()
+    thread.join()
+    assert acquired.is_set()
+    assert limiter.waiting == 0
+
+
+def test_limiter_is_disabled_by_default():
+    @AuthPASETO.load_config
+    def get_settings():
+        return [("authpaseto_secret_key", "secret-key")]
+
+    assert AuthPASETO._verification_limiter is None
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+def test_invalid_limiter_settings():
+    with pytest.raises(ValueError):
+        VerificationLimiter(0)
+    with pytest.raises(ValueError):
+        VerificationLimiter(1, queue_size=-1)
+
+    with pytest.raises(
+        ValidationError, match=r"authpaseto_max_concurrent_verifications"
+    ):
+
+        @AuthPASETO.load_config
+        def get_max_concurrent():
+            return [("authpaseto_max_concurrent_verifications", 0)]
+
+    with pytest.raises(ValidationError, match=r"authpaseto_verification_queue_size"):
+
+        @AuthPASETO.load_config
+        def get_queue_size():
+            return [("authpaseto_verification_queue_size", -1)]
+
+
+def test_async_queued_verification_does_not_block_event_loop():
+    limiter = VerificationLimiter(1, queue_size=1, queue_timeout=5)
+    limiter.acquire()
+    ticks = []
+
+    async def tick():
+        while limiter.waiting == 0:
+            await asyncio.sleep(0)
+        for _ in range(5):
+            ticks.append(limiter.waiting)
+            await asyncio.sleep(0.01)
+        limiter.release()
+
+    async def main():
+        await asyncio.gather(limiter.acquire_async(), tick())
+
+    asyncio.run(main())
+    # The event loop kept running while the verification was queued
+    assert ticks == [1] * 5
+    assert limiter.waiting == 0
+    limiter.release()
+
+
+def test_async_verification_is_shed_after_queue_timeout():
+    limiter = VerificationLimiter(1, queue_size=1, queue_timeout=0.01)
+    limiter.acquire()
+
+    with pytest.raises(VerificationOverloadedError) as exc_info:
+        asyncio.run(limiter.acquire_async())
+    assert exc_info.value.message == "Timed out waiting to verify the token"
+    assert limiter.waiting == 0
+
+    limiter = VerificationLimiter(1, queue_size=0, queue_timeout=5)
+    limiter.acquire()
+    with pytest.raises(VerificationOverloadedError) as exc_info:
+        asyncio.run(limiter.acquire_async())
+    assert exc_info.value.message == "Too many token verifications in progress"
+
+
+def test_async_endpoint_verification_is_shed():
+    load_settings(queue_size=1, queue_timeout=0.01)
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.get("/protected")
+    async def protected(Authorize: AuthPASETO = Depends()):
+        await Authorize.paseto_required_async()
+        return {"hello": "world"}
+
+    client = TestClient(app)
+    token = AuthPASETO().create_access_token(subject="test")
+    try:
+        AuthPASETO._verification_limiter.acquire()
+        try:
+            response = get_protected(client, token)
+            assert response.status_code == 503
+            assert response.json() == {
+                "detail": "Timed out waiting to verify the token"
+            }
+        finally:
+            AuthPASETO._verification_limiter.release()
+        assert get_protected(client, token).status_code == 200
+    finally:
+
+        @AuthPASETO.load_config
+        def reset_settings():
+            return []
@@ -0,0 +1,232 @@
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import pytest
+from fastapi_paseto_auth import AuthPASETO, metrics
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi_paseto_auth.metrics import (
+    Counter,
+    FileMetricsStore,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    MetricsStore,
+    outcome_label,
+)
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseSettings
+
+
+@pytest.fixture(scope="function")
+def client():
+    class Settings(BaseSettings):
+        authpaseto_secret_key: str = "secret-key"
+        authpaseto_metrics_enabled: bool = True
+
+    @AuthPASETO.load_config
+    def get_settings():
+        return Settings()
+
+    metrics.REGISTRY.set_store(MetricsStore())
+
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.get("/protected")
+    def protected(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        return {"hello": "world"}
+
+    @app.get("/fresh")
+    def fresh(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required(fresh=True)
+        return {"hello": "world"}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def get_metrics():
+        return metrics.generate_latest()
+
+    yield TestClient(app)
+
+    AuthPASETO._metrics_enabled = False
+    metrics.REGISTRY.set_store(MetricsStore())
+
+
+def test_outcome_label():
+    from fastapi_paseto_auth.exceptions import (
+        MissingTokenError,
+        PASETODecodeError,
+        RevokedTokenError,
+        FreshTokenRequired,
+    )
+
+    assert outcome_label(MissingTokenError) == "missing_token"
+    assert outcome_label(PASETODecodeError) == "paseto_decode"
+    assert outcome_label(RevokedTokenError) == "revoked_token"
+    assert outcome_label(FreshTokenRequired) == "fresh_token_required"
+
+
+def test_verification_metrics(client: TestClient, Authorize: AuthPASETO):
+    token = Authorize.create_access_token(subject="test")
+
+    assert client.get("/protected").status_code == 401
+    assert client.get("/protected", headers={"Authorization": "Bad"}).status_code == 422
+    assert (
+        client.get("/protected", headers={"Authorization": "Bearer v4.local.abc"})
+    ).status_code == 422
+    for _ in range(2):
+        response = client.get(
+            "/protected", headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200
+    response = client.get("/fresh", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+    text = client.get("/metrics").text
+
+    assert (
+        'authpaseto_tokens_created_total{type="access",version="v4",purpose="local"} 1.0'
+        in text
+    )
+    assert (
+        "authpaseto_token_verifications_total"
+        '{type="access",version="v4",purpose="local",outcome="success"} 2.0' in text
+    )
+    assert (
+        "authpaseto_token_verifications_total"
+        '{type="access",version="v4",purpose="local",outcome="fresh_token_required"} 1.0'
+        in text
+    )
+    assert (
+        "authpaseto_token_verifications_total"
+        '{type="unknown",version="unknown",purpose="unknown",outcome="missing_token"} 1.0'
+        in text
+    )
+    assert (
+        "authpaseto_token_verifications_total"
+        '{type="unknown",version="unknown",purpose="unknown",outcome="invalid_header"} 1.0'
+        in text
+    )
+    assert (
+        "authpaseto_token_verifications_total"
+        '{type="unknown",version="v4",purpose="local",outcome="paseto_decode"} 1.0'
+        in text
+    )
+    assert (
+        "authpaseto_token_verification_seconds_count"
+        '{type="access",version="v4",purpose="local",outcome="success"} 2.0' in text
+    )
+    assert (
+        "authpaseto_token_verification_seconds_bucket"
+        '{type="access",version="v4",purpose="local",outcome="success",le="+Inf"} 2.0'
+        in text
+    )
+
+
+def test_metrics_disabled(Authorize: AuthPASETO):
+    metrics.REGISTRY.set_store(MetricsStore())
+    AuthPASETO._secret_key = "secret-key"
+    Authorize.create_access_token(subject="test")
+    assert "authpaseto_tokens_created_total{" not in metrics.generate_latest()
+
+
+def test_registry_rendering():
+    registry = MetricsRegistry()
+    counter = Counter(registry, "requests_total", "Requests", ("path",))
+    gauge = Gauge(registry, "depth", "Depth", multiprocess_mode="max")
+    histogram = Histogram(registry, "latency_seconds", "Latency", buckets=(0.1, 1))
+
+    counter.inc(path='a"b')
+    gauge.set(3)
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    assert registry.generate_latest().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{path="a\\"b"} 1.0',
+        "# HELP depth Depth",
+        "# TYPE depth gauge",
+        "depth 3.0",
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1.0',
+        'latency_seconds_bucket{le="1.0"} 2.0',
+        'latency_seconds_bucket{le="+Inf"} 3.0',
+        "latency_seconds_sum 5.55",
+        "latency_seconds_count 3.0",
+    ]
+
+    with pytest.raises(ValueError, match=r"requests_total"):
+        Counter(registry, "requests_total", "Requests")
+
+
+def test_file_store_aggregates_processes(tmp_path):
+    directory = str(tmp_path)
+    script = (
+        "from fastapi_paseto_auth import metrics;"
+        f"metrics.REGISTRY.set_store(metrics.FileMetricsStore({directory!r}));"
+        "metrics.TOKENS_CREATED.inc(type='access', version='v4', purpose='local');"
+        "metrics.REVOCATION_QUEUE_DEPTH.set(5);"
+        "metrics.DENYLIST_BREAKER_STATE.set(2);"
+        "metrics.REGISTRY.store.flush()"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", script], check=True)
+
+    metrics.REGISTRY.set_store(FileMetricsStore(directory))
+    metrics.TOKENS_CREATED.inc(type="access", version="v4", purpose="local")
+    metrics.REVOCATION_QUEUE_DEPTH.set(1)
+    metrics.DENYLIST_BREAKER_STATE.set(0)
+
+    output = metrics.generate_latest()
+    # The counters of the exited processes are kept, not their gauges
+    assert (
+        'authpaseto_tokens_created_total{type="access",version="v4",purpose="local"} 3.0'
+        in output
+    )
+    assert "authpaseto_revocation_queue_depth 1.0" in output
+    assert "authpaseto_denylist_breaker_state 0.0" in output
+    metrics.REGISTRY.set_store(MetricsStore())
+
+
+def test_file_store_concurrent_flushes(tmp_path):
+    store = FileMetricsStore(str(tmp_path), flush_interval=0)
+    key = ("authpaseto_requests_total", (), "")
+
+    def record():
+        for _ in range(200):
+            store.inc(key, 1)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    store.flush()
+    assert os.listdir(tmp_path) == [os.path.basename(store.path)]
+    assert store.collect()[0][key] == 1600
+
+
+def test_file_store_errors_do_not_escape(tmp_path):
+    directory = str(tmp_path / "metrics")
+    store = FileMetricsStore(directory, flush_interval=0)
+    shutil.rmtree(directory)
+
+    key = ("authpaseto_requests_total", (), "")
+    store.inc(key, 1)
+    store.set(key, 2)
+
+    os.makedirs(directory)
+    assert store.collect()[0][key] == 2
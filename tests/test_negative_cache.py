@@ -0,0 +1,155 @@
+import time
+import pytest
+from pydantic import ValidationError
+from fastapi_paseto_auth import AuthPASETO, paseto
+from fastapi_paseto_auth.negative_cache import RejectedTokenCache
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="function")
+def decodes(monkeypatch):
+    calls = []
+    decode = paseto.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args)
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(paseto, "decode", counting_decode)
+    return calls
+
+
+@pytest.fixture(scope="function")
+def client():
+    @AuthPASETO.load_config
+    def get_settings():
+        return [
+            ("authpaseto_secret_key", "secret-key"),
+            ("authpaseto_rejected_token_cache_size", 2),
+        ]
+
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.get("/protected")
+    def protected(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        return {"hello": "world"}
+
+    yield TestClient(app)
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+def get_protected(client: TestClient, token: str):
+    return client.get("/protected", headers={"Authorization": f"Bearer {token}"})
+
+
+def load_settings_with_leeway(leeway: int):
+    @AuthPASETO.load_config
+    def get_settings():
+        return [
+            ("authpaseto_secret_key", "secret-key"),
+            ("authpaseto_rejected_token_cache_size", 2),
+            ("authpaseto_decode_leeway", leeway),
+        ]
+
+
+def test_rejected_token_is_not_decoded_again(client, decodes):
+    token = AuthPASETO().create_access_token(subject="test", expires_time=60)
+    # Expired a minute ago
+    load_settings_with_leeway(-120)
+
+    response = get_protected(client, token)
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Token expired."}
+    assert len(decodes) == 1
+
+    response = get_protected(client, token)
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Token expired."}
+    assert len(decodes) == 1
+
+
+def test_tampered_token_is_cached(client, decodes):
+    token = AuthPASETO().create_access_token(subject="test")
+    tampered = token[:-4] + ("AAAA" if token[-4:] != "AAAA" else "BBBB")
+
+    for _ in range(3):
+        response = get_protected(client, tampered)
+        assert response.status_code == 422
+    assert len(decodes) == 1
+
+    response = get_protected(client, token)
+    assert response.status_code == 200
+    assert len(decodes) == 2
+
+
+def test_not_yet_active_token_is_not_cached(client, decodes):
+    token = AuthPASETO().create_access_token(subject="test", expires_time=False)
+    # Active in a minute
+    load_settings_with_leeway(-60)
+
+    for _ in range(2):
+        response = get_protected(client, token)
+        assert response.status_code == 422
+        assert response.json() == {"detail": "Token has not been activated yet."}
+    assert len(decodes) == 2
+
+
+def test_cache_is_disabled_by_default(decodes):
+    @AuthPASETO.load_config
+    def get_settings():
+        return [("authpaseto_secret_key", "secret-key")]
+
+    assert AuthPASETO._rejected_tokens is None
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+def test_cache_evicts_least_recently_used():
+    cache = RejectedTokenCache(maxsize=2, ttl=10)
+    cache.add(b"first", "key", 422, "Token expired.")
+    cache.add(b"second", "key", 422, "Token expired.")
+    assert cache.get(b"first", "key") == (422, "Token expired.")
+
+    cache.add(b"third", "key", 422, "Token expired.")
+    assert len(cache) == 2
+    assert cache.get(b"second", "key") is None
+    assert cache.get(b"first", "key") == (422, "Token expired.")
+    assert cache.get(b"first", "other-key") is None
+
+
+def test_cache_entries_expire(monkeypatch):
+    cache = RejectedTokenCache(maxsize=2, ttl=10)
+    cache.add(b"token", "key", 422, "Token expired.")
+
+    now = time.monotonic()
+    monkeypatch.setattr("time.monotonic", lambda: now + 11)
+    assert cache.get(b"token", "key") is None
+    assert len(cache) == 0
+
+
+def test_invalid_cache_settings():
+    with pytest.raises(ValueError):
+        RejectedTokenCache(maxsize=0)
+    with pytest.raises(ValueError):
+        RejectedTokenCache(ttl=0)
+
+    with pytest.raises(ValidationError, match=r"authpaseto_rejected_token_cache_size"):
+
+        @AuthPASETO.load_config
+        def get_settings():
+            return [("authpaseto_rejected_token_cache_size", -1)]
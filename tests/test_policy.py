@@ -0,0 +1,192 @@
+import pytest
+from fastapi_paseto_auth import AuthPASETO, AuthPolicy, paseto
+from fastapi_paseto_auth.exceptions import (
+    AuthPASETOException,
+    InvalidPASETOArgumentError,
+)
+from fastapi import APIRouter, FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="function")
+def client():
+    @AuthPASETO.load_config
+    def get_settings():
+        return [("authpaseto_secret_key", "secret-key")]
+
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    router = APIRouter(prefix="/items", dependencies=[Depends(AuthPolicy())])
+
+    @router.get("")
+    def list_items():
+        return {"items": ["foo"]}
+
+    @router.get("/read")
+    def read_items(claims: dict = Depends(AuthPolicy(scopes=["items:read"]))):
+        return {"user": claims["sub"]}
+
+    @router.get("/write")
+    def write_items(
+        claims: dict = Depends(AuthPolicy(fresh=True, scopes=["items:write"]))
+    ):
+        return {"user": claims["sub"]}
+
+    app.include_router(router)
+
+    @app.get("/optional")
+    def optional(claims: dict = Depends(AuthPolicy(optional=True))):
+        return {"user": claims["sub"] if claims else None}
+
+    @app.get("/refresh")
+    def refresh(claims: dict = Depends(AuthPolicy(refresh_token=True))):
+        return {"user": claims["sub"]}
+
+    @app.get("/custom")
+    def custom(claims: dict = Depends(AuthPolicy(type="api"))):
+        return {"user": claims["sub"]}
+
+    yield TestClient(app)
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+def get(client: TestClient, url: str, token: str = None):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    return client.get(url, headers=headers)
+
+
+def test_router_policy(client):
+    response = get(client, "/items")
+    assert response.status_code == 401
+    assert response.json() == {"detail": "PASETO Authorization Token required"}
+
+    token = AuthPASETO().create_access_token(subject="test")
+    response = get(client, "/items", token)
+    assert response.status_code == 200
+
+    refresh_token = AuthPASETO().create_refresh_token(subject="test")
+    response = get(client, "/items", refresh_token)
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Access token required but refresh provided"}
+
+
+def test_scopes(client):
+    token = AuthPASETO().create_access_token(
+        subject="test", user_claims={"scopes": ["items:read"]}
+    )
+    response = get(client, "/items/read", token)
+    assert response.status_code == 200
+    assert response.json() == {"user": "test"}
+
+    token = AuthPASETO().create_access_token(
+        subject="test", fresh=True, user_claims={"scopes": "items:read items:write"}
+    )
+    response = get(client, "/items/write", token)
+    assert response.status_code == 200
+
+    token = AuthPASETO().create_access_token(subject="test", fresh=True)
+    response = get(client, "/items/write", token)
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Token is missing required scopes"}
+
+
+def test_fresh(client):
+    token = AuthPASETO().create_access_token(
+        subject="test", user_claims={"scopes": ["items:write"]}
+    )
+    response = get(client, "/items/write", token)
+    assert response.status_code == 401
+    assert response.json() == {"detail": "PASETO access token is not fresh"}
+
+
+def test_optional(client):
+    response = get(client, "/optional")
+    assert response.status_code == 200
+    assert response.json() == {"user": None}
+
+    response = get(client, "/optional", "v4.local.invalid")
+    assert response.status_code == 200
+    assert response.json() == {"user": None}
+
+    token = AuthPASETO().create_access_token(subject="test")
+    response = get(client, "/optional", token)
+    assert response.json() == {"user": "test"}
+
+
+def test_refresh_and_custom_type(client):
+    refresh_token = AuthPASETO().create_refresh_token(subject="test")
+    assert get(client, "/refresh", refresh_token).json() == {"user": "test"}
+
+    access_token = AuthPASETO().create_access_token(subject="test")
+    response = get(client, "/refresh", access_token)
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Refresh token required but access provided"}
+
+    token = AuthPASETO().create_token(subject="test", type="api")
+    assert get(client, "/custom", token).json() == {"user": "test"}
+    response = get(client, "/custom", access_token)
+    assert response.status_code == 422
+    assert response.json() == {"detail": "api token required but access provided"}
+
+
+def test_token_is_decoded_once_per_request(client, monkeypatch):
+    calls = []
+    decode = paseto.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args)
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(paseto, "decode", counting_decode)
+
+    token = AuthPASETO().create_access_token(
+        subject="test", user_claims={"scopes": ["items:read"]}
+    )
+    # The router policy and the route policy both check the token
+    assert get(client, "/items/read", token).status_code == 200
+    assert len(calls) == 1
+
+
+def test_conflicting_options_fail_at_declaration():
+    with pytest.raises(InvalidPASETOArgumentError):
+        AuthPolicy(fresh=True, refresh_token=True)
+    with pytest.raises(InvalidPASETOArgumentError):
+        AuthPolicy(refresh_token=True, type="api")
+
+
+@pytest.mark.parametrize("revoked", [False, True])
+def test_async_denylist_callback(client, revoked):
+    checks = []
+
+    @AuthPASETO.token_in_denylist_loader
+    async def check_if_token_in_denylist(decrypted_token):
+        checks.append(decrypted_token["jti"])
+        return revoked
+
+    AuthPASETO._denylist_enabled = True
+    try:
+        token = AuthPASETO().create_access_token(
+            subject="test", user_claims={"scopes": ["items:read"]}
+        )
+        response = get(client, "/items/read", token)
+    finally:
+        AuthPASETO._denylist_enabled = False
+        AuthPASETO._token_in_denylist_callback = None
+
+    if revoked:
+        assert response.status_code == 401
+        assert response.json() == {"detail": "Token has been revoked"}
+    else:
+        assert response.status_code == 200
+        assert response.json() == {"user": "test"}
+    assert len(checks) == 1
@@ -0,0 +1,158 @@
+import pytest
+from fastapi_paseto_auth import AuthPASETO
+from fastapi_paseto_auth.claims_store import InMemoryClaimsStore, RedisClaimsStore
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseSettings
+
+USER_CLAIMS = {"permissions": [f"permission-{i}" for i in range(200)]}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.gets = 0
+
+    def get(self, name):
+        self.gets += 1
+        return self.data.get(name)
+
+    def set(self, name, value, ex=None):
+        self.data[name] = value
+
+
+@pytest.fixture(scope="function")
+def store():
+    store = InMemoryClaimsStore()
+
+    @AuthPASETO.claims_store_loader
+    def get_claims_store():
+        return store
+
+    yield store
+
+    @AuthPASETO.claims_store_loader
+    def reset_claims_store():
+        return None
+
+
+@pytest.fixture(scope="function")
+def client():
+    class Settings(BaseSettings):
+        authpaseto_secret_key: str = "secret-key"
+
+    @AuthPASETO.load_config
+    def get_settings():
+        return Settings()
+
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.get("/claims")
+    def claims(type: str = "access", Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required(type=type)
+        payload = Authorize.get_token_payload()
+        assert Authorize.get_token_payload() is payload
+        return {"payload": payload, "jti": Authorize.get_jti()}
+
+    return TestClient(app)
+
+
+def test_reference_token(client: TestClient, store, Authorize: AuthPASETO):
+    plain_token = Authorize.create_access_token(subject="test", user_claims=USER_CLAIMS)
+    token = Authorize.create_access_token(
+        subject="test", user_claims=USER_CLAIMS, reference_claims=True
+    )
+    assert len(token) < len(plain_token) / 4
+    assert len(store) == 1
+
+    response = client.get("/claims", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    payload = response.json()["payload"]
+    assert payload["permissions"] == USER_CLAIMS["permissions"]
+    assert payload["sub"] == "test"
+    assert payload["jti"] == response.json()["jti"]
+    assert "ref" not in payload
+
+    token = Authorize.create_token(
+        subject="test", type="api", user_claims=USER_CLAIMS, reference_claims=True
+    )
+    response = client.get(
+        "/claims?type=api", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.json()["payload"]["permissions"] == USER_CLAIMS["permissions"]
+
+
+def test_missing_reference_claims(client: TestClient, store, Authorize: AuthPASETO):
+    token = Authorize.create_access_token(
+        subject="test", user_claims=USER_CLAIMS, reference_claims=True
+    )
+    store._entries.clear()
+
+    response = client.get("/claims", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Token claims are no longer available"}
+
+
+def test_reference_claims_without_store(client: TestClient, Authorize: AuthPASETO):
+    # Without user claims there is nothing to store
+    Authorize.create_access_token(subject="test", reference_claims=True)
+
+    with pytest.raises(RuntimeError, match="claims_store_loader"):
+        Authorize.create_access_token(
+            subject="test", user_claims=USER_CLAIMS, reference_claims=True
+        )
+
+
+def test_ref_user_claim_is_reserved(store, Authorize: AuthPASETO):
+    with pytest.raises(ValueError, match="'ref' claim is reserved"):
+        Authorize.create_access_token(subject="test", user_claims={"ref": "1234"})
+    with pytest.raises(ValueError, match="'ref' claim is reserved"):
+        Authorize.create_access_token(
+            subject="test", user_claims={"ref": "1234"}, reference_claims=True
+        )
+
+
+def test_in_memory_store(monkeypatch):
+    store = InMemoryClaimsStore(maxsize=2)
+    store.set("a", {"a": 1})
+    store.set("b", {"b": 1})
+    assert store.get("a") == {"a": 1}
+    store.set("c", {"c": 1})
+    # b was the least recently used
+    assert store.get("b") is None
+    assert store.get("a") == {"a": 1}
+
+    store.set("d", {"d": 1}, ttl=10)
+    now = __import__("time").monotonic()
+    monkeypatch.setattr("time.monotonic", lambda: now + 11)
+    assert store.get("d") is None
+
+    with pytest.raises(ValueError):
+        InMemoryClaimsStore(maxsize=0)
+
+
+def test_redis_store():
+    client = FakeRedis()
+    store = RedisClaimsStore(client)
+    store.set("ref", USER_CLAIMS, ttl=60)
+    assert "authpaseto:claims:ref" in client.data
+
+    # Claims set by another process are fetched once and then cached
+    other_store = RedisClaimsStore(client)
+    assert other_store.get("ref") == USER_CLAIMS
+    assert other_store.get("ref") == USER_CLAIMS
+    assert client.gets == 1
+    assert other_store.get("unknown") is None
+
+    uncached_store = RedisClaimsStore(client, cache_ttl=0)
+    uncached_store.get("ref")
+    uncached_store.get("ref")
+    assert client.gets == 4
@@ -0,0 +1,151 @@
+import base64
+import pytest
+from fastapi_paseto_auth import AuthPASETO, paseto
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="function")
+def decodes(monkeypatch):
+    calls = []
+    decode = paseto.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args)
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(paseto, "decode", counting_decode)
+    return calls
+
+
+@pytest.fixture(scope="function")
+def denylist_checks():
+    checks = []
+
+    @AuthPASETO.load_config
+    def get_settings():
+        return [
+            ("authpaseto_secret_key", "secret-key"),
+            ("authpaseto_denylist_enabled", True),
+        ]
+
+    @AuthPASETO.token_in_denylist_loader
+    def check_if_token_in_denylist(decrypted_token):
+        checks.append(decrypted_token["jti"])
+        return False
+
+    yield checks
+
+    AuthPASETO._token_in_denylist_callback = None
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+@pytest.fixture(scope="function")
+def client(denylist_checks):
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    def current_user(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        return Authorize.get_subject()
+
+    def fresh_user(request: Request):
+        # A separate instance, e.g. built by a helper that isn't a dependency
+        Authorize = AuthPASETO(request)
+        Authorize.paseto_required(fresh=True)
+        return Authorize.get_subject()
+
+    @app.get("/protected")
+    def protected(user: str = Depends(current_user), fresh: str = Depends(fresh_user)):
+        return {"user": user, "fresh": fresh}
+
+    @app.get("/typed")
+    def typed(request: Request, user: str = Depends(current_user)):
+        AuthPASETO(request).paseto_required(type="refresh")
+        return {"user": user}
+
+    @app.get("/base64")
+    def base64_encoded(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required(base64_encoded=True)
+        Authorize.paseto_required(base64_encoded=True)
+        return {"user": Authorize.get_subject()}
+
+    return TestClient(app)
+
+
+def get(client: TestClient, url: str, token: str):
+    return client.get(url, headers={"Authorization": f"Bearer {token}"})
+
+
+def test_token_is_verified_once_per_request(client, decodes, denylist_checks):
+    token = AuthPASETO().create_access_token(subject="test", fresh=True)
+
+    response = get(client, "/protected", token)
+    assert response.status_code == 200
+    assert response.json() == {"user": "test", "fresh": "test"}
+    assert len(decodes) == 1
+    assert len(denylist_checks) == 1
+
+    # Every request verifies the token again
+    response = get(client, "/protected", token)
+    assert response.status_code == 200
+    assert len(decodes) == 2
+    assert len(denylist_checks) == 2
+
+
+def test_cheap_checks_still_run_on_memoized_token(client, decodes, denylist_checks):
+    token = AuthPASETO().create_access_token(subject="test", fresh=False)
+
+    response = get(client, "/protected", token)
+    assert response.status_code == 401
+    assert response.json() == {"detail": "PASETO access token is not fresh"}
+
+    response = get(client, "/typed", token)
+    assert response.status_code == 422
+    assert response.json() == {"detail": "refresh token required but access provided"}
+    assert len(decodes) == 2
+    assert len(denylist_checks) == 2
+
+
+def test_rejected_token_is_not_memoized(client, decodes):
+    response = get(client, "/protected", "v4.local.invalid")
+    assert response.status_code == 422
+    assert len(decodes) == 1
+
+
+def test_token_without_request_is_not_memoized(decodes, denylist_checks):
+    token = AuthPASETO().create_access_token(subject="test")
+
+    for _ in range(2):
+        Authorize = AuthPASETO()
+        Authorize._token = token
+        Authorize.paseto_required()
+    assert len(decodes) == 2
+
+
+def test_base64_token_checked_twice_on_one_instance(client, decodes, denylist_checks):
+    token = AuthPASETO().create_access_token(subject="test")
+    encoded = base64.b64encode(token.encode()).decode()
+
+    response = get(client, "/base64", encoded)
+    assert response.status_code == 200
+    assert response.json() == {"user": "test"}
+    assert len(decodes) == 1
+
+    # Without a request, the token as sent is decoded again
+    Authorize = AuthPASETO()
+    Authorize._token = encoded
+    Authorize.paseto_required(base64_encoded=True)
+    Authorize.paseto_required(base64_encoded=True)
+    assert Authorize.get_subject() == "test"
+    assert len(decodes) == 3
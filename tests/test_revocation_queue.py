@@ -0,0 +1,200 @@
+import threading
+import pytest
+from fastapi_paseto_auth import AuthPASETO, metrics
+from fastapi_paseto_auth.denylist import (
+    InMemoryDenylist,
+    RedisDenylist,
+    RevocationQueue,
+)
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def exists(self, name):
+        self.round_trips += 1
+        return int(name in self.data)
+
+    def set(self, name, value, ex=None):
+        self.round_trips += 1
+        self.data[name] = (value, ex)
+
+    def pipeline(self):
+        redis = self
+        commands = []
+
+        class Pipeline:
+            def set(self, name, value, ex=None):
+                commands.append((name, value, ex))
+
+            def execute(self):
+                redis.round_trips += 1
+                for name, value, ex in commands:
+                    redis.data[name] = (value, ex)
+
+        return Pipeline()
+
+
+class FailingDenylist(InMemoryDenylist):
+    fail = True
+
+    def add_many(self, revocations, revoked_at=None):
+        if self.fail:
+            raise ConnectionError("backend down")
+        super().add_many(revocations, revoked_at)
+
+
+@pytest.fixture(scope="function")
+def queue():
+    queue = RevocationQueue(InMemoryDenylist(), flush_interval=60)
+
+    @AuthPASETO.revocation_queue_loader
+    def get_revocation_queue():
+        return queue
+
+    yield queue
+
+    queue.close()
+    AuthPASETO._revocation_queue = None
+    AuthPASETO._denylist_enabled = False
+
+
+@pytest.fixture(scope="function")
+def client(queue):
+    @AuthPASETO.load_config
+    def get_settings():
+        return [("authpaseto_secret_key", "secret-key")]
+
+    AuthPASETO._denylist_enabled = True
+    callback = AuthPASETO._token_in_denylist_callback
+    AuthPASETO._token_in_denylist_callback = None
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.get("/protected")
+    def protected(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        return {"hello": "world"}
+
+    @app.delete("/access-revoke")
+    def access_revoke(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        Authorize.revoke_token()
+        return {"detail": "Access token has been revoke"}
+
+    yield TestClient(app)
+
+    AuthPASETO._token_in_denylist_callback = callback
+
+
+def test_revoke_token(client: TestClient, queue: RevocationQueue, Authorize):
+    token = Authorize.create_access_token(subject="test")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/protected", headers=headers).status_code == 200
+
+    assert client.delete("/access-revoke", headers=headers).status_code == 200
+    # Rejected right away, before the revocation reaches the backend
+    assert len(queue) == 1
+    assert len(queue.backend) == 0
+    response = client.get("/protected", headers=headers)
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Token has been revoked"}
+
+    queue.flush()
+    assert len(queue) == 0
+    assert len(queue.backend) == 1
+    assert client.get("/protected", headers=headers).status_code == 401
+
+    # The revocation is kept for the remaining lifetime of the token
+    ttl = next(iter(queue.backend._deadlines.values())) - __import__("time").monotonic()
+    assert 14 * 60 < ttl <= 15 * 60 + 1
+
+
+def test_revoke_token_without_queue(Authorize):
+    with pytest.raises(RuntimeError, match="revocation_queue_loader"):
+        Authorize.revoke_token("jti")
+
+
+def test_flush_on_size():
+    flushed = threading.Event()
+
+    class Backend(InMemoryDenylist):
+        def add_many(self, revocations, revoked_at=None):
+            super().add_many(revocations, revoked_at)
+            flushed.set()
+
+    queue = RevocationQueue(Backend(), flush_interval=60, max_batch=3)
+    queue.revoke_many([("a", 10), ("b", 10)])
+    assert not flushed.wait(0.1)
+    queue.revoke("c", 10)
+    assert flushed.wait(5)
+    assert queue.backend.is_revoked("c")
+    queue.close()
+
+
+def test_flush_on_timer():
+    queue = RevocationQueue(InMemoryDenylist(), flush_interval=0.05)
+    queue.revoke("a", 0)
+    for _ in range(100):
+        if len(queue.backend):
+            break
+        threading.Event().wait(0.05)
+    assert queue.backend.is_revoked("a")
+    queue.close()
+
+
+def test_failed_flush():
+    queue = RevocationQueue(FailingDenylist(), flush_interval=60)
+    queue.revoke("a", 10)
+    with pytest.raises(ConnectionError):
+        queue.flush()
+    assert len(queue) == 1
+    assert queue.is_revoked("a")
+
+    queue.backend.fail = False
+    queue.close()
+    assert len(queue) == 0
+    assert queue.backend.is_revoked("a")
+
+
+def test_redis_denylist():
+    redis = FakeRedis()
+    queue = RevocationQueue(RedisDenylist(redis), flush_interval=60)
+    queue.revoke_many((f"jti-{i}", 60) for i in range(100))
+    queue.flush()
+    # The whole batch is written in a single round trip
+    assert redis.round_trips == 1
+    assert redis.data["authpaseto:denylist:jti-0"] == ("true", 60)
+    assert queue.is_revoked("jti-99")
+    assert not queue.is_revoked("jti-100")
+    queue.close()
+
+
+def test_metrics():
+    metrics.REGISTRY.set_store(metrics.MetricsStore())
+    AuthPASETO._metrics_enabled = True
+    try:
+        queue = RevocationQueue(InMemoryDenylist(), flush_interval=60)
+        queue.revoke_many([("a", 10), ("b", 10)])
+        assert "authpaseto_revocation_queue_depth 2.0" in metrics.generate_latest()
+        queue.flush()
+        exposition = metrics.generate_latest()
+        assert "authpaseto_revocation_queue_depth 0.0" in exposition
+        assert (
+            'authpaseto_revocation_flush_seconds_count{outcome="success"} 1.0'
+            in exposition
+        )
+        queue.close()
+    finally:
+        AuthPASETO._metrics_enabled = False
@@ -0,0 +1,146 @@
+import time
+import pytest
+from fastapi_paseto_auth.denylist import (
+    HashRing,
+    InMemoryDenylist,
+    RevocationQueue,
+    ShardedDenylist,
+)
+
+JTIS = [f"jti-{i}" for i in range(10000)]
+
+
+class CountingDenylist(InMemoryDenylist):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def add_many(self, revocations, revoked_at=None):
+        self.batches.append(dict(revocations))
+        super().add_many(revocations, revoked_at)
+
+
+class FailingDenylist(InMemoryDenylist):
+    def add_many(self, revocations, revoked_at=None):
+        raise ConnectionError("Connection refused")
+
+
+def nodes(count: int, backend=CountingDenylist):
+    return {f"redis-{i}": backend() for i in range(count)}
+
+
+def test_keys_are_spread_evenly():
+    ring = HashRing([f"redis-{i}" for i in range(4)])
+    counts = {}
+    for jti in JTIS:
+        node = ring.get(jti)
+        counts[node] = counts.get(node, 0) + 1
+    assert len(counts) == 4
+    assert all(0.15 < count / len(JTIS) < 0.35 for count in counts.values())
+
+
+def test_adding_a_node_moves_few_keys():
+    ring = HashRing([f"redis-{i}" for i in range(4)])
+    before = {jti: ring.get(jti) for jti in JTIS}
+    ring.add("redis-4")
+    moved = [jti for jti in JTIS if ring.get(jti) != before[jti]]
+
+    # About a fifth of the keys, all of them to the new node
+    assert 0.1 < len(moved) / len(JTIS) < 0.3
+    assert {ring.get(jti) for jti in moved} == {"redis-4"}
+
+    ring.remove("redis-4")
+    assert {jti: ring.get(jti) for jti in JTIS} == before
+
+
+def test_ring_is_stable_across_processes():
+    nodes = ["redis-0", "redis-1", "redis-2"]
+    ring, other_ring = HashRing(nodes), HashRing(reversed(nodes))
+    assert all(ring.get(jti) == other_ring.get(jti) for jti in JTIS[:1000])
+
+
+def test_ring_errors():
+    with pytest.raises(ValueError, match="virtual_nodes"):
+        HashRing(["redis-0"], virtual_nodes=0)
+    with pytest.raises(LookupError):
+        HashRing().get("jti")
+
+    ring = HashRing(["redis-0"])
+    with pytest.raises(ValueError, match="already"):
+        ring.add("redis-0")
+    with pytest.raises(ValueError, match="isn't"):
+        ring.remove("redis-1")
+    assert "redis-0" in ring and len(ring) == 1
+
+
+def test_revocations_are_routed_and_grouped_per_node():
+    backends = nodes(3)
+    denylist = ShardedDenylist(backends)
+    denylist.add_many({jti: 60 for jti in JTIS[:300]})
+
+    for name, backend in backends.items():
+        # A single batch per node, with only the tokens of the node
+        assert len(backend.batches) == 1
+        assert all(denylist.ring.get(jti) == name for jti in backend.batches[0])
+    assert sum(len(backend) for backend in backends.values()) == 300
+
+    assert all(denylist.is_revoked(jti) for jti in JTIS[:300])
+    assert not any(denylist.is_revoked(jti) for jti in JTIS[300:600])
+    assert denylist.node_for(JTIS[0]) is backends[denylist.ring.get(JTIS[0])]
+
+
+def test_failing_node():
+    backends = {"redis-0": CountingDenylist(), "redis-1": FailingDenylist()}
+    denylist = ShardedDenylist(backends)
+
+    with pytest.raises(ConnectionError):
+        denylist.add_many({jti: 60 for jti in JTIS[:100]})
+    # The other node was still written
+    assert 0 < len(backends["redis-0"]) < 100
+
+
+def test_handover_after_adding_a_node():
+    denylist = ShardedDenylist(nodes(3))
+    denylist.add_many({jti: 0 for jti in JTIS[:1000]})
+
+    denylist.add_node("redis-3", CountingDenylist())
+    moved = [jti for jti in JTIS[:1000] if denylist.ring.get(jti) == "redis-3"]
+    assert moved
+    # The tokens that moved are still found on their previous node
+    assert all(denylist.is_revoked(jti) for jti in JTIS[:1000])
+
+    denylist.end_handover()
+    assert not any(denylist.is_revoked(jti) for jti in moved)
+
+
+def test_handover_after_removing_a_node():
+    denylist = ShardedDenylist(nodes(3), handover_period=0.05)
+    denylist.add_many({jti: 0 for jti in JTIS[:1000]})
+
+    denylist.remove_node("redis-0")
+    assert "redis-0" not in denylist.ring
+    assert all(denylist.is_revoked(jti) for jti in JTIS[:1000])
+
+    time.sleep(0.06)
+    assert not all(denylist.is_revoked(jti) for jti in JTIS[:1000])
+
+
+def test_node_errors():
+    with pytest.raises(ValueError, match="At least one node"):
+        ShardedDenylist({})
+
+    denylist = ShardedDenylist(nodes(1))
+    with pytest.raises(ValueError, match="last node"):
+        denylist.remove_node("redis-0")
+    with pytest.raises(ValueError, match="already"):
+        denylist.add_node("redis-0", InMemoryDenylist())
+
+
+def test_with_revocation_queue():
+    backends = nodes(2)
+    revocation_queue = RevocationQueue(ShardedDenylist(backends), flush_interval=60)
+    revocation_queue.revoke_many([(jti, 60) for jti in JTIS[:100]])
+    revocation_queue.close()
+
+    assert all(len(backend.batches) == 1 for backend in backends.values())
+    assert all(revocation_queue.is_revoked(jti) for jti in JTIS[:100])
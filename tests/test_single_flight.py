@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from fastapi_paseto_auth import AuthPASETO
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi_paseto_auth.singleflight import SingleFlight
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+lookups = []
+
+
+def load_settings():
+    @AuthPASETO.load_config
+    def get_settings():
+        return [
+            ("authpaseto_secret_key", "secret-key"),
+            ("authpaseto_denylist_enabled", True),
+            ("authpaseto_denylist_single_flight", True),
+        ]
+
+
+@pytest.fixture(scope="function")
+def client():
+    load_settings()
+
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.get("/async-protected")
+    async def async_protected(Authorize: AuthPASETO = Depends()):
+        await Authorize.paseto_required_async()
+        return {"hello": "world"}
+
+    @app.get("/protected")
+    def protected(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        return {"hello": "world"}
+
+    # A single event loop serves the requests of every thread
+    with TestClient(app) as client:
+        yield client
+
+    lookups.clear()
+    AuthPASETO._token_in_denylist_callback = None
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+def fan_out(client: TestClient, url: str, token: str, requests: int = 10):
+    headers = {"Authorization": f"Bearer {token}"}
+    with ThreadPoolExecutor(requests) as executor:
+        responses = list(
+            executor.map(lambda _: client.get(url, headers=headers), range(requests))
+        )
+    return [response.status_code for response in responses]
+
+
+def test_single_flight_threads():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def lookup(jti):
+        calls.append(jti)
+        started.set()
+        release.wait(1)
+        return len(calls)
+
+    with ThreadPoolExecutor(5) as executor:
+        leader = executor.submit(flight.do, "jti", lookup, "jti")
+        started.wait(1)
+        followers = [executor.submit(flight.do, "jti", lookup, "jti") for _ in range(4)]
+        time.sleep(0.05)
+        release.set()
+        results = [leader.result()] + [follower.result() for follower in followers]
+
+    assert calls == ["jti"]
+    assert results == [1] * 5
+    assert len(flight) == 0
+    # The next call isn't in flight with the first one
+    assert flight.do("jti", lookup, "jti") == 2
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def lookup():
+        started.set()
+        time.sleep(0.05)
+        raise ConnectionError("Connection refused")
+
+    with ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(flight.do, "jti", lookup)
+        started.wait(1)
+        follower = executor.submit(flight.do, "jti", lookup)
+        for future in (leader, follower):
+            with pytest.raises(ConnectionError):
+                future.result()
+    assert len(flight) == 0
+
+
+def test_single_flight_coroutines():
+    flight = SingleFlight()
+    calls = []
+
+    async def lookup(jti):
+        calls.append(jti)
+        await asyncio.sleep(0.05)
+        return True
+
+    async def main():
+        callers = [
+            asyncio.ensure_future(flight.do_async("jti", lookup, "jti"))
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+        # Cancelling a caller doesn't cancel the lookup of the others
+        callers[0].cancel()
+        return await asyncio.gather(*callers[1:])
+
+    assert asyncio.run(main()) == [True] * 4
+    assert calls == ["jti"]
+    assert len(flight) == 0
+
+
+def test_async_callback(client):
+    @AuthPASETO.token_in_denylist_loader
+    async def check_if_token_in_denylist(decrypted_token):
+        lookups.append(decrypted_token["jti"])
+        await asyncio.sleep(0.2)
+        return False
+
+    token = AuthPASETO().create_access_token(subject="test")
+    assert fan_out(client, "/async-protected", token) == [200] * 10
+    assert len(lookups) == 1
+
+
+def test_sync_callback_in_threadpool(client):
+    @AuthPASETO.token_in_denylist_loader
+    def check_if_token_in_denylist(decrypted_token):
+        lookups.append(decrypted_token["jti"])
+        time.sleep(0.2)
+        return True
+
+    token = AuthPASETO().create_access_token(subject="test")
+    assert fan_out(client, "/async-protected", token) == [401] * 10
+    assert len(lookups) == 1
+
+
+def test_sync_callback_in_sync_endpoints(client):
+    @AuthPASETO.token_in_denylist_loader
+    def check_if_token_in_denylist(decrypted_token):
+        lookups.append(decrypted_token["jti"])
+        time.sleep(0.2)
+        return False
+
+    Authorize = AuthPASETO()
+    assert (
+        fan_out(client, "/protected", Authorize.create_access_token("test"))
+        == [200] * 10
+    )
+    assert len(lookups) == 1
+
+    # Lookups of other tokens aren't shared
+    assert fan_out(client, "/protected", Authorize.create_access_token("test"), 1)
+    assert len(lookups) == 2
+
+
+def test_async_callback_requires_async_path(client):
+    @AuthPASETO.token_in_denylist_loader
+    async def check_if_token_in_denylist(decrypted_token):
+        return False
+
+    token = AuthPASETO().create_access_token(subject="test")
+    with pytest.raises(RuntimeError, match="paseto_required_async"):
+        client.get("/protected", headers={"Authorization": f"Bearer {token}"})
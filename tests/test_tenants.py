@@ -0,0 +1,165 @@
+import pytest
+from fastapi_paseto_auth import AuthPASETO
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi_paseto_auth.config import LoadConfig
+from fastapi_paseto_auth.tenants import TenantConfig, normalize_host
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseSettings
+from typing import Sequence
+
+
+class AcmeSettings(BaseSettings):
+    authpaseto_secret_key: str = "acme-secret-key"
+    authpaseto_encode_issuer: str = "acme"
+    authpaseto_decode_issuer: str = "acme"
+    authpaseto_tenant_hosts: Sequence[str] = ["acme.example.com", "ACME.example.org"]
+
+
+@pytest.fixture(scope="function")
+def client():
+    @AuthPASETO.load_config
+    def get_settings():
+        return [("authpaseto_secret_key", "secret-key")]
+
+    @AuthPASETO.tenant_loader
+    def get_tenants():
+        return {
+            "acme": AcmeSettings(),
+            "globex": {
+                "authpaseto_purpose": "public",
+                "authpaseto_private_key": open("tests/private_key.pem").read(),
+                "authpaseto_public_key": open("tests/public_key.pem").read(),
+                "authpaseto_access_token_expires": 60,
+                "authpaseto_tenant_hosts": ["globex.example.com"],
+            },
+        }
+
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.post("/login")
+    def login(tenant: str = None, Authorize: AuthPASETO = Depends()):
+        if tenant:
+            Authorize.use_tenant(tenant)
+        return {"access_token": Authorize.create_access_token(subject="test")}
+
+    @app.get("/protected")
+    def protected(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        return {
+            "tenant": Authorize.get_tenant(),
+            "iss": Authorize.get_token_payload().get("iss"),
+        }
+
+    yield TestClient(app)
+
+    @AuthPASETO.tenant_loader
+    def reset_tenants():
+        return {}
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+def login(client: TestClient, host: str = "testserver", tenant: str = None) -> str:
+    response = client.post(
+        "/login", params={"tenant": tenant} if tenant else {}, headers={"host": host}
+    )
+    return response.json()["access_token"]
+
+
+def get_protected(client: TestClient, token: str, host: str = "testserver"):
+    return client.get(
+        "/protected", headers={"Authorization": f"Bearer {token}", "host": host}
+    )
+
+
+def test_tenant_from_host(client: TestClient):
+    token = login(client, "acme.example.com:8000")
+    assert token.startswith("v4.local.") and token.count(".") == 3
+
+    response = get_protected(client, token, "acme.example.com")
+    assert response.status_code == 200
+    assert response.json() == {"tenant": "acme", "iss": "acme"}
+
+    # The token names its tenant, so any host without a tenant accepts it
+    response = get_protected(client, token)
+    assert response.json() == {"tenant": "acme", "iss": "acme"}
+
+    response = get_protected(client, login(client, "globex.example.com"))
+    assert response.status_code == 200
+    assert response.json() == {"tenant": "globex", "iss": None}
+
+
+def test_tenant_isolation(client: TestClient):
+    acme_token = login(client, "acme.example.org")
+    response = get_protected(client, acme_token, "globex.example.com")
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Invalid PASETO tenant"}
+
+    # Tokens without a tenant are checked with the keys of the host's tenant
+    default_token = login(client)
+    assert default_token.count(".") == 2
+    response = get_protected(client, default_token)
+    assert response.json() == {"tenant": None, "iss": None}
+    response = get_protected(client, default_token, "acme.example.com")
+    assert response.status_code == 422
+
+
+def test_use_tenant(client: TestClient, Authorize: AuthPASETO):
+    token = login(client, tenant="globex")
+    assert token.startswith("v4.public.")
+    response = get_protected(client, token, "globex.example.com")
+    assert response.json()["tenant"] == "globex"
+
+    with pytest.raises(ValueError, match="Unknown tenant initech"):
+        Authorize.use_tenant("initech")
+
+
+def test_unknown_tenant(client: TestClient):
+    token = login(client, tenant="acme")
+
+    @AuthPASETO.tenant_loader
+    def get_tenants():
+        return {"globex": {"authpaseto_secret_key": "globex-secret-key"}}
+
+    response = get_protected(client, token)
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Invalid PASETO tenant"}
+
+
+def test_invalid_tenants():
+    with pytest.raises(ValueError, match="used by the tenants acme and globex"):
+
+        @AuthPASETO.tenant_loader
+        def get_duplicate_hosts():
+            return {
+                "acme": {"authpaseto_tenant_hosts": ["example.com"]},
+                "globex": {"authpaseto_tenant_hosts": ["EXAMPLE.com"]},
+            }
+
+    with pytest.raises(ValueError, match="authpaseto_secret_key is not a valid"):
+
+        @AuthPASETO.tenant_loader
+        def get_invalid_key():
+            return {"acme": {"authpaseto_secret_key": "a" * 65}}
+
+    AuthPASETO._tenants = {}
+    AuthPASETO._tenant_hosts = {}
+
+
+def test_tenant_config_is_compact():
+    tenant = TenantConfig("acme", LoadConfig())
+    assert not hasattr(tenant, "__dict__")
+    assert tenant.footer == b'{"tid":"acme"}'
+    assert normalize_host(b"Example.COM:443") == b"example.com"
+    assert normalize_host(b"[::1]:8000") == b"[::1]"
+    assert normalize_host(b"[::1]") == b"[::1]"
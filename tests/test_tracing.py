@@ -0,0 +1,122 @@
+import pytest
+from fastapi_paseto_auth import AuthPASETO
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from pydantic import BaseSettings
+
+
+@pytest.fixture(scope="function")
+def exporter():
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+    @AuthPASETO.tracer_loader
+    def get_tracer():
+        return provider.get_tracer("tests")
+
+    yield exporter
+
+    @AuthPASETO.tracer_loader
+    def disable_tracer():
+        return None
+
+
+@pytest.fixture(scope="function")
+def client():
+    class Settings(BaseSettings):
+        authpaseto_secret_key: str = "secret-key"
+        authpaseto_denylist_enabled: bool = True
+
+    @AuthPASETO.load_config
+    def get_settings():
+        return Settings()
+
+    @AuthPASETO.token_in_denylist_loader
+    def check_if_token_in_denylist(decrypted_token):
+        return decrypted_token["type"] == "refresh"
+
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.get("/protected")
+    def protected(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        return {"hello": "world"}
+
+    @app.get("/refresh")
+    def refresh(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required(refresh_token=True)
+        return {"hello": "world"}
+
+    yield TestClient(app)
+
+    AuthPASETO._denylist_enabled = False
+
+
+def test_spans(client: TestClient, exporter, Authorize: AuthPASETO):
+    token = Authorize.create_access_token(subject="test")
+    response = client.get("/protected", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+    create, lookup, decode = exporter.get_finished_spans()
+
+    assert create.name == "fastapi_paseto_auth.create_token"
+    assert dict(create.attributes) == {
+        "paseto.type": "access",
+        "paseto.version": "v4",
+        "paseto.purpose": "local",
+    }
+    assert decode.name == "fastapi_paseto_auth.decode_token"
+    assert dict(decode.attributes) == {
+        "paseto.type": "access",
+        "paseto.version": "v4",
+        "paseto.purpose": "local",
+    }
+    assert lookup.name == "fastapi_paseto_auth.denylist_lookup"
+    assert lookup.parent.span_id == decode.context.span_id
+    assert dict(lookup.attributes) == {"paseto.type": "access", "paseto.revoked": False}
+
+    for span in (create, lookup, decode):
+        assert token not in span.attributes.values()
+        assert "secret-key" not in span.attributes.values()
+
+
+def test_failed_spans(client: TestClient, exporter, Authorize: AuthPASETO):
+    token = Authorize.create_refresh_token(subject="test")
+    exporter.clear()
+
+    response = client.get("/refresh", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+    lookup, decode = exporter.get_finished_spans()
+    assert lookup.attributes["paseto.revoked"] is True
+    assert not decode.status.is_ok
+    assert decode.events[0].attributes["exception.type"].endswith("RevokedTokenError")
+
+    exporter.clear()
+    response = client.get(
+        "/protected", headers={"Authorization": "Bearer v4.local.abc"}
+    )
+    assert response.status_code == 422
+    (decode,) = exporter.get_finished_spans()
+    assert decode.attributes["paseto.version"] == "v4"
+    assert "paseto.type" not in decode.attributes
+
+
+def test_no_tracer(client: TestClient, Authorize: AuthPASETO):
+    assert AuthPASETO._tracer is None
+    token = Authorize.create_access_token(subject="test")
+    response = client.get("/protected", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
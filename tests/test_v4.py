@@ -0,0 +1,148 @@
+import json
+import os
+import pytest, pyseto
+from pyseto import Key
+from fastapi_paseto_auth import v4, paseto
+from fastapi_paseto_auth.exceptions import PASETODecodeError
+
+with open(os.path.join(os.path.dirname(__file__), "vectors", "v4.json")) as f:
+    VECTORS = json.load(f)["tests"]
+
+
+def vectors(prefix: str):
+    return [
+        pytest.param(vector, id=vector["name"])
+        for vector in VECTORS
+        if vector["name"].startswith(prefix)
+    ]
+
+
+@pytest.mark.parametrize("vector", vectors("4-E"))
+def test_local_vectors(vector):
+    key = v4.V4Local(bytes.fromhex(vector["key"]))
+    payload = vector["payload"].encode("utf-8")
+    footer = vector["footer"].encode("utf-8")
+    implicit = vector["implicit-assertion"].encode("utf-8")
+
+    token = key.encode(payload, footer, implicit, nonce=bytes.fromhex(vector["nonce"]))
+    assert token.decode("utf-8") == vector["token"]
+    assert key.decode(token, implicit) == (payload, footer)
+
+
+@pytest.mark.parametrize("vector", vectors("4-S"))
+def test_public_vectors(vector):
+    private_key = v4.V4Public(vector["secret-key-pem"])
+    public_key = v4.V4Public(vector["public-key-pem"])
+    payload = vector["payload"].encode("utf-8")
+    footer = vector["footer"].encode("utf-8")
+    implicit = vector["implicit-assertion"].encode("utf-8")
+
+    token = private_key.encode(payload, footer, implicit)
+    assert token.decode("utf-8") == vector["token"]
+    assert public_key.decode(token, implicit) == (payload, footer)
+    assert private_key.is_secret is True
+    assert public_key.is_secret is False
+
+
+@pytest.mark.parametrize("vector", vectors("4-F"))
+def test_failure_vectors(vector):
+    if "key" in vector:
+        key = v4.V4Local(bytes.fromhex(vector["key"]))
+    else:
+        key = v4.V4Public(vector["public-key-pem"])
+
+    with pytest.raises(v4.TokenError):
+        key.decode(
+            vector["token"].encode("utf-8"),
+            vector["implicit-assertion"].encode("utf-8"),
+        )
+
+
+def test_tampered_tokens():
+    key = v4.V4Local(b"secret-key")
+    token = key.encode(b'{"sub":"test"}')
+
+    with pytest.raises(v4.TokenError, match="Failed to decrypt."):
+        v4.V4Local(b"another-key").decode(token)
+    with pytest.raises(v4.TokenError, match="Failed to decrypt."):
+        key.decode(token[:-2] + (b"AA" if token[-2:] != b"AA" else b"BB"))
+    with pytest.raises(v4.TokenError, match="Failed to decrypt."):
+        key.decode(b"v4.local.abc")
+    with pytest.raises(v4.TokenError, match="Invalid PASETO format"):
+        key.decode(token + b".footer.extra")
+    with pytest.raises(v4.TokenError, match="Token is not a v4.local token"):
+        key.decode(token.replace(b"v4.local.", b"v4.public."))
+
+
+def test_invalid_keys():
+    with pytest.raises(ValueError):
+        v4.V4Local(b"")
+    with pytest.raises(ValueError):
+        v4.V4Local(b"a" * 65)
+    with pytest.raises(ValueError):
+        v4.V4Public("secret-key")
+    with pytest.raises(ValueError):
+        v4.new_key("unknown", "secret-key")
+
+    with pytest.raises(ValueError, match="A public key cannot be used for signing."):
+        v4.V4Public(open("tests/public_key.pem").read()).encode(b"{}")
+
+
+@pytest.mark.parametrize(
+    "purpose,encoding_key,decoding_key",
+    [
+        ("local", "secret-key", "secret-key"),
+        (
+            "public",
+            open("tests/private_key.pem").read(),
+            open("tests/public_key.pem").read(),
+        ),
+    ],
+)
+def test_pyseto_interoperability(purpose, encoding_key, decoding_key):
+    payload = b'{"sub":"test"}'
+
+    token = v4.new_key(purpose, encoding_key).encode(payload, b"footer")
+    decoded = pyseto.decode(Key.new(4, purpose, decoding_key), token)
+    assert (decoded.payload, decoded.footer) == (payload, b"footer")
+
+    token = pyseto.encode(Key.new(4, purpose, encoding_key), payload, b"footer")
+    assert v4.new_key(purpose, decoding_key).decode(token) == (payload, b"footer")
+
+
+@pytest.mark.parametrize("version", [2, 3, 4])
+def test_encode_decode_claims(version):
+    key = paseto.new_key(version, "local", "a" * 32)
+    token = paseto.encode(key, {"sub": "test"}, exp_seconds=60)
+    assert token.startswith(f"v{version}.local.".encode("utf-8"))
+
+    decoded = paseto.decode(key, token)
+    assert decoded.version == f"v{version}"
+    assert decoded.purpose == "local"
+    assert decoded.payload["sub"] == "test"
+    assert {"exp", "iat"} <= decoded.payload.keys()
+
+    token = paseto.encode(key, {"sub": "test"}, exp_seconds=-60)
+    assert "exp" not in paseto.decode(key, token).payload
+
+    with pytest.raises(PASETODecodeError) as err:
+        paseto.decode(key, token, audience="foo")
+    assert err.value.message == "aud verification failed."
+
+
+def test_invalid_payload():
+    key = v4.V4Local(b"secret-key")
+    for payload in (b"not json", b"[1, 2]"):
+        with pytest.raises(PASETODecodeError) as err:
+            paseto.decode(key, key.encode(payload))
+        assert err.value.message == "Invalid PASETO payload"
+
+    with pytest.raises(PASETODecodeError) as err:
+        paseto.decode(key, key.encode(b'{"exp": "tomorrow"}'))
+    assert err.value.message == "Invalid exp."
+    with pytest.raises(PASETODecodeError) as err:
+        paseto.decode(key, key.encode(b'{"exp": "2000-01-01T00:00:00+00:00"}'))
+    assert err.value.message == "Token expired."
+    with pytest.raises(PASETODecodeError) as err:
+        paseto.decode(key, key.encode(b'{"nbf": "2999-01-01T00:00:00Z"}'))
+    assert err.value.message == "Token has not been activated yet."
@@ -0,0 +1,113 @@
+import pytest
+from fastapi_paseto_auth import AuthPASETO, metrics
+
+
+@pytest.fixture(scope="function")
+def reset_config():
+    yield
+
+    @AuthPASETO.tenant_loader
+    def reset_tenants():
+        return {}
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+def load_config(**options):
+    settings = {
+        "authpaseto_secret_key": "secret-key",
+        "authpaseto_private_key": open("tests/private_key.pem").read(),
+        "authpaseto_public_key": open("tests/public_key.pem").read(),
+        **options,
+    }
+
+    @AuthPASETO.load_config
+    def get_settings():
+        return settings.items()
+
+
+def test_warm_up(reset_config):
+    load_config(authpaseto_denylist_enabled=True, authpaseto_metrics_enabled=True)
+    calls = []
+
+    @AuthPASETO.token_in_denylist_loader
+    def check_if_token_in_denylist(decrypted_token):
+        calls.append(decrypted_token)
+        return True
+
+    exposition = metrics.generate_latest()
+    timings = AuthPASETO.warm_up()
+
+    assert set(timings) == {"v4.local", "v4.public", "total"}
+    assert all(seconds > 0 for seconds in timings.values())
+    assert timings["total"] >= timings["v4.local"] + timings["v4.public"]
+    assert len(AuthPASETO._keys) == 3
+    assert calls == []
+    assert metrics.generate_latest() == exposition
+    assert AuthPASETO._token is None
+    assert AuthPASETO._current_user is None
+
+    AuthPASETO._denylist_enabled = False
+
+
+def test_warm_up_verify_only(reset_config):
+    load_config(authpaseto_secret_key=None, authpaseto_private_key=None)
+    timings = AuthPASETO.warm_up()
+    assert set(timings) == {"v4.public", "total"}
+
+    load_config(
+        authpaseto_secret_key=None,
+        authpaseto_private_key=None,
+        authpaseto_public_key=None,
+    )
+    assert set(AuthPASETO.warm_up()) == {"total"}
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"authpaseto_decode_audience": "api.example.org"},
+        {"authpaseto_decode_audience": ["api", "admin"]},
+        {"authpaseto_decode_issuer": "auth.example.org"},
+        {
+            "authpaseto_encode_issuer": "other.example.org",
+            "authpaseto_decode_issuer": "auth.example.org",
+        },
+    ],
+)
+def test_warm_up_with_claim_checks(reset_config, options):
+    load_config(**options)
+    timings = AuthPASETO.warm_up()
+    assert set(timings) == {"v4.local", "v4.public", "total"}
+
+
+def test_warm_up_tenants(reset_config, monkeypatch):
+    load_config(authpaseto_private_key=None, authpaseto_public_key=None)
+
+    @AuthPASETO.tenant_loader
+    def get_tenants():
+        return {
+            "acme": {
+                "authpaseto_version": 2,
+                "authpaseto_secret_key": "a" * 32,
+                "authpaseto_encode_issuer": "acme",
+                "authpaseto_decode_issuer": "acme",
+            },
+            "globex": {"authpaseto_public_key": open("tests/public_key.pem").read()},
+        }
+
+    decoded = []
+    decode_token = AuthPASETO._decode_token
+
+    def recording_decode_token(self, *args, **kwargs):
+        token = decode_token(self, *args, **kwargs)
+        decoded.append((self.get_tenant(), token.version, token.purpose))
+        return token
+
+    monkeypatch.setattr(AuthPASETO, "_decode_token", recording_decode_token)
+    timings = AuthPASETO.warm_up()
+
+    assert set(timings) == {"v4.local", "acme:v2.local", "globex:v4.public", "total"}
+    assert decoded == [(None, "v4", "local"), ("acme", "v2", "local")]
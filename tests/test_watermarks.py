@@ -0,0 +1,190 @@
+import threading
+import time
+import pytest
+from fastapi_paseto_auth import AuthPASETO
+from fastapi_paseto_auth.denylist import InMemoryWatermarkStore, RedisWatermarkStore
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+        self.reads = 0
+        self.read_threads = []
+
+    def hset(self, name, key, value):
+        self.hashes.setdefault(name, {})[key.encode()] = value.encode()
+
+    def hget(self, name, key):
+        self.reads += 1
+        self.read_threads.append(threading.get_ident())
+        return self.hashes.get(name, {}).get(key.encode())
+
+    def hdel(self, name, *keys):
+        for key in keys:
+            self.hashes[name].pop(key.encode(), None)
+
+
+@pytest.fixture(scope="function")
+def store():
+    store = InMemoryWatermarkStore()
+
+    @AuthPASETO.watermark_store_loader
+    def get_watermark_store():
+        return store
+
+    yield store
+
+    AuthPASETO._watermark_store = None
+
+
+@pytest.fixture(scope="function")
+def client(store):
+    @AuthPASETO.load_config
+    def get_settings():
+        return [
+            ("authpaseto_secret_key", "secret-key"),
+            ("authpaseto_refresh_token_expires", 3600),
+            ("authpaseto_other_token_expires", 60),
+        ]
+
+    app = FastAPI()
+
+    @app.exception_handler(AuthPASETOException)
+    def authpaseto_exception_handler(request: Request, exc: AuthPASETOException):
+        return JSONResponse(
+            status_code=exc.status_code, content={"detail": exc.message}
+        )
+
+    @app.get("/protected")
+    def protected(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        return {"hello": "world"}
+
+    @app.get("/async-protected")
+    async def async_protected(Authorize: AuthPASETO = Depends()):
+        await Authorize.paseto_required_async()
+        return {"thread": threading.get_ident()}
+
+    @app.delete("/logout-everywhere")
+    def logout_everywhere(Authorize: AuthPASETO = Depends()):
+        Authorize.paseto_required()
+        Authorize.revoke_subject()
+        return {"detail": "All tokens have been revoked"}
+
+    yield TestClient(app)
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+def get_protected(client: TestClient, token: str):
+    return client.get("/protected", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_revoke_subject(client: TestClient, store, Authorize: AuthPASETO):
+    tokens = [Authorize.create_access_token(subject="test") for _ in range(3)]
+    other_token = Authorize.create_access_token(subject="other")
+
+    response = client.delete(
+        "/logout-everywhere", headers={"Authorization": f"Bearer {tokens[0]}"}
+    )
+    assert response.status_code == 200
+    # A single watermark revokes every token of the subject
+    assert len(store) == 1
+    for token in tokens:
+        response = get_protected(client, token)
+        assert response.status_code == 401
+        assert response.json() == {"detail": "Token has been revoked"}
+    assert get_protected(client, other_token).status_code == 200
+
+    # Kept for the longest token lifetime, the refresh token one here
+    _, deadline = store._watermarks["test"]
+    assert 3590 < deadline - time.time() <= 3600
+
+    # Tokens issued after the revocation are accepted, even in the same second
+    token = Authorize.create_access_token(subject="test")
+    assert get_protected(client, token).status_code == 200
+
+
+def test_sign_in_right_after_revoking(client: TestClient, store, Authorize):
+    for _ in range(20):
+        token = Authorize.create_access_token(subject="test")
+        Authorize.revoke_subject("test")
+        new_token = Authorize.create_access_token(subject="test")
+        assert get_protected(client, token).status_code == 401
+        assert get_protected(client, new_token).status_code == 200
+
+
+def test_revoke_subject_by_name(client: TestClient, store, Authorize: AuthPASETO):
+    token = Authorize.create_access_token(subject=42)
+    Authorize.revoke_subject(42)
+    assert store.get("42") is not None
+    assert get_protected(client, token).status_code == 401
+
+
+def test_revoke_subject_without_store(Authorize: AuthPASETO):
+    with pytest.raises(RuntimeError, match="watermark_store_loader"):
+        Authorize.revoke_subject("test")
+
+
+def test_in_memory_watermark_expiry(monkeypatch):
+    store = InMemoryWatermarkStore()
+    store.set("test", 100, ttl=10)
+    assert store.get("test") == 100
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert store.get("test") is None
+    assert len(store) == 0
+
+
+def test_redis_watermark_store(monkeypatch):
+    redis = FakeRedis()
+    store = RedisWatermarkStore(redis, refresh_interval=5)
+    other_store = RedisWatermarkStore(redis, refresh_interval=5)
+    assert other_store.get("test") is None
+    assert redis.reads == 1
+
+    store.set("test", 100.5, ttl=60)
+    store.set("expiring", 100, ttl=1)
+    # Seen right away by the process that set it
+    assert store.get("test") == 100.5
+    assert redis.reads == 1
+
+    # Other processes read a subject at most once per refresh interval
+    assert other_store.get("test") is None
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 5)
+    assert other_store.get("test") == 100.5
+    assert other_store.get("test") == 100.5
+    assert other_store.get("unknown") is None
+    assert redis.reads == 3
+
+    wall_clock = time.time()
+    monkeypatch.setattr(time, "time", lambda: wall_clock + 2)
+    other_store.refresh()
+    assert other_store.get("expiring") is None
+    assert list(redis.hashes["authpaseto:watermarks"]) == [b"test"]
+
+
+def test_redis_watermark_read_in_threadpool(client: TestClient, Authorize):
+    redis = FakeRedis()
+    AuthPASETO._watermark_store = RedisWatermarkStore(redis)
+    token = Authorize.create_access_token(subject="test")
+
+    response = client.get(
+        "/async-protected", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert redis.read_threads and response.json()["thread"] not in redis.read_threads
+
+    AuthPASETO._watermark_store.set("test", time.time())
+    AuthPASETO._watermark_store.refresh()
+    response = client.get(
+        "/async-protected", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 401
@@ -0,0 +1,185 @@
+import asyncio
+import time
+import pytest
+from fastapi_paseto_auth import AuthPASETO, paseto
+from fastapi_paseto_auth.exceptions import AuthPASETOException
+from fastapi import FastAPI, Depends, WebSocket, status
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+
+@pytest.fixture(scope="function")
+def decodes(monkeypatch):
+    calls = []
+    decode = paseto.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args)
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(paseto, "decode", counting_decode)
+    return calls
+
+
+@pytest.fixture(scope="function")
+def client():
+    @AuthPASETO.load_config
+    def get_settings():
+        return [
+            ("authpaseto_secret_key", "secret-key"),
+            ("authpaseto_private_key", open("tests/private_key.pem").read()),
+            ("authpaseto_public_key", open("tests/public_key.pem").read()),
+        ]
+
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def feed(
+        websocket: WebSocket, token: str = None, Authorize: AuthPASETO = Depends()
+    ):
+        await websocket.accept()
+        try:
+            await Authorize.paseto_websocket_required(token=token)
+        except AuthPASETOException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        try:
+            while True:
+                message = await websocket.receive_text()
+                if message == "renew":
+                    await Authorize.paseto_websocket_required(
+                        token=await websocket.receive_text()
+                    )
+                    continue
+                await Authorize.paseto_websocket_required()
+                await websocket.send_json(
+                    {"message": message, "subject": Authorize.get_subject()}
+                )
+        except WebSocketDisconnect:
+            pass
+
+    @app.websocket("/challenge")
+    async def challenge(websocket: WebSocket, Authorize: AuthPASETO = Depends()):
+        async def ask_for_token(websocket: WebSocket):
+            await websocket.send_json({"detail": "token expired"})
+
+        await websocket.accept()
+        await Authorize.paseto_websocket_required(on_expire=ask_for_token)
+        await websocket.receive_text()
+
+    @app.websocket("/challenge-and-check")
+    async def challenge_and_check(
+        websocket: WebSocket, Authorize: AuthPASETO = Depends()
+    ):
+        async def ask_for_token(websocket: WebSocket):
+            await websocket.send_json({"detail": "token expired"})
+
+        await websocket.accept()
+        await Authorize.paseto_websocket_required(on_expire=ask_for_token)
+        await websocket.receive_text()
+        try:
+            await Authorize.paseto_websocket_required(on_expire=ask_for_token)
+        except AuthPASETOException as err:
+            await websocket.send_json({"detail": err.message})
+        else:
+            await websocket.send_json({"ok": "after expiry"})
+        await websocket.receive_text()
+
+    yield TestClient(app)
+
+    @AuthPASETO.load_config
+    def reset_settings():
+        return []
+
+
+def test_token_is_verified_once_per_connection(client, decodes):
+    token = AuthPASETO().create_access_token(subject="test", expires_time=60)
+
+    with client.websocket_connect(
+        "/ws", headers={"Authorization": f"Bearer {token}"}
+    ) as websocket:
+        for message in ("first", "second", "third"):
+            websocket.send_text(message)
+            assert websocket.receive_json() == {"message": message, "subject": "test"}
+    assert len(decodes) == 1
+
+
+def test_token_from_query_string(client):
+    token = AuthPASETO().create_access_token(subject="test", expires_time=60)
+
+    with client.websocket_connect(f"/ws?token={token}") as websocket:
+        websocket.send_text("hello")
+        assert websocket.receive_json() == {"message": "hello", "subject": "test"}
+
+
+def test_invalid_token_is_rejected_at_handshake(client):
+    with client.websocket_connect("/ws?token=v4.local.invalid") as websocket:
+        with pytest.raises(WebSocketDisconnect) as err:
+            websocket.receive_text()
+    assert err.value.code == status.WS_1008_POLICY_VIOLATION
+
+
+def test_connection_is_closed_when_token_expires(client):
+    token = AuthPASETO().create_access_token(subject="test", expires_time=1)
+
+    with client.websocket_connect(f"/ws?token={token}") as websocket:
+        with pytest.raises(WebSocketDisconnect) as err:
+            websocket.receive_json()
+    assert err.value.code == status.WS_1008_POLICY_VIOLATION
+
+
+def test_renewed_token_reschedules_expiry(client, decodes):
+    token = AuthPASETO().create_access_token(subject="test", expires_time=1)
+    renewed = AuthPASETO().create_access_token(subject="renewed", expires_time=60)
+
+    with client.websocket_connect(f"/ws?token={token}") as websocket:
+        websocket.send_text("renew")
+        websocket.send_text(renewed)
+        websocket.send_text("hello")
+        assert websocket.receive_json() == {"message": "hello", "subject": "renewed"}
+
+        time.sleep(1.5)
+        websocket.send_text("still open")
+        assert websocket.receive_json() == {
+            "message": "still open",
+            "subject": "renewed",
+        }
+    assert len(decodes) == 2
+
+
+def test_renewed_token_with_another_purpose(client):
+    token = AuthPASETO().create_access_token(subject="test", purpose="local")
+    renewed = AuthPASETO().create_access_token(subject="renewed", purpose="public")
+
+    with client.websocket_connect(f"/ws?token={token}") as websocket:
+        websocket.send_text("renew")
+        websocket.send_text(renewed)
+        websocket.send_text("hello")
+        assert websocket.receive_json() == {"message": "hello", "subject": "renewed"}
+
+
+def test_on_expire_challenges_instead_of_closing(client):
+    token = AuthPASETO().create_access_token(subject="test", expires_time=1)
+
+    with client.websocket_connect(
+        "/challenge", headers={"Authorization": f"Bearer {token}"}
+    ) as websocket:
+        assert websocket.receive_json() == {"detail": "token expired"}
+        websocket.send_text("bye")
+
+
+def test_expired_token_is_rejected_after_challenge(client):
+    token = AuthPASETO().create_access_token(subject="test", expires_time=1)
+
+    with client.websocket_connect(
+        "/challenge-and-check", headers={"Authorization": f"Bearer {token}"}
+    ) as websocket:
+        assert websocket.receive_json() == {"detail": "token expired"}
+        websocket.send_text("check")
+        assert websocket.receive_json() == {"detail": "Token expired."}
+        websocket.send_text("bye")
+
+
+def test_websocket_required_needs_websocket():
+    with pytest.raises(RuntimeError, match=r"WebSocket"):
+        asyncio.run(AuthPASETO().paseto_websocket_required())